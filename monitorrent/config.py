@@ -0,0 +1,124 @@
+from builtins import range
+import os
+import sys
+import argparse
+import warnings
+
+import six
+import structlog
+
+from monitorrent.rest import CompressionMiddleware
+
+log = structlog.get_logger()
+
+
+def try_int(s, base=10, val=None):
+    if s is None:
+        return None
+    try:
+        return int(s, base)
+    except ValueError:
+        return val
+
+
+class Config(object):
+    debug = False
+    ip = '0.0.0.0'
+    port = 6687
+    db_path = 'monitorrent.db'
+    config = 'config.py'
+    compression_level = CompressionMiddleware.DEFAULT_LEVEL
+    threads = 10
+    max_threads = -1
+    longpoll_threads = 4
+    request_queue_size = 5
+    socket_timeout = 10
+    keep_alive_conn_limit = 10
+
+    # HTTP server options: config file name, environment variable and argument name are the same
+    server_options = ['threads', 'max_threads', 'longpoll_threads', 'request_queue_size', 'socket_timeout',
+                      'keep_alive_conn_limit']
+
+    def __init__(self, parsed_args):
+        if parsed_args.config is not None and not os.path.isfile(parsed_args.config):
+            warnings.warn('File not found: {}'.format(parsed_args.config))
+        config_path = parsed_args.config or self.config
+        if os.path.isfile(config_path):
+            # noinspection PyBroadException
+            log.bind(config_is_file=True)
+            try:
+                parsed_config = {}
+                with open(config_path) as config_file:
+                    six.exec_(compile(config_file.read(), config_path, 'exec'), {}, parsed_config)
+                self.debug = parsed_config.get('debug', self.debug)
+                self.ip = parsed_config.get('ip', self.ip)
+                self.port = parsed_config.get('port', self.port)
+                self.db_path = parsed_config.get('db_path', self.db_path)
+                self.compression_level = parsed_config.get('compression_level', self.compression_level)
+                for option in self.server_options:
+                    setattr(self, option, parsed_config.get(option, getattr(self, option)))
+            except:
+                ex, val, tb = sys.exc_info()
+                warnings.warn('Error reading: {0}: {1} ({2}'.format(parsed_args.config, ex, val))
+
+        env_debug = (os.environ.get('MONITORRENT_DEBUG', None) in ['true', 'True', '1'])
+
+        self.debug = parsed_args.debug or env_debug or self.debug
+        self.ip = parsed_args.ip or os.environ.get('MONITORRENT_IP', None) or self.ip
+        self.port = parsed_args.port or try_int(os.environ.get('MONITORRENT_PORT', None)) or self.port
+        self.db_path = parsed_args.db_path or os.environ.get('MONITORRENT_DB_PATH', None) or self.db_path
+        compression_level = parsed_args.compression_level
+        if compression_level is None:
+            compression_level = try_int(os.environ.get('MONITORRENT_COMPRESSION_LEVEL', None))
+        if compression_level is not None:
+            self.compression_level = compression_level
+        # zlib accepts -1 (its default) to 9, wrong level has to fail on start instead of on every response
+        if not isinstance(self.compression_level, int) or isinstance(self.compression_level, bool) or \
+                not -1 <= self.compression_level <= 9:
+            raise ValueError('compression_level has to be int from -1 to 9, but was {0!r}'
+                             .format(self.compression_level))
+        for option in self.server_options:
+            value = getattr(parsed_args, option)
+            if value is None:
+                value = try_int(os.environ.get('MONITORRENT_' + option.upper(), None))
+            if value is not None:
+                setattr(self, option, value)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Monitorrent server')
+    parser.add_argument('--debug', action='store_true',
+                        help='Run in debug mode. Secret key is always the same.')
+    parser.add_argument('--ip', type=str, dest='ip',
+                        help='Bind interface. Default is {0}'.format(Config.ip))
+    parser.add_argument('--port', type=int, dest='port',
+                        help='Port for server. Default is {0}'.format(Config.port))
+    parser.add_argument('--db-path', type=str, dest='db_path',
+                        help='Path to SQL lite database. Default is to {0}'.format(Config.db_path))
+    parser.add_argument('--compression-level', type=int, dest='compression_level', choices=range(-1, 10),
+                        help='Compression level of API responses, 0 disables compression, '
+                             '-1 is zlib default level. '
+                             'Default is {0}'.format(Config.compression_level))
+    parser.add_argument('--threads', type=int, dest='threads',
+                        help='Count of HTTP server worker threads for regular requests. '
+                             'Default is {0}'.format(Config.threads))
+    parser.add_argument('--max-threads', type=int, dest='max_threads',
+                        help='Max count of HTTP server worker threads for regular requests, -1 is unlimited. '
+                             'Default is {0}'.format(Config.max_threads))
+    parser.add_argument('--longpoll-threads', type=int, dest='longpoll_threads',
+                        help='Count of additional worker threads reserved for long-polling and events requests, '
+                             'it is also max count of simultaneously waiting requests. '
+                             'Default is {0}'.format(Config.longpoll_threads))
+    parser.add_argument('--request-queue-size', type=int, dest='request_queue_size',
+                        help='Size of listen socket backlog. Default is {0}'.format(Config.request_queue_size))
+    parser.add_argument('--socket-timeout', type=int, dest='socket_timeout',
+                        help='Timeout in seconds for socket operations. Default is {0}'.format(Config.socket_timeout))
+    parser.add_argument('--keep-alive-conn-limit', type=int, dest='keep_alive_conn_limit',
+                        help='Max count of idle keep-alive connections. '
+                             'Default is {0}'.format(Config.keep_alive_conn_limit))
+    parser.add_argument('--config', type=str, dest='config',
+                        default=os.environ.get('MONITORRENT_CONFIG', None),
+                        help='Path to config file (default {0})'.format(Config.config))
+    parser.add_argument('--startup-profile', action='store_true', dest='startup_profile',
+                        help='Print time spent in each startup phase.')
+    return parser
@@ -1,13 +1,19 @@
 from __future__ import absolute_import
 from builtins import range
-from sqlalchemy import create_engine, event, Column, String, Integer, Table, types
+from sqlalchemy import create_engine, event, Column, String, Integer, Table, types, select, func
 import sqlalchemy.orm
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 from alembic.migration import MigrationContext
 from alembic.operations import Operations
 from datetime import datetime
+import re
+import random
+import threading
 import pytz
+import structlog
+
+log = structlog.get_logger()
 
 
 class ContextSession(sqlalchemy.orm.Session):
@@ -43,9 +49,47 @@ class UTCDateTime(types.TypeDecorator):
                             value.hour, value.minute, value.second,
                             value.microsecond, tzinfo=pytz.utc)
 
+class DataVersion(object):
+    """
+    Monotonically increasing version of database data.
+
+    Version is bumped when connection with executed INSERT, UPDATE or DELETE statements is returned to the pool,
+    i.e. after changes are committed, so data read before the bump is never newer than its version.
+    Epoch is different for every process, so (epoch, value) pair is never reused after restart.
+    """
+    _write_statement = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+    def __init__(self):
+        self.epoch = '{0:08x}'.format(random.getrandbits(32))
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+    def is_write_statement(self, statement):
+        return self._write_statement.match(statement) is not None
+
+    def register(self, db_engine):
+        # noinspection PyUnusedLocal
+        @event.listens_for(db_engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if self.is_write_statement(statement):
+                conn.connection.info['data_changed'] = True
+
+        # noinspection PyUnusedLocal
+        @event.listens_for(db_engine, 'checkin')
+        def checkin(dbapi_connection, connection_record):
+            if connection_record is not None and connection_record.info.pop('data_changed', False):
+                self.bump()
+
+
 Base = declarative_base()
 _DBSession = None
 engine = None
+data_version = DataVersion()
 
 
 def get_engine():
@@ -73,12 +117,19 @@ def init_db_engine(connection_string, echo=False, **kwargs):
         # emit our own BEGIN
         conn.execute("BEGIN")
 
+    data_version.register(engine)
+
     session_factory = sessionmaker(class_=ContextSession, bind=engine)
     _DBSession = scoped_session(session_factory)
 
 
 def create_db():
-    Base.metadata.create_all(engine)
+    # one query for all table names instead of checking every table separately
+    with engine.connect() as connection:
+        existing_tables = set(engine.dialect.get_table_names(connection))
+    missing_tables = [t for t in Base.metadata.sorted_tables if t.name not in existing_tables]
+    if len(missing_tables) > 0:
+        Base.metadata.create_all(engine, tables=missing_tables, checkfirst=False)
 
 
 def close_db():
@@ -130,30 +181,80 @@ class MonitorrentOperations(Operations):
         from .plugins import Topic
 
         self.create_table(v1)
-        topics = self.db.query(v0)
-        for topic in topics:
-            raw_topic = row2dict(topic, v0)
+        topics_table = Topic.__table__
+        for raw_topics in self.select_batches(v0):
             # insert into topics
-            topic_values = {c: v for c, v in list(raw_topic.items()) if c in Topic.__table__.c and c != 'id'}
-            topic_values['type'] = polymorphic_identity
-            if topic_mapping:
-                topic_mapping(topic_values, raw_topic)
-            result = self.db.execute(Topic.__table__.insert(), topic_values)
-
-            # get topic.id
-            inserted_id = result.inserted_primary_key[0]
+            topics_values = []
+            for raw_topic in raw_topics:
+                topic_values = {c: v for c, v in list(raw_topic.items()) if c in topics_table.c and c != 'id'}
+                topic_values['type'] = polymorphic_identity
+                if topic_mapping:
+                    topic_mapping(topic_values, raw_topic)
+                topics_values.append(topic_values)
+            self.db.execute(topics_table.insert(), topics_values)
+
+            # get topic.id of inserted topics by unique url
+            urls = [topic_values['url'] for topic_values in topics_values]
+            inserted_ids = dict(self.db.execute(select([topics_table.c.url, topics_table.c.id])
+                                                .where(topics_table.c.url.in_(urls))).fetchall())
 
             # insert into v1 table
-            concrete_topic = {c: v for c, v in list(raw_topic.items()) if c in v1.c}
-            concrete_topic['id'] = inserted_id
-            if column_renames:
-                column_renames(concrete_topic, raw_topic)
-            self.db.execute(v1.insert(), concrete_topic)
+            concrete_topics = []
+            for raw_topic, topic_values in zip(raw_topics, topics_values):
+                concrete_topic = {c: v for c, v in list(raw_topic.items()) if c in v1.c}
+                concrete_topic['id'] = inserted_ids[topic_values['url']]
+                if column_renames:
+                    column_renames(concrete_topic, raw_topic)
+                concrete_topics.append(concrete_topic)
+            self.db.execute(v1.insert(), concrete_topics)
         # drop original table
         self.drop_table(v0.name)
         # rename new created table to old one
         self.rename_table(v1.name, v0.name)
 
+    # rows are inserted by executemany batches, it also limits count of parameters of IN for SQLite
+    batch_size = 500
+
+    def copy_table(self, source, target, row_mapping=None):
+        """
+        Copies all rows from source table into target table
+
+        Columns existing in both tables are copied by one INSERT ... SELECT statement.
+        When row_mapping(raw_row) is specified, it converts every row in python
+        and rows are inserted by executemany batches.
+
+        :return: count of copied rows
+        """
+        if row_mapping is None:
+            columns = [c.name for c in target.columns if c.name in source.c]
+            result = self.db.execute(target.insert().from_select(columns, select([source.c[c] for c in columns])))
+            log.info("Table copied", source=source.name, target=target.name, rows=result.rowcount)
+            return result.rowcount
+
+        copied = 0
+        for raw_rows in self.select_batches(source):
+            self.db.execute(target.insert(), [row_mapping(raw_row) for raw_row in raw_rows])
+            copied += len(raw_rows)
+        return copied
+
+    def select_batches(self, table):
+        """
+        Reads all rows of table by batches of batch_size rows and reports progress
+
+        :rtype: collections.Iterable[list[dict]]
+        """
+        total = self.db.execute(select([func.count()]).select_from(table)).scalar()
+        rows = self.db.execute(table.select())
+        processed = 0
+        while processed < total:
+            batch = rows.fetchmany(self.batch_size)
+            if len(batch) == 0:
+                break
+            yield [row2dict(row, table) for row in batch]
+            processed += len(batch)
+            log.info("Migration progress", table=table.name, processed=processed, total=total)
+        rows.close()
+
     def __enter__(self):
         self.db.__enter__()
         return self
@@ -6,17 +6,18 @@ import threading
 import traceback
 
 from queue import PriorityQueue
-from collections import namedtuple
+from collections import namedtuple, deque
 from datetime import datetime, timedelta
 
 import pytz
 import html
 
 import structlog
-from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, func
-from monitorrent.db import Base, DBSession, row2dict, UTCDateTime
+from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, Index, func, and_, or_, select
+from monitorrent.db import Base, DBSession, row2dict, UTCDateTime, get_engine
 from monitorrent.utils.timers import timer
 from monitorrent.plugins.status import Status
+from monitorrent.upgrade_manager import add_upgrade
 
 log = structlog.get_logger()
 
@@ -42,6 +43,18 @@ class Logger(object):
         """
         """
 
+    def update_progress(self, progress):
+        """
+        """
+
+    def tracker_started(self, tracker):
+        """
+        """
+
+    def tracker_finished(self, tracker, exception):
+        """
+        """
+
 
 def _clamp(value, min_value=0, max_value=100):
     return max(min_value, min(value, max_value))
@@ -72,7 +85,13 @@ class Engine(object):
         self.log.downloaded(message, torrent)
 
     def update_progress(self, progress):
-        pass
+        self.log.update_progress(progress)
+
+    def tracker_started(self, tracker):
+        self.log.tracker_started(tracker)
+
+    def tracker_finished(self, tracker, exception):
+        self.log.tracker_finished(tracker, exception)
 
     def start(self, trackers_count, notifier_manager_execute):
         return EngineTrackers(trackers_count, notifier_manager_execute, self)
@@ -179,6 +198,7 @@ class EngineTrackers(EngineExecute):
         self.tracker_topics_count = 0
 
     def start(self, tracker):
+        self.done_topics += self.tracker_topics_count
         self.tracker_topics_count = self.trackers_count.pop(tracker)
         self.update_progress(0)
         engine_tracker = EngineTracker(tracker, self, self.notifier_manager_execute, self.engine)
@@ -201,6 +221,7 @@ class EngineTrackers(EngineExecute):
             self.info(u"End execute")
 
         self.done_topics += self.tracker_topics_count
+        self.tracker_topics_count = 0
         self.update_progress(100)
         return True
 
@@ -227,6 +248,7 @@ class EngineTracker(EngineExecute):
         self.engine_trackers.update_progress(progress)
 
     def __enter__(self):
+        self.engine.tracker_started(self.tracker)
         self.info(u"Start checking for <b>{0}</b>".format(self.tracker))
         return self
 
@@ -236,6 +258,7 @@ class EngineTracker(EngineExecute):
                         exc_type, exc_val, exc_tb)
         else:
             self.info(u"End checking for <b>{0}</b>".format(self.tracker))
+        self.engine.tracker_finished(self.tracker, exc_val)
         return True
 
 
@@ -250,8 +273,10 @@ class EngineTopics(EngineExecute):
         super(EngineTopics, self).__init__(engine, notifier_manager_execute)
         self.count = count
         self.engine_tracker = engine_tracker
+        self.index = 0
 
     def start(self, index, topic_name):
+        self.index = index
         progress = index * 100 / self.count
         self.update_progress(progress)
         return EngineTopic(topic_name, self, self.notifier_manager_execute, self.engine)
@@ -259,6 +284,9 @@ class EngineTopics(EngineExecute):
     def update_progress(self, progress):
         self.engine_tracker.update_progress(_clamp(progress))
 
+    def update_topic_progress(self, progress):
+        self.update_progress((self.index * 100 + _clamp(progress)) / self.count)
+
     def __enter__(self):
         return self
 
@@ -290,7 +318,7 @@ class EngineTopic(EngineExecute):
         log(message)
 
     def update_progress(self, progress):
-        self.engine_topics.update_progress(_clamp(progress))
+        self.engine_topics.update_topic_progress(_clamp(progress))
 
     def __enter__(self):
         self.info(u"Check for changes <b>{0}</b>".format(self.topic_name))
@@ -358,22 +386,37 @@ class ExecuteLog(Base):
     level = Column(Enum('info', 'warning', 'failed', 'downloaded'), nullable=False)
 
 
+# keyset pagination indexes: history is ordered by (finish_time, id) and details are filtered by execute_id
+execute_finish_time_index = Index('ix_execute_finish_time_id', Execute.finish_time, Execute.id)
+execute_log_execute_id_index = Index('ix_execute_log_execute_id', ExecuteLog.execute_id)
+
+
+# noinspection PyUnusedLocal
+def upgrade(engine, operations_factory):
+    with engine.connect() as connection:
+        for index in [execute_finish_time_index, execute_log_execute_id_index]:
+            if not engine.dialect.has_table(connection, index.table.name):
+                continue
+            existing_indexes = engine.dialect.get_indexes(connection, index.table.name)
+            if index.name not in [i['name'] for i in existing_indexes]:
+                index.create(connection)
+
+
+add_upgrade(upgrade, schema_version=1)
+
+
 class DbLoggerWrapper(Logger):
-    def __init__(self, log_manager, settings_manager=None):
+    def __init__(self, log_manager):
         """
         :type log_manager: ExecuteLogManager
-        :type settings_manager: settings_manager.SettingsManager | None
         """
         self._log_manager = log_manager
-        self._settings_manager = settings_manager
 
     def started(self, start_time):
         self._log_manager.started(start_time)
 
     def finished(self, finish_time, exception):
         self._log_manager.finished(finish_time, exception)
-        if self._settings_manager:
-            self._log_manager.remove_old_entries(self._settings_manager.remove_logs_interval)
 
     def info(self, message):
         self._log_manager.log_entry(message, 'info')
@@ -390,10 +433,105 @@ class DbLoggerWrapper(Logger):
     def downloaded(self, message, torrent):
         self._log_manager.log_entry(message, 'downloaded')
 
+    def update_progress(self, progress):
+        self._log_manager.update_progress(progress)
+
+    def tracker_started(self, tracker):
+        self._log_manager.tracker_started(tracker)
+
+    def tracker_finished(self, tracker, exception):
+        self._log_manager.tracker_finished(tracker, exception)
+
+
+REMOVE_CHUNK_SIZE = 500
+EVENTS_BUFFER_SIZE = 1000
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+
+
+class TooManyWaitersException(Exception):
+    def __init__(self, retry_after):
+        super(TooManyWaitersException, self).__init__('Too many clients are waiting for changes')
+        self.retry_after = retry_after
+
 
 # noinspection PyMethodMayBeStatic
 class ExecuteLogManager(object):
     _execute_id = None
+    DEFAULT_MAX_WAITERS = 16
+    # seconds, client which can't wait for changes has to repeat request not earlier than after it
+    RETRY_AFTER = 5
+
+    def __init__(self, max_waiters=DEFAULT_MAX_WAITERS, events_buffer_size=EVENTS_BUFFER_SIZE):
+        """
+        :param max_waiters: max count of threads which can wait for changes simultaneously
+        :param events_buffer_size: count of the latest events kept in memory for resume
+        """
+        self.max_waiters = max_waiters
+        self._sequence = 0
+        self._waiters = 0
+        self._changed = threading.Condition()
+        self._events = deque(maxlen=events_buffer_size)
+        self._progress = None
+
+    @property
+    def sequence(self):
+        """
+        Number which is incremented on every published event:
+        execute start and finish, new log entry, progress and tracker changes
+        """
+        return self._sequence
+
+    @property
+    def progress(self):
+        """
+        :rtype: int | None
+        :return: progress of current execute in percents or None if execute is not running
+        """
+        return self._progress
+
+    def get_events(self, after):
+        """
+        :param after: sequence number of the last received event
+        :rtype: (list[(int, str, dict)], bool)
+        :return: events published after specified sequence number as (sequence, event, data) tuples
+            and flag which is True when some of requested events are not available anymore
+        """
+        with self._changed:
+            if after > self._sequence:
+                # sequence from previous server run
+                return list(self._events), True
+            missed = len(self._events) == 0 and after < self._sequence or \
+                len(self._events) > 0 and after < self._events[0][0] - 1
+            return [e for e in self._events if e[0] > after], missed
+
+    def wait_for_changes(self, sequence, timeout):
+        """
+        Block current thread until sequence will be changed or timeout expired
+
+        :param sequence: sequence number returned before last data read
+        :param timeout: timeout in seconds
+        :rtype: bool
+        :return: True if sequence was changed, False on timeout
+        :raises TooManyWaitersException: when max_waiters threads are already waiting,
+            caller shouldn't poll in loop, but ask client to retry later
+        """
+        with self._changed:
+            if self._sequence != sequence:
+                return True
+            if self._waiters >= self.max_waiters:
+                raise TooManyWaitersException(self.RETRY_AFTER)
+            self._waiters += 1
+            try:
+                self._changed.wait(timeout)
+            finally:
+                self._waiters -= 1
+            return self._sequence != sequence
+
+    def _publish(self, event, data):
+        with self._changed:
+            self._sequence += 1
+            self._events.append((self._sequence, event, data))
+            self._changed.notify_all()
 
     def started(self, start_time):
         if self._execute_id is not None:
@@ -406,6 +544,9 @@ class ExecuteLogManager(object):
             db.commit()
             self._execute_id = execute.id
 
+        self._progress = 0
+        self._publish('started', {'execute_id': self._execute_id, 'start_time': start_time})
+
     def finished(self, finish_time, exception):
         if self._execute_id is None:
             raise Exception('Execute is not started')
@@ -417,8 +558,12 @@ class ExecuteLogManager(object):
             execute.finish_time = finish_time
             if exception is not None:
                 execute.failed_message = html.escape(str(exception))
+            status = execute.status
 
+        execute_id = self._execute_id
         self._execute_id = None
+        self._progress = None
+        self._publish('finished', {'execute_id': execute_id, 'status': status, 'finish_time': finish_time})
 
     def log_entry(self, message, level):
         if self._execute_id is None:
@@ -431,38 +576,97 @@ class ExecuteLogManager(object):
             execute_log = ExecuteLog(execute_id=self._execute_id, time=datetime.now(pytz.utc),
                                      message=message, level=level)
             db.add(execute_log)
+            db.flush()
+            entry = row2dict(execute_log)
+
+        self._publish('log', entry)
+
+    def update_progress(self, progress):
+        if self._execute_id is None:
+            return
+        # progress is reported for every topic, so events are published only when whole percent changes
+        progress = int(progress)
+        if progress == self._progress:
+            return
+        self._progress = progress
+        self._publish('progress', {'execute_id': self._execute_id, 'progress': progress})
+
+    def tracker_started(self, tracker):
+        if self._execute_id is None:
+            return
+        self._publish('tracker_started', {'execute_id': self._execute_id, 'tracker': tracker})
+
+    def tracker_finished(self, tracker, exception):
+        if self._execute_id is None:
+            return
+        self._publish('tracker_finished', {'execute_id': self._execute_id, 'tracker': tracker,
+                                           'status': 'finished' if exception is None else 'failed'})
+
+    def get_log_entries(self, skip, take, after=None, count='exact'):
+        """
+        Returns page of executes ordered from the newest to the oldest one
 
-    def get_log_entries(self, skip, take):
+        :param skip: offset of the page, ignored when after is specified
+        :param take: page size
+        :param after: id of the last execute from previous page, enables keyset pagination on (finish_time, id)
+        :param count: 'exact', 'approximate' or 'none'
+        :rtype: (list[dict], int | None)
+        """
         with DBSession() as db:
-            downloaded_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'downloaded') \
-                .subquery()
-            failed_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'failed') \
-                .subquery()
-
-            result_query = db.query(Execute, downloaded_sub_query.c.count, failed_sub_query.c.count) \
-                .outerjoin(failed_sub_query, Execute.id == failed_sub_query.c.execute_id) \
-                .outerjoin(downloaded_sub_query, Execute.id == downloaded_sub_query.c.execute_id) \
-                .order_by(Execute.finish_time.desc()) \
-                .offset(skip) \
-                .limit(take)
+            executes_query = db.query(Execute).order_by(Execute.finish_time.desc(), Execute.id.desc())
+            if after is not None:
+                after_finish_time = db.query(Execute.finish_time).filter(Execute.id == after).scalar()
+                if after_finish_time is None:
+                    # cursor execute was already removed, and all executes older than it were removed as well
+                    executes = []
+                else:
+                    executes = executes_query \
+                        .filter(or_(Execute.finish_time < after_finish_time,
+                                    and_(Execute.finish_time == after_finish_time, Execute.id < after))) \
+                        .limit(take) \
+                        .all()
+            else:
+                executes = executes_query.offset(skip).limit(take).all()
+
+            levels_count = dict()
+            if len(executes) > 0:
+                levels_count_query = db.query(ExecuteLog.execute_id, ExecuteLog.level, func.count(ExecuteLog.id)) \
+                    .filter(ExecuteLog.execute_id.in_([e.id for e in executes])) \
+                    .filter(ExecuteLog.level.in_(['downloaded', 'failed'])) \
+                    .group_by(ExecuteLog.execute_id, ExecuteLog.level)
+                for execute_id, level, level_count in levels_count_query:
+                    levels_count[(execute_id, level)] = level_count
 
             result = []
-            for execute, downloads, fails in result_query.all():
+            for execute in executes:
                 execute_result = row2dict(execute)
-                execute_result['downloaded'] = downloads or 0
-                execute_result['failed'] = fails or 0
+                execute_result['downloaded'] = levels_count.get((execute.id, 'downloaded'), 0)
+                execute_result['failed'] = levels_count.get((execute.id, 'failed'), 0)
                 execute_result['is_running'] = execute.id == self._execute_id
                 result.append(execute_result)
 
-            execute_count = db.query(func.count(Execute.id)).scalar()
+            execute_count = self._get_executes_count(db, count)
 
         return result, execute_count
 
-    def remove_old_entries(self, prune_days):
+    @staticmethod
+    def _get_executes_count(db, count):
+        if count == 'exact':
+            return db.query(func.count(Execute.id)).scalar()
+        if count == 'approximate':
+            # old executes are always removed from the beginning, so ids range is a good estimation
+            # and it can be calculated from primary key index only
+            min_id, max_id = db.query(func.min(Execute.id), func.max(Execute.id)).one()
+            return max_id - min_id + 1 if max_id is not None else 0
+        return None
+
+    def remove_old_entries(self, prune_days, chunk_size=REMOVE_CHUNK_SIZE):
+        """
+        Remove executes started more than prune_days ago with all their log entries
+
+        :rtype: int
+        :return: count of removed executes
+        """
         # SELECT id FROM execute WHERE start_time <= datetime('now', '-10 days') ORDER BY id DESC LIMIT 1
         with DBSession() as db:
             prune_date = datetime.now(pytz.utc) - timedelta(days=prune_days)
@@ -472,33 +676,189 @@ class ExecuteLogManager(object):
                 .limit(1) \
                 .scalar()
 
-            if execute_id is not None:
-                db.query(ExecuteLog) \
-                    .filter(ExecuteLog.execute_id <= execute_id) \
-                    .delete(synchronize_session=False)
+        if execute_id is None:
+            return 0
+
+        return self._remove_entries_up_to(execute_id, chunk_size)
+
+    def remove_entries_over_size(self, max_size, chunk_size=REMOVE_CHUNK_SIZE, executes_chunk_size=10):
+        """
+        Remove the oldest executes until database data size fit into max_size bytes.
+        The latest execute is always kept.
+
+        :rtype: int
+        :return: count of removed executes
+        """
+        removed = 0
+        while True:
+            size = self.get_database_size()
+            if size is None or size <= max_size:
+                break
+
+            with DBSession() as db:
+                latest_id = db.query(func.max(Execute.id)).scalar()
+                oldest_ids = [e.id for e in db.query(Execute.id)
+                              .filter(Execute.id < latest_id)
+                              .order_by(Execute.id)
+                              .limit(executes_chunk_size)] if latest_id is not None else []
+
+            if len(oldest_ids) == 0:
+                break
+
+            removed_chunk = self._remove_entries_up_to(oldest_ids[-1], chunk_size)
+            if removed_chunk == 0:
+                break
+            removed += removed_chunk
+        return removed
+
+    def _remove_entries_up_to(self, execute_id, chunk_size):
+        if self._execute_id is not None:
+            execute_id = min(execute_id, self._execute_id - 1)
+
+        # every chunk is deleted in separate transaction, so database write lock is held only for a short time
+        execute_log_table = ExecuteLog.__table__
+        while True:
+            chunk_ids = select([execute_log_table.c.id]) \
+                .where(execute_log_table.c.execute_id <= execute_id) \
+                .limit(chunk_size)
+            with DBSession() as db:
+                deleted = db.execute(execute_log_table.delete().where(execute_log_table.c.id.in_(chunk_ids)))
+                if deleted.rowcount < chunk_size:
+                    break
+
+        removed = 0
+        execute_table = Execute.__table__
+        while True:
+            chunk_ids = select([execute_table.c.id]) \
+                .where(execute_table.c.id <= execute_id) \
+                .limit(chunk_size)
+            with DBSession() as db:
+                deleted = db.execute(execute_table.delete().where(execute_table.c.id.in_(chunk_ids)))
+                removed += deleted.rowcount
+                if deleted.rowcount < chunk_size:
+                    break
+        return removed
 
-                db.query(Execute) \
-                    .filter(Execute.id <= execute_id) \
-                    .delete(synchronize_session=False)
+    @staticmethod
+    def get_database_size():
+        """
+        :rtype: int | None
+        :return: size in bytes of used database pages or None if it can't be determined
+        """
+        engine = get_engine()
+        if engine.dialect.name != 'sqlite':
+            return None
+        with engine.connect() as connection:
+            page_size = connection.execute('PRAGMA page_size').scalar()
+            page_count = connection.execute('PRAGMA page_count').scalar()
+            freelist_count = connection.execute('PRAGMA freelist_count').scalar()
+        return (page_count - freelist_count) * page_size
+
+    @staticmethod
+    def reclaim_space():
+        """
+        Return free pages to file system.
+        First call switch SQLite database to incremental auto vacuum mode with full VACUUM,
+        all next calls are cheap incremental vacuums.
+        """
+        engine = get_engine()
+        if engine.dialect.name != 'sqlite':
+            return
+        with engine.connect() as connection:
+            auto_vacuum = connection.execute('PRAGMA auto_vacuum').scalar()
+            if auto_vacuum == SQLITE_AUTO_VACUUM_INCREMENTAL:
+                # pysqlite frees only one page per step, so all result rows have to be fetched from raw cursor
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.execute('PRAGMA incremental_vacuum')
+                    cursor.fetchall()
+                finally:
+                    cursor.close()
+            else:
+                connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                connection.execute('VACUUM')
 
     def is_running(self, execute_id=None):
         if execute_id is not None:
             return self._execute_id == execute_id
         return self._execute_id is not None
 
-    def get_execute_log_details(self, execute_id, after=None):
+    def get_execute_log_details(self, execute_id, after=None, take=None):
         with DBSession() as db:
             filters = [ExecuteLog.execute_id == execute_id]
             if after is not None:
                 filters.append(ExecuteLog.id > after)
-            log_entries = db.query(ExecuteLog).filter(*filters).all()
-            return [row2dict(e) for e in log_entries]
+            log_entries_query = db.query(ExecuteLog).filter(*filters).order_by(ExecuteLog.id)
+            if take is not None:
+                log_entries_query = log_entries_query.limit(take)
+            return [row2dict(e) for e in log_entries_query.all()]
 
-    def get_current_execute_log_details(self, after=None):
+    def get_current_execute_log_details(self, after=None, take=None):
         if self._execute_id is None:
             return None
 
-        return self.get_execute_log_details(self._execute_id, after)
+        return self.get_execute_log_details(self._execute_id, after, take)
+
+
+class ExecuteLogRetention(object):
+    """
+    Background job which removes old execute logs and reclaims database space while engine is idle
+    """
+    DEFAULT_INTERVAL = 3600
+
+    def __init__(self, log_manager, settings_manager, interval=DEFAULT_INTERVAL, chunk_size=REMOVE_CHUNK_SIZE):
+        """
+        :type log_manager: ExecuteLogManager
+        :type settings_manager: settings_manager.SettingsManager
+        """
+        self.log_manager = log_manager
+        self.settings_manager = settings_manager
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.timer_cancel = None
+        self.execute_thread = None
+        self._execute_lock = threading.Lock()
+
+    def start(self):
+        if self.timer_cancel is not None:
+            raise Exception("Stop previous retention before start a new one")
+        self.timer_cancel = timer(self.interval, self.execute_timer)
+
+    def stop(self):
+        if self.timer_cancel is not None:
+            self.timer_cancel()
+            self.timer_cancel = None
+
+    def execute_timer(self):
+        # chunked deletes and vacuum are slow, so they are called out of shared timers thread
+        if self.execute_thread is not None and self.execute_thread.is_alive():
+            return
+        self.execute_thread = threading.Thread(target=self.execute, name='execute-logs-retention')
+        self.execute_thread.daemon = True
+        self.execute_thread.start()
+
+    # noinspection PyBroadException
+    def execute(self):
+        if self.log_manager.is_running():
+            return False
+
+        if not self._execute_lock.acquire(False):
+            return False
+        try:
+            removed = self.log_manager.remove_old_entries(self.settings_manager.remove_logs_interval,
+                                                          self.chunk_size)
+            max_size = self.settings_manager.remove_logs_max_size
+            if max_size > 0:
+                removed += self.log_manager.remove_entries_over_size(max_size * 1024 * 1024, self.chunk_size)
+            if removed > 0:
+                self.log_manager.reclaim_space()
+            log.info("Execute logs retention finished", removed=removed)
+            return True
+        except:
+            log.error("An error has occurred during execute logs retention", exception=str(sys.exc_info()[1]))
+            return False
+        finally:
+            self._execute_lock.release()
 
 
 class EngineRunner(threading.Thread):
@@ -515,6 +875,8 @@ class EngineRunner(threading.Thread):
         """
         interval_param = kwargs.pop('interval', None)
         last_execute_param = kwargs.pop('last_execute', None)
+        # server starts runner after it is listening, runner can't be created later because API uses it
+        autostart = kwargs.pop('autostart', True)
 
         super(EngineRunner, self).__init__(**kwargs)
         self.logger = logger
@@ -531,7 +893,8 @@ class EngineRunner(threading.Thread):
         self.timer_cancel = None
         self._create_timer()
 
-        self.start()
+        if autostart:
+            self.start()
 
     @property
     def interval(self):
@@ -1,12 +1,20 @@
-from threading import Timer, RLock
+from threading import Thread, RLock
 import monitorrent
+import structlog
 import requests
 import semver
+from monitorrent.utils.timers import timer
+
+log = structlog.get_logger()
 
 
 class NewVersionChecker(object):
     releases_url = 'https://api.github.com/repos/werwolfby/monitorrent/releases'
     tagged_release_url = 'https://github.com/werwolfby/monitorrent/releases/tag/{0}'
+    # seconds, offline check shouldn't hang for the whole TCP timeout
+    timeout = 10
+    # part of interval, checks of many instances shouldn't come to github at the same time
+    jitter = 0.05
 
     def __init__(self, notifier_manager, include_prereleases):
         """
@@ -16,7 +24,7 @@ class NewVersionChecker(object):
         self.include_prereleases = include_prereleases
         self.new_version_url = None
         self.timer = None
-        self.stoped = True
+        self.check_thread = None
         self.update_timer_lock = RLock()
         self.interval = 3600
         self.notified_version = None
@@ -25,18 +33,16 @@ class NewVersionChecker(object):
         return self.timer is not None
 
     def start(self, interval):
-        if self.timer is not None:
-            raise Exception("Stop previous interval before start a new one")
-        self.interval = interval
-        self.timer = Timer(self.interval, self.execute_timer)
-        self.timer.start()
-        self.stoped = False
+        with self.update_timer_lock:
+            if self.timer is not None:
+                raise Exception("Stop previous interval before start a new one")
+            self.interval = interval
+            self.timer = timer(self.interval, self.execute_timer, jitter=self.interval * self.jitter)
 
     def stop(self):
         with self.update_timer_lock:
-            self.stoped = True
             if self.timer is not None:
-                self.timer.cancel()
+                self.timer()
                 self.timer = None
 
     def update(self, include_prereleases, enabled, interval):
@@ -54,13 +60,19 @@ class NewVersionChecker(object):
                 self.start(interval)
 
     def execute_timer(self):
+        # request to github is slow, so it is called out of shared timers thread
+        if self.check_thread is not None and self.check_thread.is_alive():
+            return
+        self.check_thread = Thread(target=self._execute_safe, name='new-version-check')
+        self.check_thread.daemon = True
+        self.check_thread.start()
+
+    # noinspection PyBroadException
+    def _execute_safe(self):
         try:
             self.execute()
-        finally:
-            with self.update_timer_lock:
-                self.timer = None
-                if not self.stoped:
-                    self.start(self.interval)
+        except Exception as e:
+            log.warning("New version check failed", exception=str(e))
 
     def execute(self):
         latest_release = self.get_latest_release()
@@ -77,7 +89,7 @@ class NewVersionChecker(object):
                     pass
 
     def get_latest_release(self):
-        response = requests.get(self.releases_url)
+        response = requests.get(self.releases_url, timeout=self.timeout)
         releases = response.json()
 
         latest_version = None
@@ -1,20 +1,121 @@
 import os
+import threading
+import time
+from collections import namedtuple
 
+import six
 import structlog
+from six.moves import queue
+from sqlalchemy import and_, or_, func
 
-from monitorrent.db import DBSession, row2dict
+from monitorrent.db import DBSession, row2dict, get_engine
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.notifiers import Notifier, NotifierType
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin
-from monitorrent.upgrade_manager import add_upgrade
+from monitorrent.upgrade_manager import add_upgrade, add_post_upgrade
+from monitorrent.utils.token_bucket import TokenBucket
 
 
 log = structlog.get_logger()
 plugins = dict()
+plugins_lock = threading.RLock()
+
+PluginInfo = namedtuple('PluginInfo', ['type', 'name', 'module'])
+
+# builtin plugins can be registered without import of their modules,
+# server imports all of them on start, so their tables are upgraded and created before any request
+plugins_manifest = [
+    PluginInfo('client', 'deluge', 'monitorrent.plugins.clients.deluge'),
+    PluginInfo('client', 'downloader', 'monitorrent.plugins.clients.downloader'),
+    PluginInfo('client', 'qbittorrent', 'monitorrent.plugins.clients.qbittorrent'),
+    PluginInfo('client', 'transmission', 'monitorrent.plugins.clients.transmission'),
+    PluginInfo('client', 'utorrent', 'monitorrent.plugins.clients.utorrent'),
+    PluginInfo('notifier', 'email', 'monitorrent.plugins.notifiers.email_sender'),
+    PluginInfo('notifier', 'pushall', 'monitorrent.plugins.notifiers.pushall'),
+    PluginInfo('notifier', 'pushbullet', 'monitorrent.plugins.notifiers.pushbullet'),
+    PluginInfo('notifier', 'pushover', 'monitorrent.plugins.notifiers.pushover'),
+    PluginInfo('notifier', 'telegram', 'monitorrent.plugins.notifiers.telegram'),
+    PluginInfo('tracker', 'anidub.com', 'monitorrent.plugins.trackers.anidub'),
+    PluginInfo('tracker', 'anilibria.tv', 'monitorrent.plugins.trackers.anilibria'),
+    PluginInfo('tracker', 'free-torrents.org', 'monitorrent.plugins.trackers.freetorrents'),
+    PluginInfo('tracker', 'hdclub.org', 'monitorrent.plugins.trackers.hdclub'),
+    PluginInfo('tracker', 'kinozal.tv', 'monitorrent.plugins.trackers.kinozal'),
+    PluginInfo('tracker', 'lostfilm.tv', 'monitorrent.plugins.trackers.lostfilm'),
+    PluginInfo('tracker', 'nnmclub.to', 'monitorrent.plugins.trackers.nnmclub'),
+    PluginInfo('tracker', 'rutor.info', 'monitorrent.plugins.trackers.rutor'),
+    PluginInfo('tracker', 'rutracker.org', 'monitorrent.plugins.trackers.rutracker'),
+    PluginInfo('tracker', 'tapochek.net', 'monitorrent.plugins.trackers.tapochek'),
+    PluginInfo('tracker', 'unionpeer.org', 'monitorrent.plugins.trackers.unionpeer'),
+]
+
+
+class PluginsDict(dict):
+    """
+    Plugins of one type by name
+
+    Plugins from manifest are stored as PluginInfo and their module is imported on first access.
+    Keys, len and in don't import anything.
+    Import doesn't touch database, tables of plugins are upgraded and created on start only,
+    so all plugins which are used with database have to be loaded before upgrade (see load_plugins).
+    """
+    def __getitem__(self, name):
+        plugin = super(PluginsDict, self).__getitem__(name)
+        if isinstance(plugin, PluginInfo):
+            plugin = self._load(plugin)
+        return plugin
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in list(self.keys())]
+
+    def items(self):
+        return [(name, self[name]) for name in list(self.keys())]
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def ensure_loaded(self, name):
+        """
+        Import plugin module if it isn't imported yet, i.e. to map topic class of tracker before query
 
+        :return: plugin instance
+        """
+        return self[name]
+
+    def load_all(self):
+        for name in list(self.keys()):
+            self.ensure_loaded(name)
+
+    def _load(self, info):
+        with plugins_lock:
+            plugin = super(PluginsDict, self).__getitem__(info.name)
+            if not isinstance(plugin, PluginInfo):
+                # was loaded by another thread
+                return plugin
+            __import__(info.module)
+            plugin = super(PluginsDict, self).__getitem__(info.name)
+            if isinstance(plugin, PluginInfo):
+                raise ImportError("Module {0} doesn't register plugin {1}".format(info.module, info.name))
+            log.info("Plugin loaded", type=info.type, name=info.name, module=info.module)
+            return plugin
+
+
+def load_plugins(plugins_dir="plugins", lazy=True):
+    """
+    :param lazy: register plugins from manifest without import of their modules,
+     server loads all of them, because their upgrades and tables have to be known before database upgrade
+    """
+    manifest_modules = set()
+    for info in plugins_manifest:
+        plugins.setdefault(info.type, PluginsDict()).setdefault(info.name, info)
+        manifest_modules.add(info.module)
 
-def load_plugins(plugins_dir="plugins"):
     file_dir = os.path.dirname(os.path.realpath(__file__))
     module_names = []
     for d, dirnames, files in os.walk(os.path.join(file_dir, plugins_dir)):
@@ -23,21 +124,29 @@ def load_plugins(plugins_dir="plugins"):
             if not f.endswith('.py') or f == '__init__.py':
                 continue
             module_name = os.path.join("monitorrent", d, f[:-3]).replace(os.path.sep, '.')
+            if module_name in manifest_modules:
+                continue
             __import__(module_name)
             module_names.append(module_name)
-    log.info("Plugins loaded successfully", modules=module_names)
+    if not lazy:
+        for type_plugins in list(plugins.values()):
+            type_plugins.load_all()
+    log.info("Plugins loaded successfully", modules=module_names, manifest=sorted(manifest_modules), lazy=lazy)
 
 
-def register_plugin(type, name, instance, upgrade=None):
+def register_plugin(type, name, instance, upgrade=None, schema_version=None, post_upgrade=None,
+                    post_upgrade_version=None):
     if not upgrade:
         upgrade = getattr(instance, 'upgrade', None)
     if upgrade:
-        add_upgrade(upgrade)
-    plugins.setdefault(type, dict())[name] = instance
+        add_upgrade(upgrade, schema_version)
+    if post_upgrade:
+        add_post_upgrade(post_upgrade, post_upgrade_version)
+    plugins.setdefault(type, PluginsDict())[name] = instance
 
 
 def get_plugins(type):
-    return plugins.get(type, dict())
+    return plugins.get(type, PluginsDict())
 
 
 def get_all_plugins():
@@ -56,6 +165,19 @@ class TrackersManager(object):
         self.trackers = trackers
         self.settings_manager = settings_manager
 
+    def ensure_loaded(self, name=None):
+        """
+        Import tracker plugins, so their topic classes are mapped before topics are queried by type,
+        otherwise topics are loaded as base Topic and delete removes only row of topics table
+
+        :param name: tracker name, all trackers are loaded when it is None
+        """
+        if not isinstance(self.trackers, PluginsDict):
+            return
+        for tracker_name in (list(self.trackers.keys()) if name is None else [name]):
+            if tracker_name in self.trackers:
+                self.trackers.ensure_loaded(tracker_name)
+
     def get_settings(self, name):
         tracker = self.get_tracker(name)
         if hasattr(tracker, 'get_credentials'):
@@ -119,7 +241,124 @@ class TrackersManager(object):
                 return True
         return False
 
+    def add_topics(self, urls, params=None, max_workers=8, tracker_workers=2, min_interval=0.25):
+        """
+        Parse urls concurrently and add all parsed topics in one transaction
+
+        Urls are grouped by tracker, every tracker is parsed by at most tracker_workers threads
+        and requests to one tracker are started not more often than once per min_interval seconds.
+        Result for every url is yielded as soon as it is known, summary is yielded after commit.
+
+        :param urls: urls or (url, params) pairs, per url params override default params
+        :type urls: list[str | tuple[str, dict]]
+        :type params: dict | None
+        :rtype: collections.Iterable[dict]
+        """
+        counters = {'added': 0, 'exists': 0, 'unsupported': 0, 'failed': 0}
+
+        def result(url, status, **kwargs):
+            counters[status if status != 'parsed' else 'added'] += 1
+            kwargs.update({'url': url, 'status': status})
+            return kwargs
+
+        with DBSession() as db:
+            existing = db.query(Topic.url, Topic.display_name).all()
+        existing_urls = set(e.url for e in existing)
+        existing_names = set(e.display_name for e in existing)
+
+        tracker_settings = self.settings_manager.tracker_settings
+        initialized = set()
+        groups = dict()
+        seen_urls = set()
+        for item in urls:
+            url, url_params = (item, None) if isinstance(item, six.string_types) else item
+            if url in seen_urls or url in existing_urls:
+                yield result(url, 'exists')
+                continue
+            seen_urls.add(url)
+            topic_params = dict(params or {})
+            topic_params.update(url_params or {})
+            for name, tracker in list(self.trackers.items()):
+                if name not in initialized:
+                    tracker.init(tracker_settings)
+                    initialized.add(name)
+                if tracker.can_parse_url(url):
+                    groups.setdefault(name, []).append((url, topic_params))
+                    break
+            else:
+                yield result(url, 'unsupported')
+
+        results = queue.Queue()
+        stopped = threading.Event()
+        workers_semaphore = threading.BoundedSemaphore(max_workers)
+
+        def parse_worker(name, tracker, tasks, limiter):
+            while not stopped.is_set():
+                try:
+                    url, topic_params = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                with workers_semaphore:
+                    if limiter is not None:
+                        limiter.acquire()
+                    try:
+                        topic = tracker.create_topic(url, topic_params)
+                        results.put((name, url, topic, None))
+                    except Exception as e:
+                        log.warning("Failed to parse topic url", url=url, tracker=name, exc_info=True)
+                        results.put((name, url, None, e))
+
+        pending = 0
+        for name, items in list(groups.items()):
+            tasks = queue.Queue()
+            for task in items:
+                tasks.put(task)
+            limiter = TokenBucket(1.0 / min_interval) if min_interval > 0 else None
+            for _ in range(min(tracker_workers, len(items))):
+                worker = threading.Thread(target=parse_worker, args=(name, self.trackers[name], tasks, limiter))
+                worker.daemon = True
+                worker.start()
+            pending += len(items)
+
+        new_topics = []
+        try:
+            while pending > 0:
+                name, url, topic, error = results.get()
+                pending -= 1
+                if error is not None:
+                    yield result(url, 'failed', tracker=name, error=six.text_type(error))
+                elif topic is None:
+                    yield result(url, 'failed', tracker=name, error='Can\'t parse url')
+                elif topic.url in existing_urls:
+                    yield result(url, 'exists', tracker=name)
+                elif topic.display_name in existing_names:
+                    yield result(url, 'failed', tracker=name,
+                                 error='Topic with name {0} already exists'.format(topic.display_name))
+                else:
+                    existing_urls.add(topic.url)
+                    existing_names.add(topic.display_name)
+                    new_topics.append(topic)
+                    yield result(url, 'parsed', tracker=name, display_name=topic.display_name)
+        finally:
+            stopped.set()
+
+        if new_topics:
+            try:
+                with DBSession() as db:
+                    db.add_all(new_topics)
+            except Exception as e:
+                log.error("Failed to add topics", count=len(new_topics), exc_info=True)
+                counters['failed'] += counters['added']
+                counters['added'] = 0
+                yield dict(counters, status='error', error=six.text_type(e))
+                return
+        yield dict(counters, status='completed')
+
     def remove_topic(self, id):
+        with DBSession() as db:
+            topic_type = db.query(Topic.type).filter(Topic.id == id).scalar()
+        if topic_type is not None:
+            self.ensure_loaded(topic_type)
         with DBSession() as db:
             topic = db.query(Topic).filter(Topic.id == id).first()
             if topic is None:
@@ -127,6 +366,59 @@ class TrackersManager(object):
             db.delete(topic)
         return True
 
+    def remove_topics(self, ids=None, tracker=None, statuses=None):
+        """
+        Delete all selected topics with rows of tracker tables by one statement per table
+
+        :type ids: list[int] | None
+        :type tracker: str | None
+        :type statuses: list[Status] | None
+        :return: count of removed topics
+        :rtype: int
+        """
+        self.ensure_loaded(tracker if tracker in self.trackers else None)
+        if tracker is not None and tracker in self.trackers:
+            topic_classes = [self.trackers[tracker].topic_class]
+        else:
+            topic_classes = [t.topic_class for t in list(self.trackers.values())]
+        tables = set(table for topic_class in topic_classes for table in topic_class.__mapper__.tables)
+        tables.discard(Topic.__table__)
+        with DBSession() as db:
+            selected_ids = self._filter_topics(db.query(Topic.id), ids, tracker, statuses).statement
+            for table in tables:
+                db.execute(table.delete().where(table.c.id.in_(selected_ids)))
+            return self._filter_topics(db.query(Topic), ids, tracker, statuses).delete(synchronize_session=False)
+
+    def reset_topics_status(self, ids=None, tracker=None, statuses=None):
+        """
+        :return: count of updated topics
+        :rtype: int
+        """
+        return self._update_topics({Topic.status: Status.Ok}, ids, tracker, statuses)
+
+    def set_topics_paused(self, paused, ids=None, tracker=None, statuses=None):
+        """
+        :type paused: bool
+        :return: count of updated topics
+        :rtype: int
+        """
+        return self._update_topics({Topic.paused: paused}, ids, tracker, statuses)
+
+    def _update_topics(self, values, ids, tracker, statuses):
+        self.ensure_loaded(tracker if tracker in self.trackers else None)
+        with DBSession() as db:
+            return self._filter_topics(db.query(Topic), ids, tracker, statuses).update(values, synchronize_session=False)
+
+    @staticmethod
+    def _filter_topics(query, ids, tracker, statuses):
+        if ids is not None:
+            query = query.filter(Topic.id.in_(ids))
+        if tracker is not None:
+            query = query.filter(Topic.type == tracker)
+        if statuses is not None:
+            query = query.filter(Topic.status.in_(statuses))
+        return query
+
     def get_topic(self, id):
         tracker = self.get_tracker_by_id(id)
         settings = tracker.get_topic(id)
@@ -153,25 +445,102 @@ class TrackersManager(object):
             topic.paused = paused
         return True
 
-    def get_watching_topics(self):
-        watching_topics = []
+    topics_order_columns = {
+        'id': Topic.id,
+        'display_name': Topic.display_name,
+        'last_update': Topic.last_update,
+    }
+    # SQLite limits count of parameters in one statement
+    max_ids_per_query = 500
+
+    def get_watching_topics(self, tracker=None, statuses=None, paused=None, search=None,
+                            order_by='id', desc=False, take=None, after=None):
+        """
+        Returns filtered and sorted watching topics
+
+        :param search: substring of display_name
+        :param order_by: one of topics_order_columns keys, id is used as tie breaker
+        :param take: page size, all topics are returned when it is None
+        :param after: id of the last topic from previous page, enables keyset pagination
+        :rtype: list[dict]
+        """
+        order_column = self.topics_order_columns[order_by]
+        self.ensure_loaded(tracker if tracker in self.trackers else None)
         with DBSession() as db:
-            dbtopics = db.query(Topic).all()
-            for dbtopic in dbtopics:
-                try:
-                    tracker = self.get_tracker(dbtopic.type)
-                except KeyError:
-                    # TODO: Log warning of not existing topic
-                    #       Need to think, should we return not existing plugin
-                    #       as just default topic, and show it disabled on UI to
-                    #       let user ability for delete such topics
-                    continue
-                topic = row2dict(dbtopic, None, ['id', 'url', 'display_name', 'last_update', 'paused'])
-                topic['info'] = tracker.get_topic_info(dbtopic)
-                topic['tracker'] = dbtopic.type
-                topic['status'] = dbtopic.status.__str__()
-                watching_topics.append(topic)
-        return watching_topics
+            if take is None and after is None:
+                # one query per tracker joins topics table only with this tracker table
+                topics = [(tracker_plugin, dbtopic) for name, tracker_plugin in list(self.trackers.items())
+                          if tracker is None or tracker == name
+                          for dbtopic in self._filter_watching_topics(db.query(tracker_plugin.topic_class),
+                                                                      name, statuses, paused, search)]
+                # the same order as in SQLite, where NULL is the smallest value
+                topics.sort(key=lambda t: (getattr(t[1], order_by) is not None, getattr(t[1], order_by), t[1].id),
+                            reverse=desc)
+                return [self._watching_topic(tracker_plugin, dbtopic) for tracker_plugin, dbtopic in topics]
+
+            query = self._filter_watching_topics(db.query(Topic.id, Topic.type), tracker, statuses, paused, search)
+            if after is not None:
+                query = query.filter(self._after_topic_filter(db, order_column, after, desc))
+            if desc:
+                query = query.order_by(order_column.desc(), Topic.id.desc())
+            else:
+                query = query.order_by(order_column, Topic.id)
+            rows = query.limit(take).all()
+
+            # page is selected from topics table only, tracker rows are loaded by one query per tracker
+            ids_by_tracker = dict()
+            for row in rows:
+                ids_by_tracker.setdefault(row.type, []).append(row.id)
+            watching_topics = dict()
+            for name, ids in list(ids_by_tracker.items()):
+                tracker_plugin = self.trackers[name]
+                for i in range(0, len(ids), self.max_ids_per_query):
+                    dbtopics = db.query(tracker_plugin.topic_class) \
+                        .filter(Topic.id.in_(ids[i:i + self.max_ids_per_query])) \
+                        .all()
+                    for dbtopic in dbtopics:
+                        watching_topics[dbtopic.id] = self._watching_topic(tracker_plugin, dbtopic)
+        return [watching_topics[row.id] for row in rows if row.id in watching_topics]
+
+    @staticmethod
+    def _watching_topic(tracker, dbtopic):
+        topic = row2dict(dbtopic, None, ['id', 'url', 'display_name', 'last_update', 'paused'])
+        topic['info'] = tracker.get_topic_info(dbtopic)
+        topic['tracker'] = dbtopic.type
+        topic['status'] = dbtopic.status.__str__()
+        return topic
+
+    def get_watching_topics_count(self, tracker=None, statuses=None, paused=None, search=None):
+        with DBSession() as db:
+            query = self._filter_watching_topics(db.query(func.count(Topic.id)), tracker, statuses, paused, search)
+            return query.scalar()
+
+    def _filter_watching_topics(self, query, tracker, statuses, paused, search):
+        # topics of not existing plugins are skipped
+        query = self._filter_topics(query, None, tracker, statuses).filter(Topic.type.in_(list(self.trackers.keys())))
+        if paused is not None:
+            query = query.filter(Topic.paused == paused)
+        if search:
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(Topic.display_name.like(u'%{0}%'.format(escaped), escape='\\'))
+        return query
+
+    @staticmethod
+    def _after_topic_filter(db, order_column, after, desc):
+        if order_column is Topic.id:
+            return Topic.id < after if desc else Topic.id > after
+        after_topic = db.query(order_column.label('value')).filter(Topic.id == after).first()
+        if after_topic is None:
+            raise KeyError('Topic {} not found'.format(after))
+        value = after_topic.value
+        # NULL is the smallest value in SQLite
+        if desc:
+            if value is None:
+                return and_(order_column.is_(None), Topic.id < after)
+            return or_(order_column < value, and_(order_column == value, Topic.id < after), order_column.is_(None))
+        if value is None:
+            return or_(and_(order_column.is_(None), Topic.id > after), order_column.isnot(None))
+        return or_(order_column > value, and_(order_column == value, Topic.id > after))
 
 
 class ClientsManager(object):
@@ -179,8 +548,10 @@ class ClientsManager(object):
         if clients is None:
             clients = get_plugins('client')
         self.clients = clients
-        self.default_client = self.__get_default_client(default_client_name,
-                                                        list(self.clients.values())[0] if len(self.clients) > 0 else None)
+        self.default_client = self.__get_default_client(default_client_name)
+        if self.default_client is None and len(self.clients) > 0:
+            # only one client is loaded, the others are imported on first use
+            self.default_client = self.clients[next(iter(self.clients))]
 
     def set_default(self, name):
         default_client = self.__get_default_client(name)
@@ -232,15 +603,153 @@ class ClientsManager(object):
         return default
 
 
+class NotificationDispatcher(object):
+    """
+    Sends notifications in background.
+
+    Every notifier has own worker thread with bounded queue, so notifiers are called in parallel
+    and slow notifier delays only its own messages. Message is dropped when queue of notifier is full,
+    so caller never waits for notification I/O.
+
+    Messages received during notifier batch_window or while waiting for its min_interval rate limit
+    are merged into one digest, digest is split into parts not longer than notifier max_message_length.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._workers = dict()
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def dispatch(self, notifier, header, body):
+        """
+        :type notifier: NotifierPlugin
+        :return: False when message was dropped
+        :rtype: bool
+        """
+        with self._condition:
+            worker_queue = self._workers.get(notifier)
+            if worker_queue is None:
+                worker_queue = queue.Queue(self.queue_size)
+                worker = threading.Thread(target=self._run, args=(notifier, worker_queue),
+                                          name='Notifier {0}'.format(type(notifier).__name__))
+                worker.daemon = True
+                worker.start()
+                self._workers[notifier] = worker_queue
+            try:
+                worker_queue.put_nowait((header, body))
+            except queue.Full:
+                log.warning("Notifications queue is full, message was dropped", notifier=type(notifier).__name__)
+                return False
+            self._pending += 1
+        return True
+
+    def join(self, timeout=None):
+        """
+        Wait until all dispatched messages are sent
+
+        :return: False on timeout
+        :rtype: bool
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while self._pending > 0:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _run(self, notifier, worker_queue):
+        last_sent = None
+        while True:
+            messages = [worker_queue.get()]
+            try:
+                send_at = time.time() + notifier.batch_window
+                if last_sent is not None:
+                    send_at = max(send_at, last_sent + notifier.min_interval)
+                while len(messages) < self.queue_size:
+                    remaining = send_at - time.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        messages.append(worker_queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                for header, body in self._digest(messages, notifier.max_message_length):
+                    if last_sent is not None:
+                        delay = last_sent + notifier.min_interval - time.time()
+                        if delay > 0:
+                            time.sleep(delay)
+                    # noinspection PyBroadException
+                    try:
+                        notifier.notify(header, body)
+                    except Exception:
+                        log.warning("Failed to send notification", notifier=type(notifier).__name__, exc_info=True)
+                    last_sent = time.time()
+            finally:
+                with self._condition:
+                    self._pending -= len(messages)
+                    self._condition.notify_all()
+
+    @staticmethod
+    def _digest(messages, max_length):
+        """
+        Merge bodies of sequential messages with the same header and split them by max_length
+
+        :type messages: list[(str, str)]
+        :type max_length: int | None
+        :rtype: list[(str, str)]
+        """
+        result = []
+        header, lines = None, []
+
+        def flush():
+            if not lines:
+                return
+            part = []
+            part_length = 0
+            for line in lines:
+                while max_length and len(line) > max_length:
+                    if part:
+                        result.append((header, u"\n".join(part)))
+                        part, part_length = [], 0
+                    result.append((header, line[:max_length]))
+                    line = line[max_length:]
+                if part and max_length and part_length + 1 + len(line) > max_length:
+                    result.append((header, u"\n".join(part)))
+                    part, part_length = [], 0
+                part_length += len(line) + (1 if part else 0)
+                part.append(line)
+            if part:
+                result.append((header, u"\n".join(part)))
+
+        for message_header, body in messages:
+            if message_header != header:
+                flush()
+                header, lines = message_header, []
+            lines.append(body)
+        flush()
+        return result
+
+
 class NotifierManager(object):
-    def __init__(self, settings_manager, notifiers=None):
+    def __init__(self, settings_manager, notifiers=None, dispatcher=None):
         """
         :type settings_manager: settings_manager.SettingsManager
+        :type dispatcher: NotificationDispatcher
         """
         self.settings_manager = settings_manager
         if notifiers is None:
             notifiers = get_plugins('notifier')
         self.notifiers = notifiers
+        self.dispatcher = dispatcher or NotificationDispatcher()
+        # (engine, notifiers) pair, enabled notifiers are changed only by update_settings and set_enabled
+        self._enabled_notifiers = None
+        # changed on every notifiers write, notifiers read concurrently with write are not cached
+        self._enabled_generation = 0
+        self._enabled_lock = threading.Lock()
 
     def get_notifier(self, name):
         notifier = self.notifiers[name]
@@ -257,7 +766,11 @@ class NotifierManager(object):
 
     def update_settings(self, name, settings):
         notifier = self.get_notifier(name).get('notifier')
-        return notifier.update_settings(settings)
+        try:
+            return notifier.update_settings(settings)
+        finally:
+            # cache is invalidated only after commit, otherwise concurrent read could cache old values
+            self._invalidate_enabled_notifiers()
 
     def get_enabled(self, name):
         return self.get_notifier(name).get('notifier').is_enabled
@@ -269,26 +782,52 @@ class NotifierManager(object):
             return True
         except:
             return False
+        finally:
+            self._invalidate_enabled_notifiers()
 
     def get_enabled_notifiers(self):
+        """
+        :rtype: list[NotifierPlugin]
+        """
+        engine = get_engine()
+        with self._enabled_lock:
+            cache = self._enabled_notifiers
+            generation = self._enabled_generation
+        if cache is not None and cache[0] is engine:
+            return cache[1]
         with DBSession() as db:
-            dbsettings = db.query(Notifier).all()
-            for setting in dbsettings:
-                if setting.is_enabled:
-                    yield self.get_notifier(setting.type).get('notifier')
+            # only base table is required, it is much cheaper than polymorphic query with all settings tables
+            dbsettings = db.query(Notifier.type, Notifier.is_enabled).order_by(Notifier.id).all()
+        enabled = [self.notifiers[setting.type] for setting in dbsettings
+                   if setting.is_enabled and setting.type in self.notifiers]
+        with self._enabled_lock:
+            if generation == self._enabled_generation:
+                self._enabled_notifiers = (engine, enabled)
+        return enabled
+
+    def _invalidate_enabled_notifiers(self):
+        with self._enabled_lock:
+            self._enabled_generation += 1
+            self._enabled_notifiers = None
 
     def execute(self):
         return NotifierManagerExecute(self.settings_manager.get_external_notifications_levels(), self)
 
 
 class NotifierManagerExecute(object):
+    # full text summary of huge execute keeps only first messages
+    max_summary_messages = 500
+
     def __init__(self, notify_levels, notifier_manager):
         """
         :type notify_levels: list[str]
         """
         self.notify_levels = notify_levels
         self.notifier_manager = notifier_manager
-        self.ongoing_process_message = ""
+        self.messages = []
+        self.skipped_messages = 0
+        # enabled notifiers snapshot, resolved on first message of execute
+        self.enabled_notifiers = None
 
     @property
     def notify_on_failed(self):
@@ -315,35 +854,35 @@ class NotifierManagerExecute(object):
             self.notify(message)
 
     def notify(self, message):
-        enabled = self.notifier_manager.get_enabled_notifiers()
-        for plugin in enabled:
+        for plugin in self._get_enabled_notifiers():
             if plugin.get_type == NotifierType.short_text:
-                try:
-                    plugin.notify("Monitorrent Update", message)
-                except:
-                    # TODO: Log particular notifier error
-                    pass
-        if self.ongoing_process_message == "":
-            self.ongoing_process_message = message
+                self.notifier_manager.dispatcher.dispatch(plugin, "Monitorrent Update", message)
+        if len(self.messages) < self.max_summary_messages:
+            self.messages.append(message)
         else:
-            self.ongoing_process_message += "\n" + message
+            self.skipped_messages += 1
 
     def __enter__(self):
-        self.ongoing_process_message = ""
+        self.messages = []
+        self.skipped_messages = 0
+        self.enabled_notifiers = None
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.ongoing_process_message == "":
+        if len(self.messages) == 0:
             return
-        target_message = "Monitorrent execute result\n" + self.ongoing_process_message
-        enabled = self.notifier_manager.get_enabled_notifiers()
-        for plugin in enabled:
+        lines = ["Monitorrent execute result"] + self.messages
+        if self.skipped_messages > 0:
+            lines.append("and {0} more messages".format(self.skipped_messages))
+        target_message = "\n".join(lines)
+        for plugin in self._get_enabled_notifiers():
             if plugin.get_type == NotifierType.full_text:
-                try:
-                    plugin.notify("Monitorrent Update", target_message)
-                except:
-                    # TODO: Log particular notifier error
-                    pass
+                self.notifier_manager.dispatcher.dispatch(plugin, "Monitorrent Update", target_message)
+
+    def _get_enabled_notifiers(self):
+        if self.enabled_notifiers is None:
+            self.enabled_notifiers = list(self.notifier_manager.get_enabled_notifiers())
+        return self.enabled_notifiers
 
 
 class DbClientsManager(ClientsManager):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Boolean, String, MetaData, Table
+from sqlalchemy import Column, Integer, Boolean, String, MetaData, Table, Index
 from sqlalchemy_enum34 import EnumType
 
 from monitorrent.db import Base, UTCDateTime
@@ -35,11 +35,16 @@ class Topic(Base):
     __mapper_args__ = {
         'polymorphic_identity': 'topic',
         'polymorphic_on': type,
-        'with_polymorphic': '*',
         '_polymorphic_map': TopicPolymorphicMap()
     }
 
 
+# topics list is filtered by tracker and ordered by display_name or last_update with id as keyset tie breaker,
+# display_name alone is already indexed by its unique constraint
+topic_type_display_name_index = Index('ix_topics_type_display_name', Topic.type, Topic.display_name)
+topic_last_update_index = Index('ix_topics_last_update_id', Topic.last_update, Topic.id)
+
+
 # noinspection PyUnusedLocal
 def upgrade(engine, operations_factory):
     if not engine.dialect.has_table(engine.connect(), Topic.__tablename__):
@@ -60,6 +65,11 @@ def upgrade(engine, operations_factory):
             download_dir_column = Column('download_dir', String, nullable=True, server_default=None)
             operations.add_column(Topic.__tablename__, download_dir_column)
         version = 3
+    with engine.connect() as connection:
+        existing_indexes = [i['name'] for i in engine.dialect.get_indexes(connection, Topic.__tablename__)]
+        for index in [topic_type_display_name_index, topic_last_update_index]:
+            if index.name not in existing_indexes:
+                index.create(connection)
 
 
 def get_current_version(engine):
@@ -74,4 +84,5 @@ def get_current_version(engine):
     return 3
 
 
-add_upgrade(upgrade)
+# versions 1-3 add columns, version 4 adds topics list indexes
+add_upgrade(upgrade, schema_version=4)
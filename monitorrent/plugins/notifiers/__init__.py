@@ -1,11 +1,16 @@
 # coding=utf-8
 import six
 import inspect
+import threading
 from abc import ABCMeta, abstractproperty, abstractmethod
 
 from enum import Enum
 from sqlalchemy import String, Column, Integer, Boolean
-from monitorrent.db import DBSession, dict2row, row2dict, Base
+from monitorrent.db import DBSession, dict2row, row2dict, Base, get_engine
+
+
+# guards settings cache of all notifiers, it is held only to read or replace cached value
+settings_cache_lock = threading.Lock()
 
 
 class NotifierPolymorphicMap(dict):
@@ -53,6 +58,19 @@ class NotificationException(Exception):
 class NotifierPlugin:
     __metaclass__ = ABCMeta
     settings_fields = []
+    # seconds to wait for notification service, notifications are sent in background,
+    # but hung connection blocks all next messages of this notifier
+    timeout = 30
+    # messages sent during batch_window seconds are merged into one digest, full text notifiers use 0
+    batch_window = 5
+    # min seconds between two messages to respect service rate limits
+    min_interval = 0
+    # longer digests are split into few messages
+    max_message_length = None
+    # (engine, settings) pair, settings are changed only by update_settings and is_enabled setter
+    _settings_cache = None
+    # changed on every settings write, settings read concurrently with write are not cached
+    _settings_generation = 0
 
     def __init__(self):
         pass
@@ -82,9 +100,8 @@ class NotifierPlugin:
 
     @property
     def is_enabled(self):
-        with DBSession() as db:
-            dbsettings = db.query(self.settings_class).first()
-            return dbsettings.is_enabled if dbsettings else False
+        dbsettings = self.get_settings()
+        return dbsettings.is_enabled if dbsettings else False
 
     @is_enabled.setter
     def is_enabled(self, value):
@@ -93,6 +110,7 @@ class NotifierPlugin:
             if dbsettings is None:
                 raise Exception("Can't enable notifier without settings")
             dbsettings.is_enabled = value
+        self._invalidate_settings_cache()
 
     def update_settings(self, settings):
         settings = settings if isinstance(settings, dict) else settings.__dict__
@@ -110,12 +128,27 @@ class NotifierPlugin:
                 else:
                     settings['is_enabled'] = dbsettings.is_enabled if dbsettings.is_enabled is not None else True
                     dict2row(dbsettings, settings)
-            return True
+        # cache is invalidated only after commit, otherwise concurrent get_settings could cache old values
+        self._invalidate_settings_cache()
+        return True
 
     def get_settings(self):
+        engine = get_engine()
+        with settings_cache_lock:
+            cache = self._settings_cache
+            generation = self._settings_generation
+        if cache is not None and cache[0] is engine:
+            return cache[1]
         with DBSession() as db:
             db_settings = db.query(self.settings_class).first()
-            if db_settings is None:
-                return None
-            db.expunge_all()
-            return db_settings
+            if db_settings is not None:
+                db.expunge_all()
+        with settings_cache_lock:
+            if generation == self._settings_generation:
+                self._settings_cache = (engine, db_settings)
+        return db_settings
+
+    def _invalidate_settings_cache(self):
+        with settings_cache_lock:
+            self._settings_generation += 1
+            self._settings_cache = None
@@ -2,9 +2,12 @@
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import smtplib
+import threading
+import time
 from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, Enum
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.plugins.notifiers import NotificationException, NotifierPlugin, Notifier, NotifierType
+from monitorrent.utils.timers import timer
 import enum
 
 PLUGIN_NAME = 'email'
@@ -39,6 +42,22 @@ class EmailSettings(Notifier):
 
 class EmailNotifierPlugin(NotifierPlugin):
     settings_fields = ['host', 'port', 'login', 'password', 'to_addr', 'timeout', 'connection_security']
+    # full text notifications are sent as they are, they aren't delayed to be merged into short digest
+    batch_window = 0
+    # authenticated connection is reused by next messages and closed after idle timeout,
+    # SMTP servers usually limit count of messages per connection
+    session_idle_timeout = 60
+    max_messages_per_session = 50
+
+    def __init__(self):
+        NotifierPlugin.__init__(self)
+        self._session_lock = threading.RLock()
+        self._session = None
+        self._session_key = None
+        self._session_messages = 0
+        self._session_last_used = None
+        # cancel function of idle check job, it is scheduled while session is open
+        self._session_timer = None
 
     @property
     def get_type(self):
@@ -101,11 +120,12 @@ class EmailNotifierPlugin(NotifierPlugin):
 
     @staticmethod
     def _create_server(settings):
+        # timeout has to be passed to constructor, because it connects to server
+        timeout = settings.timeout or NotifierPlugin.timeout
         if settings.connection_security == 'SSL':
-            server = smtplib.SMTP_SSL(settings.host, settings.port)
+            server = smtplib.SMTP_SSL(settings.host, settings.port, timeout=timeout)
         else:
-            server = smtplib.SMTP(settings.host, settings.port)
-        server.timeout = settings.timeout or 30
+            server = smtplib.SMTP(settings.host, settings.port, timeout=timeout)
         if settings.connection_security == 'TLS':
             server.starttls()
         return server
@@ -128,22 +148,87 @@ class EmailNotifierPlugin(NotifierPlugin):
             raise EmailException(2, 'SMTP host not specified')
         if not settings.to_addr:
             raise EmailException(3, 'Email to address not specified')
-        server = self._create_server(settings)
-        self._server_authenticate(server, settings)
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = settings.login
-            msg['To'] = settings.to_addr
-            msg['Subject'] = header
-            msg.attach(MIMEText(body))
-            if url:
-                msg.attach(MIMEText('\n' + url))
-
-            server.sendmail(settings.login, settings.to_addr, msg.as_string())
+        msg = MIMEMultipart()
+        msg['From'] = settings.login
+        msg['To'] = settings.to_addr
+        msg['Subject'] = header
+        msg.attach(MIMEText(body))
+        if url:
+            msg.attach(MIMEText('\n' + url))
+
+        with self._session_lock:
+            reused = self._session is not None
+            server = self._open_session(settings)
+            try:
+                try:
+                    server.sendmail(settings.login, settings.to_addr, msg.as_string())
+                except smtplib.SMTPServerDisconnected:
+                    if not reused:
+                        raise
+                    # reused connection was closed by server, reconnect once
+                    self.close_session()
+                    server = self._open_session(settings)
+                    server.sendmail(settings.login, settings.to_addr, msg.as_string())
+            except smtplib.SMTPResponseException as e:
+                self.close_session()
+                raise EmailException(5, 'SMTP: failed to deliver the message')
+            except Exception:
+                self.close_session()
+                raise
+            self._session_messages += 1
+            self._session_last_used = time.time()
+            if self._session_messages >= self.max_messages_per_session or self.session_idle_timeout <= 0:
+                self.close_session()
+            elif self._session_timer is None:
+                # session is closed within quarter of idle timeout after it expires
+                self._session_timer = timer(self.session_idle_timeout / 4.0, self._close_idle_session)
             return True
-        except smtplib.SMTPResponseException as e:
-            raise EmailException(5, 'SMTP: failed to deliver the message')
+
+    def close_session(self):
+        with self._session_lock:
+            server = self._detach_session()
+        if server is not None:
+            # noinspection PyBroadException
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def _close_idle_session(self):
+        # called from shared timers thread, so it doesn't wait for session used by notify
+        # and closes socket without QUIT command, which could wait for server response
+        if not self._session_lock.acquire(False):
+            return
+        try:
+            if self._session is not None and time.time() - self._session_last_used < self.session_idle_timeout:
+                return
+            server = self._detach_session()
         finally:
-            server.quit()
+            self._session_lock.release()
+        if server is not None:
+            # noinspection PyBroadException
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _detach_session(self):
+        if self._session_timer is not None:
+            self._session_timer()
+            self._session_timer = None
+        server, self._session, self._session_key = self._session, None, None
+        self._session_messages = 0
+        return server
+
+    def _open_session(self, settings):
+        key = (settings.host, settings.port, settings.login, settings.password, settings.timeout,
+               settings.connection_security)
+        if self._session is not None and self._session_key != key:
+            self.close_session()
+        if self._session is None:
+            server = self._create_server(settings)
+            self._server_authenticate(server, settings)
+            self._session, self._session_key = server, key
+        return self._session
 
 register_plugin('notifier', 'email', EmailNotifierPlugin())
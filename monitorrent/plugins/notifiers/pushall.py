@@ -27,6 +27,8 @@ class PushAllSettings(Notifier):
 
 class PushAllNotifierPlugin(NotifierPlugin):
     settings_fields = ['user_id', 'access_token']
+    # pushall api accepts one message per few seconds
+    min_interval = 3
     form = [{
         'type': 'row',
         'content': [{
@@ -63,7 +65,7 @@ class PushAllNotifierPlugin(NotifierPlugin):
             u'key': settings.access_token
         }
 
-        request = requests.post('https://pushall.ru/api.php', data=parameters)
+        request = requests.post('https://pushall.ru/api.php', data=parameters, timeout=self.timeout)
         result = json.loads(request.text)
 
         if 'error' in result:
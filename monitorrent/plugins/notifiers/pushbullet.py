@@ -24,6 +24,7 @@ class PushbulletSettings(Notifier):
 
 class PushbulletNotifierPlugin(NotifierPlugin):
     settings_fields = ['access_token']
+    min_interval = 1
     form = [{
         'type': 'row',
         'content': [{
@@ -60,7 +61,7 @@ class PushbulletNotifierPlugin(NotifierPlugin):
         }
 
         request = requests.post('https://api.pushbullet.com/v2/pushes', data=parameters,
-                                headers=self.get_headers(settings.access_token))
+                                headers=self.get_headers(settings.access_token), timeout=self.timeout)
         if request.status_code != 200:
             raise PushbulletException(2, 'Failed to send Pushbullet notification')
         return True
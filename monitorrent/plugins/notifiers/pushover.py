@@ -27,6 +27,8 @@ class PushoverSettings(Notifier):
 
 class PushoverNotifierPlugin(NotifierPlugin):
     settings_fields = ['user_id', 'access_token']
+    min_interval = 1
+    max_message_length = 1024
     form = [{
         'type': 'row',
         'content': [{
@@ -63,7 +65,7 @@ class PushoverNotifierPlugin(NotifierPlugin):
             u'key': settings.access_token
         }
 
-        request = requests.post('https://api.pushover.net/1/messages.json', data=parameters)
+        request = requests.post('https://api.pushover.net/1/messages.json', data=parameters, timeout=self.timeout)
 
         if request.status_code != 200:
             raise PushoverException(2, 'Failed to send Pushover notification')
@@ -1,9 +1,17 @@
 # coding=utf-8
 import re
+import threading
+
 import requests
+import structlog
+from requests.adapters import HTTPAdapter
+from six.moves import queue
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.plugins.notifiers import NotificationException, NotifierPlugin, Notifier, NotifierType
+from monitorrent.utils.token_bucket import TokenBucket
+
+log = structlog.get_logger()
 
 PLUGIN_NAME = 'telegram'
 
@@ -50,13 +58,14 @@ def upgrade_0_to_1(engine, operations_factory):
     with operations_factory() as operations:
         operations.create_table(telegram_settings_1)
 
-        credentials = operations.db.query(telegram_settings_0)
-        for credential in credentials:
-            credential1 = {
-                'chat_ids': str(credential.chat_id),
-                'access_token': credential.access_token
+        def credential_mapping(credential):
+            return {
+                'id': credential['id'],
+                'chat_ids': str(credential['chat_id']),
+                'access_token': credential['access_token']
             }
-            operations.db.execute(telegram_settings_1.insert(), credential1)
+
+        operations.copy_table(telegram_settings_0, telegram_settings_1, credential_mapping)
 
         operations.drop_table(telegram_settings_0.name)
         operations.rename_table(telegram_settings_1.name, telegram_settings_0.name)
@@ -74,6 +83,22 @@ class TelegramNotifierPlugin(NotifierPlugin):
     _remove_tags_regex = re.compile(u"</?[a-z]+>", re.IGNORECASE)
     _telegram_api_format = 'https://api.telegram.org/bot{0}/{1}'
     settings_fields = ['chat_ids', 'access_token']
+    max_message_length = 4096
+    # telegram bot limits: 30 messages per second overall, 1 message per second to the same chat
+    # and 20 messages per minute to the same group, rate limits are applied per chat by notifier itself
+    global_rate = 30
+    chat_rate = 1
+    group_rate = 20 / 60.0
+    max_concurrent_sends = 8
+    max_retries = 2
+    max_retry_after = 60
+
+    def __init__(self):
+        NotifierPlugin.__init__(self)
+        self._lock = threading.Lock()
+        self._session = None
+        self._global_bucket = TokenBucket(self.global_rate, self.global_rate)
+        self._chat_buckets = dict()
 
     form = [{
         'type': 'row',
@@ -108,28 +133,104 @@ class TelegramNotifierPlugin(NotifierPlugin):
             text = text + '\n' + url
         text = self._remove_tags(text)
 
-        chat_ids = [c.strip() for c in settings.chat_ids.split(',')]
-        errors_chat_ids = None
-        for chat_id in chat_ids:
-            parameters = {
-                u'chat_id': chat_id,
-                u'text': text,
-            }
-
-            request = requests.post(api_url, data=parameters)
+        chat_ids = []
+        for chat_id in (c.strip() for c in settings.chat_ids.split(',')):
+            if chat_id not in chat_ids:
+                chat_ids.append(chat_id)
 
-            if request.status_code != 200:
-                if errors_chat_ids is None:
-                    errors_chat_ids = []
-                errors_chat_ids.append(chat_id)
+        errors_chat_ids = [chat_id for chat_id, sent in zip(chat_ids, self._send_all(api_url, chat_ids, text))
+                           if not sent]
 
-        if errors_chat_ids is not None and len(errors_chat_ids) > 0:
+        if len(errors_chat_ids) > 0:
             raise TelegramException(2, 'Failed to send Telegram notification to {0}'.format(errors_chat_ids))
 
         return True
 
+    def _send_all(self, api_url, chat_ids, text):
+        """
+        Send message to all chats concurrently
+
+        :rtype: list[bool]
+        """
+        if len(chat_ids) == 1:
+            return [self._send(api_url, chat_ids[0], text)]
+
+        results = dict()
+        tasks = queue.Queue()
+        for chat_id in chat_ids:
+            tasks.put(chat_id)
+
+        def send_worker():
+            while True:
+                try:
+                    task_chat_id = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                results[task_chat_id] = self._send(api_url, task_chat_id, text)
+
+        workers = [threading.Thread(target=send_worker) for _ in range(min(self.max_concurrent_sends, len(chat_ids)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return [results.get(chat_id, False) for chat_id in chat_ids]
+
+    def _send(self, api_url, chat_id, text):
+        parameters = {
+            u'chat_id': chat_id,
+            u'text': text,
+        }
+        chat_bucket = self._get_chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            self._global_bucket.acquire()
+            chat_bucket.acquire()
+            # noinspection PyBroadException
+            try:
+                response = self._get_session().post(api_url, data=parameters, timeout=self.timeout)
+            except Exception:
+                log.warning("Failed to send Telegram notification", chat_id=chat_id, exc_info=True)
+                return False
+            if response.status_code != 429:
+                return response.status_code == 200
+
+            retry_after = self._get_retry_after(response)
+            if attempt == self.max_retries or retry_after > self.max_retry_after:
+                break
+            log.info("Telegram rate limit exceeded", chat_id=chat_id, retry_after=retry_after)
+            chat_bucket.suspend(retry_after)
+        return False
+
+    @staticmethod
+    def _get_retry_after(response):
+        # noinspection PyBroadException
+        try:
+            return float(response.json()['parameters']['retry_after'])
+        except Exception:
+            return 1
+
+    def _get_chat_bucket(self, chat_id):
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                # group chat ids are negative
+                if chat_id.startswith('-'):
+                    bucket = TokenBucket(self.group_rate, 20)
+                else:
+                    bucket = TokenBucket(self.chat_rate, 1)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent_sends)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
     def _remove_tags(self, text):
         return self._remove_tags_regex.sub(u"", text)
 
 
-register_plugin('notifier', 'telegram', TelegramNotifierPlugin(), upgrade)
+register_plugin('notifier', 'telegram', TelegramNotifierPlugin(), upgrade, schema_version=1)
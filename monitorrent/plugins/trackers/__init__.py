@@ -2,6 +2,8 @@ import abc
 import html
 import six
 import pprint
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
 from monitorrent.db import DBSession, row2dict, dict2row
 from monitorrent.plugins import Topic
@@ -22,8 +24,44 @@ class TrackerSettings(object):
         return {'timeout': self.requests_timeout, 'proxies': self.proxies}
 
 
+class TopicsBatch(object):
+    """
+    Unit of work for one tracker execute.
+    Collects topics updates and persists them in one transaction on commit,
+    commit has to be called before any side effect (like adding torrent to client)
+    """
+    def __init__(self, topic_class):
+        self.topic_class = topic_class
+        self._updates = OrderedDict()
+
+    def __len__(self):
+        return len(self._updates)
+
+    def save_topic(self, topic):
+        # take a snapshot, so later in-memory changes of topic won't be saved without save_topic call
+        self._updates[topic.id] = row2dict(topic)
+
+    def save_status(self, topic_id, status):
+        self._updates.setdefault(topic_id, {'id': topic_id})['status'] = status
+
+    def commit(self):
+        if len(self._updates) == 0:
+            return
+        with DBSession() as db:
+            db.bulk_update_mappings(self.topic_class, list(self._updates.values()))
+        self._updates.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # already processed topics should be saved even if execute failed
+        self.commit()
+
+
 class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
     tracker_settings = None
+    topics_batch = None
     topic_class = Topic
     topic_public_fields = ['id', 'url', 'last_update', 'display_name', 'status']
     topic_private_fields = ['display_name']
@@ -69,10 +107,26 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
         parsed_url = self.parse_url(url)
         if not parsed_url:
             return None
-        settings = {
-            'display_name': self._get_display_name(parsed_url),
-        }
-        return settings
+        return self._get_default_settings(parsed_url)
+
+    def create_topic(self, url, params=None):
+        """
+        Parse url and create new not persisted topic,
+        settings missed in params are filled with tracker defaults
+
+        :type url: str
+        :type params: dict | None
+        :rtype: Topic | None
+        """
+        parsed_url = self.parse_url(url)
+        if parsed_url is None:
+            return None
+        settings = self._get_default_settings(parsed_url)
+        if params:
+            settings.update(params)
+        topic = self.topic_class(url=url)
+        self._set_topic_params(url, parsed_url, topic, settings)
+        return topic
 
     def add_topic(self, url, params):
         """
@@ -103,11 +157,33 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
             db.expunge_all()
         return topics
 
+    @contextmanager
+    def start_topics_batch(self):
+        """
+        Start unit of work for tracker execute, save_topic and save_status calls will be collected
+        and persisted on batch commit or exit
+
+        :rtype: TopicsBatch
+        """
+        self.topics_batch = TopicsBatch(self.topic_class)
+        try:
+            with self.topics_batch as topics_batch:
+                yield topics_batch
+        finally:
+            self.topics_batch = None
+
     def save_topic(self, topic, last_update, status=Status.Ok):
         if not isinstance(topic, self.topic_class):
             raise Exception(u"Can't update topic of wrong class. Expected {0}, but was {1}"
                             .format(self.topic_class, topic.__class__))
 
+        if self.topics_batch is not None:
+            if last_update is not None:
+                topic.last_update = last_update
+            topic.status = status
+            self.topics_batch.save_topic(topic)
+            return
+
         with DBSession() as db:
             new_topic = topic
             if last_update is not None:
@@ -118,6 +194,10 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
             db.expunge(new_topic)
 
     def save_status(self, topic_id, status):
+        if self.topics_batch is not None:
+            self.topics_batch.save_status(topic_id, status)
+            return
+
         with DBSession() as db:
             topic = db.query(self.topic_class).filter(Topic.id == topic_id).first()
             topic.status = status
@@ -161,6 +241,15 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
         """
         """
 
+    def _get_default_settings(self, parsed_url):
+        """
+        :type parsed_url: dict
+        :rtype: dict
+        """
+        return {
+            'display_name': self._get_display_name(parsed_url),
+        }
+
     def _get_display_name(self, parsed_url):
         """
         :type parsed_url: dict
@@ -202,7 +291,7 @@ class ExecuteWithHashChangeMixin(TrackerPluginMixinBase):
         :type engine: engine.EngineTracker
         :return: None
         """
-        with engine.start(len(topics)) as engine_topics:
+        with engine.start(len(topics)) as engine_topics, self.start_topics_batch() as topics_batch:
             for i in range(0, len(topics)):
                 topic = topics[i]
                 topic_name = topic.display_name
@@ -241,6 +330,7 @@ class ExecuteWithHashChangeMixin(TrackerPluginMixinBase):
                     old_hash = topic.hash
                     if torrent.info_hash != old_hash:
                         with engine_topic.start(1) as engine_downloads:
+                            topics_batch.commit()
                             last_update = engine_downloads.add_torrent(0, filename, torrent, old_hash,
                                                                        TopicSettings.from_topic(topic))
                             engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name), torrent_content)
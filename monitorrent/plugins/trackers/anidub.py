@@ -202,11 +202,13 @@ class AnidubPlugin(WithCredentialsMixin, ExecuteWithHashChangeMixin, TrackerPlug
             return None
         # format list
         self.topic_form[0]['content'][1]['options'] = parsed_url['format_list']
-        settings = {
+        return self._get_default_settings(parsed_url)
+
+    def _get_default_settings(self, parsed_url):
+        return {
             'display_name': parsed_url['original_name'],
             'format': parsed_url['format_list'][0]
         }
-        return settings
 
     def _set_topic_params(self, url, parsed_url, topic, params):
         """
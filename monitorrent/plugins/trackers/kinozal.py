@@ -292,4 +292,4 @@ class KinozalPlugin(WithCredentialsMixin, ExecuteWithHashChangeMixin, TrackerPlu
         return request.prepare()
 
 
-register_plugin('tracker', PLUGIN_NAME, KinozalPlugin(), upgrade)
+register_plugin('tracker', PLUGIN_NAME, KinozalPlugin(), upgrade, schema_version=1)
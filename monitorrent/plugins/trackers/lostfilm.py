@@ -6,8 +6,8 @@ import traceback
 import six
 from enum import Enum
 from requests import Response
-from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
-from monitorrent.db import Base, DBSession, UTCDateTime, row2dict
+from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey, select
+from monitorrent.db import Base, DBSession, UTCDateTime
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent, is_torrent_content
@@ -44,6 +44,9 @@ class LostFilmTVCredentials(Base):
     default_quality = Column(String, nullable=False, server_default='SD')
 
 
+old_url_re = re.compile(six.text_type(r'https?://(www|old)\.lostfilm\.tv/browse\.php\?cat=_?(?P<cat>\d+)'), re.UNICODE)
+
+
 # noinspection PyUnusedLocal
 def upgrade(engine, operations_factory):
     if not engine.dialect.has_table(engine.connect(), LostFilmTVSeries.__tablename__):
@@ -148,68 +151,31 @@ def upgrade_3_to_4(engine, operations_factory):
                                    Column('session', String),
                                    Column('default_quality', String, nullable=False, server_default='SD'))
 
-    cat_re = re.compile(six.text_type(r'https?://(www|old)\.lostfilm\.tv/browse\.php\?cat=_?(?P<cat>\d+)'), re.UNICODE)
-
-    from monitorrent.settings_manager import SettingsManager
-    settings_manager = SettingsManager()
-
-    tracker_settings = None
-
     with operations_factory() as operations:
         # if previuos run fails, it can not delete this table
         if operations.has_table(lostfilm_series_4.name):
             operations.drop_table(lostfilm_series_4.name)
         operations.create_table(lostfilm_series_4)
 
-        lostfilm_topics = operations.db.query(lostfilm_series_3)
-        topics = operations.db.query(topic_last)
-        topics = [row2dict(t, topic_last) for t in topics]
-        topics = {t['id']: t for t in topics}
-        for topic in lostfilm_topics:
-            raw_lostfilm_topic = row2dict(topic, lostfilm_series_3)
-            raw_topic = topics[raw_lostfilm_topic['id']]
-            match = cat_re.match(raw_topic['url'])
-
-            topic_values = {}
+        topic_urls = dict(operations.db.execute(select([topic_last.c.id, topic_last.c.url])).fetchall())
+        error_ids = []
 
+        def topic_mapping(raw_lostfilm_topic):
+            url = topic_urls[raw_lostfilm_topic['id']]
+            match = old_url_re.match(url)
             if not match:
-                print("can't parse old url: {0}".format(raw_topic['url']))
+                print("can't parse old url: {0}".format(url))
                 raw_lostfilm_topic['cat'] = 0
-                topic_values['status'] = Status.Error
+                error_ids.append(raw_lostfilm_topic['id'])
             else:
-                cat = int(match.group('cat'))
-                raw_lostfilm_topic['cat'] = cat
-
-                try:
-                    if tracker_settings is None:
-                        tracker_settings = settings_manager.tracker_settings
-
-                    old_url = 'https://www.lostfilm.tv/browse.php?cat={0}'.format(cat)
-                    url_response = requests.get(old_url, **tracker_settings.get_requests_kwargs())
+                raw_lostfilm_topic['cat'] = int(match.group('cat'))
+            return raw_lostfilm_topic
 
-                    soup = get_soup(url_response.text)
-                    meta_content = soup.find('meta').attrs['content']
-                    redirect_url = meta_content.split(';')[1].strip()[4:]
-
-                    if redirect_url.startswith('/'):
-                        redirect_url = redirect_url[1:]
-
-                    redirect_url = u'http://www.lostfilm.tv/{0}'.format(redirect_url)
-                    url = LostFilmShow.get_seasons_url(redirect_url)
-
-                    if url is None:
-                        raise Exception("Can't parse url from {0} it was redirected to {1}"
-                                        .format(old_url, redirect_url))
-
-                    topic_values['url'] = url
-                except:
-                    exc_info = sys.exc_info()
-                    print(u''.join(traceback.format_exception(*exc_info)))
-                    topic_values['status'] = Status.Error
-
-            operations.db.execute(lostfilm_series_4.insert(), raw_lostfilm_topic)
-            operations.db.execute(topic_last.update(whereclause=(topic_last.c.id == raw_topic['id']),
-                                                    values=topic_values))
+        operations.copy_table(lostfilm_series_3, lostfilm_series_4, topic_mapping)
+        for i in range(0, len(error_ids), operations.batch_size):
+            operations.db.execute(topic_last.update()
+                                  .where(topic_last.c.id.in_(error_ids[i:i + operations.batch_size]))
+                                  .values(status=Status.Error))
 
         # drop original table
         operations.drop_table(lostfilm_series_3.name)
@@ -220,10 +186,7 @@ def upgrade_3_to_4(engine, operations_factory):
         if operations.has_table(lostfilm_credentials_4.name):
             operations.drop_table(lostfilm_credentials_4.name)
         operations.create_table(lostfilm_credentials_4)
-        credentials = list(operations.db.query(lostfilm_credentials_3))
-        for credential in credentials:
-            raw_credential = row2dict(credential, lostfilm_credentials_3)
-            operations.db.execute(lostfilm_credentials_4.insert(), raw_credential)
+        operations.copy_table(lostfilm_credentials_3, lostfilm_credentials_4)
 
         # drop original table
         operations.drop_table(lostfilm_credentials_3.name)
@@ -231,6 +194,64 @@ def upgrade_3_to_4(engine, operations_factory):
         operations.rename_table(lostfilm_credentials_4.name, lostfilm_credentials_3.name)
 
 
+# noinspection PyUnusedLocal
+def post_upgrade(engine, operations_factory):
+    """
+    Version 4 topics still have old urls, new url has to be requested from lostfilm.tv for every topic.
+    It is too slow for upgrade on start, so it is executed in background after upgrade.
+    """
+    m4 = MetaData()
+    topic_last = Table('topics', m4, *[c.copy() for c in Topic.__table__.columns])
+
+    from monitorrent.settings_manager import SettingsManager
+    settings_manager = SettingsManager()
+
+    tracker_settings = None
+
+    with DBSession() as db:
+        topics = db.execute(select([topic_last.c.id, topic_last.c.url])
+                            .where(topic_last.c.type == PLUGIN_NAME)
+                            .where(topic_last.c.url.like('%lostfilm.tv/browse.php?cat=%'))).fetchall()
+
+    for topic_id, old_topic_url in topics:
+        match = old_url_re.match(old_topic_url)
+        if not match:
+            continue
+        cat = int(match.group('cat'))
+        topic_values = {}
+
+        try:
+            if tracker_settings is None:
+                tracker_settings = settings_manager.tracker_settings
+
+            old_url = 'https://www.lostfilm.tv/browse.php?cat={0}'.format(cat)
+            url_response = requests.get(old_url, **tracker_settings.get_requests_kwargs())
+
+            soup = get_soup(url_response.text)
+            meta_content = soup.find('meta').attrs['content']
+            redirect_url = meta_content.split(';')[1].strip()[4:]
+
+            if redirect_url.startswith('/'):
+                redirect_url = redirect_url[1:]
+
+            redirect_url = u'http://www.lostfilm.tv/{0}'.format(redirect_url)
+            url = LostFilmShow.get_seasons_url(redirect_url)
+
+            if url is None:
+                raise Exception("Can't parse url from {0} it was redirected to {1}"
+                                .format(old_url, redirect_url))
+
+            topic_values['url'] = url
+        except:
+            exc_info = sys.exc_info()
+            print(u''.join(traceback.format_exception(*exc_info)))
+            topic_values['status'] = Status.Error
+
+        # every topic is updated in own short transaction, so database isn't locked during network requests
+        with DBSession() as db:
+            db.execute(topic_last.update().where(topic_last.c.id == topic_id).values(**topic_values))
+
+
 class LostFilmTVException(Exception):
     pass
 
@@ -668,9 +689,12 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         return result
 
     def prepare_add_topic(self, url):
-        parsed_url = self.tracker.parse_url(url)
-        if parsed_url is None or isinstance(parsed_url, Response):
+        parsed_url = self.parse_url(url)
+        if parsed_url is None:
             return None
+        return self._get_default_settings(parsed_url)
+
+    def _get_default_settings(self, parsed_url):
         with DBSession() as db:
             cred = db.query(self.credentials_class).first()
             quality = cred.default_quality if cred else 'SD'
@@ -728,7 +752,7 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         if not self._execute_login(engine):
             return
 
-        with engine.start(len(topics)) as engine_topics:
+        with engine.start(len(topics)) as engine_topics, self.start_topics_batch() as topics_batch:
             for i in range(0, len(topics)):
                 topic = topics[i]
                 display_name = topic.display_name
@@ -781,6 +805,7 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
                             torrent = Torrent(torrent_content)
                             topic.season = info.season
                             topic.episode = info.number
+                            topics_batch.commit()
                             last_update = engine_downloads.add_torrent(e, filename, torrent, None,
                                                                        TopicSettings.from_topic(topic))
                             engine_downloads.downloaded(u'Download new series: {0} ({1}, {2})'
@@ -855,4 +880,5 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
             topic.cat = parsed_url.cat
 
 
-register_plugin('tracker', PLUGIN_NAME, LostFilmPlugin(), upgrade=upgrade)
+register_plugin('tracker', PLUGIN_NAME, LostFilmPlugin(), upgrade=upgrade, schema_version=4,
+                post_upgrade=post_upgrade, post_upgrade_version=1)
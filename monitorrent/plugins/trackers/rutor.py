@@ -6,7 +6,7 @@ from builtins import object
 import re
 import requests
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
-from monitorrent.db import row2dict, UTCDateTime
+from monitorrent.db import UTCDateTime
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent
 from monitorrent.plugin_managers import register_plugin
@@ -89,10 +89,7 @@ def upgrade_1_to_2(operations_factory):
                           Column("hash", String, nullable=True))
     with operations_factory() as operations:
         operations.create_table(rutor_topic_2)
-        topics = operations.db.query(rutor_topic_1)
-        for topic in topics:
-            raw_topic = row2dict(topic, rutor_topic_1)
-            operations.db.execute(rutor_topic_2.insert(), raw_topic)
+        operations.copy_table(rutor_topic_1, rutor_topic_2)
         operations.drop_table(rutor_topic_1)
         operations.rename_table(rutor_topic_2.name, rutor_topic_1.name)
 
@@ -180,4 +177,4 @@ class RutorOrgPlugin(ExecuteWithHashChangeMixin, TrackerPluginBase):
         return self.tracker.check_download(response)
 
 
-register_plugin('tracker', PLUGIN_NAME, RutorOrgPlugin(), upgrade=upgrade)
+register_plugin('tracker', PLUGIN_NAME, RutorOrgPlugin(), upgrade=upgrade, schema_version=2)
@@ -6,7 +6,6 @@ import re
 from urllib.parse import urlparse
 import requests
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
-from monitorrent.db import row2dict
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.plugins import Topic
 from monitorrent.plugins.trackers import TrackerPluginBase, ExecuteWithHashChangeMixin
@@ -57,10 +56,7 @@ def upgrade_0_to_1(operations_factory):
                                     Column("hash", String, nullable=True))
     with operations_factory() as operations:
         operations.create_table(unionpeer_topic_table_1)
-        topics = operations.db.query(unionpeer_topic_table_0)
-        for topic in topics:
-            raw_topic = row2dict(topic, unionpeer_topic_table_0)
-            operations.db.execute(unionpeer_topic_table_1.insert(), raw_topic)
+        operations.copy_table(unionpeer_topic_table_0, unionpeer_topic_table_1)
         operations.drop_table(unionpeer_topic_table_0)
         operations.rename_table(unionpeer_topic_table_1.name, unionpeer_topic_table_0.name)
 
@@ -147,4 +143,4 @@ class UnionpeerOrgPlugin(ExecuteWithHashChangeMixin, TrackerPluginBase):
         return self.tracker.get_download_url(topic.url)
 
 
-register_plugin('tracker', PLUGIN_NAME, UnionpeerOrgPlugin(), upgrade=upgrade)
+register_plugin('tracker', PLUGIN_NAME, UnionpeerOrgPlugin(), upgrade=upgrade, schema_version=1)
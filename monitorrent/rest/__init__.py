@@ -2,10 +2,14 @@
 init code for run falcon API
 """
 import json
+import zlib
 import datetime
+import threading
+from collections import OrderedDict
 import falcon
 from enum import Enum
 from itsdangerous import JSONWebSignatureSerializer, BadSignature
+from monitorrent.db import data_version
 
 
 class MonitorrentJSONEncoder(json.JSONEncoder):
@@ -76,7 +80,12 @@ class JSONTranslator(object):
         if resp.json is None:
             return
 
-        resp.body = json.dumps(resp.json, cls=MonitorrentJSONEncoder, ensure_ascii=False)
+        resp.body = self.serialize(resp.json)
+
+    @staticmethod
+    def serialize(value):
+        """serialize value to json string"""
+        return json.dumps(value, cls=MonitorrentJSONEncoder, ensure_ascii=False)
 
 
 # noinspection PyMethodMayBeStatic,PyMethodMayBeStatic,PyUnusedLocal
@@ -89,6 +98,13 @@ class AuthMiddleware(object):
     serializer = None
     token = None
     auth_enabled = None
+    settings_generation = None
+    max_verified_tokens = 64
+
+    # verified cookies and auth_enabled value are valid while settings_generation isn't changed
+    _verified_tokens = frozenset()
+    _auth_enabled_value = None
+    _generation = None
 
     # pylint: disable=W0613
     def process_resource(self, req, resp, resource, params):
@@ -105,18 +121,40 @@ class AuthMiddleware(object):
     @classmethod
     def validate_auth(cls, req):
         """check if auth_enabled and JWT token from request is valid"""
-        auth_enabled = cls.auth_enabled
-        if auth_enabled is not None and not auth_enabled():
+        if not cls.is_auth_enabled():
             return True
 
         jwt = req.cookies.get(cls.cookie_name, None)
         if jwt is None:
             return False
+        if jwt in cls._verified_tokens:
+            return True
         try:
             value = cls.serializer.loads(jwt)
-            return value == cls.token
         except BadSignature:
             return False
+        if value != cls.token:
+            return False
+
+        verified_tokens = cls._verified_tokens if len(cls._verified_tokens) < cls.max_verified_tokens else frozenset()
+        cls._verified_tokens = verified_tokens | {jwt}
+        return True
+
+    @classmethod
+    def is_auth_enabled(cls):
+        """check auth_enabled, value is reused until settings_generation is changed"""
+        auth_enabled = cls.auth_enabled
+        if auth_enabled is None:
+            return True
+        if cls.settings_generation is None:
+            return auth_enabled()
+
+        generation = cls.settings_generation()
+        if generation != cls._generation:
+            cls._verified_tokens = frozenset()
+            cls._auth_enabled_value = auth_enabled()
+            cls._generation = generation
+        return cls._auth_enabled_value
 
     @classmethod
     def authenticate(cls, resp):
@@ -131,14 +169,27 @@ class AuthMiddleware(object):
                         expires=datetime.datetime.utcfromtimestamp(0))
 
     @classmethod
-    def init(cls, secret_key, token, auth_enabled):
-        """init middleware"""
+    def init(cls, secret_key, token, auth_enabled, settings_generation=None):
+        """
+        init middleware
+
+        :param auth_enabled: callable which returns is authentication enabled
+        :param settings_generation: callable which returns value changed on every settings write,
+            if it is specified auth_enabled is called only after settings were changed
+        """
         cls.serializer = JSONWebSignatureSerializer(secret_key)
         cls.token = token
         if auth_enabled is not None:
             cls.auth_enabled = classmethod(lambda lcls: auth_enabled())
         else:
             cls.auth_enabled = None
+        if settings_generation is not None:
+            cls.settings_generation = classmethod(lambda lcls: settings_generation())
+        else:
+            cls.settings_generation = None
+        cls._verified_tokens = frozenset()
+        cls._auth_enabled_value = None
+        cls._generation = None
 
 
 def no_auth(obj):
@@ -147,10 +198,198 @@ def no_auth(obj):
     return obj
 
 
-def create_api(disable_auth=False):
-    """create falcon API with Json and Auth middlewares"""
+# noinspection PyMethodMayBeStatic,PyUnusedLocal
+class ETagMiddleware(object):
+    """
+    falcon middleware for conditional GET requests of resources marked with versioned decorator.
+
+    Response of versioned resource depends only on database data, so ETag is built from database data version.
+    Serialized body is cached per url and version, request with matched If-None-Match gets 304 Not Modified.
+    """
+
+    def __init__(self, max_cache_size=256):
+        self.max_cache_size = max_cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _etag(version):
+        return '"{0}-{1}"'.format(data_version.epoch, version)
+
+    @staticmethod
+    def _cache_key(req):
+        return req.path, req.query_string
+
+    # pylint: disable=W0613
+    def process_resource(self, req, resp, resource, params):
+        """
+        return 304 or cached body if data wasn't changed since last request
+        """
+        if req.method != 'GET' or not getattr(resource, '__versioned__', False):
+            return
+
+        # version has to be read before data, so data changed during request will produce new version
+        version = data_version.value
+        etag = self._etag(version)
+        req.context['data_version'] = version
+
+        if_none_match = req.get_header('If-None-Match')
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            if '*' in tags or etag in tags or 'W/' + etag in tags:
+                raise falcon.HTTPStatus(falcon.HTTP_NOT_MODIFIED, headers={'ETag': etag})
+
+        with self._lock:
+            cached = self._cache.get(self._cache_key(req))
+        if cached is not None and cached[0] == version:
+            raise falcon.HTTPStatus(falcon.HTTP_OK, body=cached[1],
+                                    headers={'ETag': etag, 'Cache-Control': 'no-cache',
+                                             'Content-Type': falcon.MEDIA_JSON})
+
+    # pylint: disable=W0613
+    def process_response(self, req, resp, resource):
+        """
+        serialize and cache body of versioned resource and set ETag header
+        """
+        version = req.context.get('data_version')
+        if version is None or resp.json is None or resp.status != falcon.HTTP_OK:
+            return
+
+        body = JSONTranslator.serialize(resp.json)
+        resp.json = None
+        resp.body = body
+        resp.set_header('ETag', self._etag(version))
+        resp.set_header('Cache-Control', 'no-cache')
+
+        with self._lock:
+            key = self._cache_key(req)
+            self._cache.pop(key, None)
+            self._cache[key] = (version, body)
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+
+
+# noinspection PyMethodMayBeStatic,PyUnusedLocal
+class CompressionMiddleware(object):
+    """
+    falcon middleware for gzip or deflate compression of json responses negotiated by Accept-Encoding header.
+
+    Bodies smaller than min_size are sent as is, bodies larger than stream_size are compressed
+    by chunks while they are sent to client.
+    """
+
+    DEFAULT_LEVEL = 6
+    content_types = ('application/json',)
+    # wbits for zlib: gzip header and trailer for gzip, zlib wrapper for HTTP deflate
+    encodings = OrderedDict([('gzip', 16 + zlib.MAX_WBITS), ('deflate', zlib.MAX_WBITS)])
+
+    def __init__(self, level=DEFAULT_LEVEL, min_size=1024, stream_size=256 * 1024, chunk_size=64 * 1024):
+        self.level = level
+        self.min_size = min_size
+        self.stream_size = stream_size
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def parse_accept_encoding(accept_encoding):
+        """
+        :return: dict of encoding qualities from Accept-Encoding header value
+        :rtype: dict[str, float]
+        """
+        qualities = dict()
+        if not accept_encoding:
+            return qualities
+
+        for item in accept_encoding.split(','):
+            parts = item.split(';')
+            name = parts[0].strip().lower()
+            quality = 1.0
+            for param in parts[1:]:
+                key, _, value = param.strip().partition('=')
+                if key.strip() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[name] = quality
+        return qualities
+
+    @classmethod
+    def select_encoding(cls, accept_encoding, encodings=None):
+        """
+        :param encodings: acceptable encodings in preference order, all supported encodings by default
+        :return: the best encoding from Accept-Encoding header value or None
+        """
+        qualities = cls.parse_accept_encoding(accept_encoding)
+
+        best_encoding, best_quality = None, 0.0
+        for encoding in encodings or cls.encodings:
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if quality > best_quality:
+                best_encoding, best_quality = encoding, quality
+        return best_encoding
+
+    # pylint: disable=W0613
+    def process_response(self, req, resp, resource):
+        """
+        compress serialized response body
+        """
+        if req.method == 'HEAD' or resp.stream is not None or resp.get_header('Content-Encoding') is not None:
+            return
+
+        content_type = resp.content_type or falcon.MEDIA_JSON
+        if not content_type.split(';')[0].strip().lower() in self.content_types:
+            return
+
+        if resp.body is not None:
+            body = resp.body.encode('utf-8') if not isinstance(resp.body, bytes) else resp.body
+        else:
+            body = resp.data
+        if body is None or len(body) < self.min_size:
+            return
+
+        encoding = self.select_encoding(req.get_header('Accept-Encoding'))
+        resp.append_header('Vary', 'Accept-Encoding')
+        if encoding is None:
+            return
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.encodings[encoding])
+        resp.body = None
+        if len(body) > self.stream_size:
+            resp.data = None
+            resp.stream = self._compress_stream(compressor, body)
+        else:
+            resp.data = compressor.compress(body) + compressor.flush()
+        resp.set_header('Content-Encoding', encoding)
+
+        # compressed representation isn't byte to byte equal to original one
+        etag = resp.get_header('ETag')
+        if etag is not None and not etag.startswith('W/'):
+            resp.set_header('ETag', 'W/' + etag)
+
+    def _compress_stream(self, compressor, body):
+        for offset in range(0, len(body), self.chunk_size):
+            chunk = compressor.compress(body[offset:offset + self.chunk_size])
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+
+def versioned(obj):
+    """decorator for enable ETag and cache for resource which depends only on database data"""
+    obj.__versioned__ = True
+    return obj
+
+
+def create_api(disable_auth=False, compression_level=CompressionMiddleware.DEFAULT_LEVEL):
+    """create falcon API with Compression, Json, Auth and ETag middlewares"""
     middleware = list()
+    if compression_level:
+        # added first, so its process_response is called last with already serialized body
+        middleware.append(CompressionMiddleware(compression_level))
     middleware.append(JSONTranslator())
     if not disable_auth:
         middleware.append(AuthMiddleware())
+    # added after auth, so cached responses are returned only for authenticated requests
+    # and its process_response is called before JSONTranslator one
+    middleware.append(ETagMiddleware())
     return falcon.API(request_type=MonitorrentRequest, response_type=MonitorrentResponse, middleware=middleware)
@@ -5,11 +5,13 @@ import structlog
 
 from monitorrent.plugin_managers import ClientsManager
 from monitorrent.settings_manager import SettingsManager
+from monitorrent.rest import versioned
 
 log = structlog.get_logger()
 
 
 # noinspection PyUnusedLocal
+@versioned
 class ClientCollection(object):
     def __init__(self, clients_manager):
         """
@@ -1,10 +1,12 @@
 from builtins import object
+import json
 import time
 import falcon
 import structlog
 
 from monitorrent.plugins.status import Status
-from monitorrent.engine import EngineRunner, ExecuteLogManager
+from monitorrent.engine import EngineRunner, ExecuteLogManager, TooManyWaitersException
+from monitorrent.rest import MonitorrentJSONEncoder
 
 log = structlog.get_logger()
 
@@ -21,14 +23,17 @@ class ExecuteLogCurrent(object):
         try:
             after = req.get_param_as_int('after', required=False)
 
-            start = time.time()
-            result = []
+            deadline = time.time() + 30
             while True:
+                sequence = self.log_manager.sequence
                 result = self.log_manager.get_current_execute_log_details(after) or []
-                if len(result) == 0 and time.time() - start < 30:
-                    time.sleep(0.1)
-                else:
+                if len(result) > 0:
                     break
+                timeout = deadline - time.time()
+                if timeout <= 0 or not self.log_manager.wait_for_changes(sequence, timeout):
+                    break
+        except TooManyWaitersException as e:
+            raise falcon.HTTPServiceUnavailable('Too many waiting clients', str(e), e.retry_after)
         except Exception as e:
             log.error("An error has occurred", exception=str(e))
             raise falcon.HTTPInternalServerError(title='A server has encountered an error', description=str(e))
@@ -36,6 +41,78 @@ class ExecuteLogCurrent(object):
         resp.json = {'is_running': self.log_manager.is_running(), 'logs': result}
 
 
+# noinspection PyUnusedLocal
+class ExecuteEvents(object):
+    """
+    Server-Sent Events stream of execute progress, trackers and log entries.
+
+    Stream is closed when nothing happens for wait_timeout seconds or when too many clients
+    are already waiting, browser reconnects after retry milliseconds with Last-Event-ID header,
+    so thread of idle server is not held forever and missed events are resent from memory buffer.
+    """
+    def __init__(self, log_manager, wait_timeout=30, retry=1000):
+        """
+        :type log_manager: ExecuteLogManager
+        """
+        self.log_manager = log_manager
+        self.wait_timeout = wait_timeout
+        self.retry = retry
+
+    def on_get(self, req, resp):
+        last_event_id = req.get_header('Last-Event-ID') or req.get_param('last_event_id')
+        if last_event_id is not None and not last_event_id.isdigit():
+            raise falcon.HTTPBadRequest("wrong Last-Event-ID", "Last-Event-ID should be int")
+
+        resp.content_type = 'text/event-stream; charset=utf-8'
+        resp.set_header('Cache-Control', 'no-cache')
+        # disable buffering in nginx reverse proxy
+        resp.set_header('X-Accel-Buffering', 'no')
+        resp.stream = self._events_stream(int(last_event_id) if last_event_id is not None else None)
+
+    def _events_stream(self, after):
+        yield self._format(retry=self.retry)
+
+        missed = False
+        if after is not None:
+            events, missed = self.log_manager.get_events(after)
+        if after is None or missed:
+            # client has to reload execute logs with regular REST api
+            after = self.log_manager.sequence
+            yield self._format('state', after, {'is_running': self.log_manager.is_running(),
+                                                'progress': self.log_manager.progress,
+                                                'reset': missed})
+
+        while True:
+            sequence = self.log_manager.sequence
+            events, missed = self.log_manager.get_events(after)
+            if missed:
+                # client was too slow and buffer was overwritten, reconnect will send new state
+                break
+            for event_id, event, data in events:
+                yield self._format(event, event_id, data)
+                after = event_id
+            try:
+                if len(events) == 0 and not self.log_manager.wait_for_changes(sequence, self.wait_timeout):
+                    break
+            except TooManyWaitersException as e:
+                # browser reconnects after retry, so it is delayed to not reconnect in loop
+                yield self._format(retry=e.retry_after * 1000)
+                break
+
+    @staticmethod
+    def _format(event=None, event_id=None, data=None, retry=None):
+        lines = []
+        if retry is not None:
+            lines.append(u'retry: {0}'.format(retry))
+        if event_id is not None:
+            lines.append(u'id: {0}'.format(event_id))
+        if event is not None:
+            lines.append(u'event: {0}'.format(event))
+        if data is not None:
+            lines.append(u'data: {0}'.format(json.dumps(data, cls=MonitorrentJSONEncoder, ensure_ascii=False)))
+        return (u'\n'.join(lines) + u'\n\n').encode('utf-8')
+
+
 # noinspection PyUnusedLocal
 class ExecuteCall(object):
     def __init__(self, engine_runner):
@@ -1,9 +1,14 @@
 from builtins import object
+import falcon
 from monitorrent.engine import ExecuteLogManager
+from monitorrent.rest import versioned
 
 
 # noinspection PyUnusedLocal
+@versioned
 class ExecuteLogs(object):
+    count_modes = ['exact', 'approximate', 'none']
+
     def __init__(self, log_manager):
         """
         :type log_manager: ExecuteLogManager
@@ -14,9 +19,17 @@ class ExecuteLogs(object):
         take = req.get_param_as_int('take', required=True, min=1, max=100)
         skip = req.get_param_as_int('skip', required=False, min=0) or 0
 
-        executes, count = self.log_manager.get_log_entries(skip, take)
+        params = {}
+        req.get_param_as_int('after', required=False, min=0, store=params)
+        req.get_param('count', required=False, store=params)
+        if params.get('count', 'exact') not in self.count_modes:
+            raise falcon.HTTPBadRequest("wrong count", "count should be one of: {0}"
+                                        .format(', '.join(self.count_modes)))
+
+        executes, count = self.log_manager.get_log_entries(skip, take, **params)
 
         resp.json = {
             'data': executes,
-            'count': count
+            'count': count,
+            'next': executes[-1].get('id') if len(executes) == take else None
         }
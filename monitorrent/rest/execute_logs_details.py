@@ -1,7 +1,7 @@
 from builtins import object
 import falcon
 import time
-from monitorrent.engine import ExecuteLogManager
+from monitorrent.engine import ExecuteLogManager, TooManyWaitersException
 
 
 # noinspection PyUnusedLocal
@@ -19,17 +19,25 @@ class ExecuteLogsDetails(object):
         execute_id = int(execute_id)
 
         after = req.get_param_as_int('after', required=False)
+        params = {}
+        req.get_param_as_int('take', required=False, min=1, max=1000, store=params)
 
         if after is not None:
-            start = time.time()
-            result = []
+            deadline = time.time() + 30
             while True:
-                result = self.log_manager.get_execute_log_details(execute_id, after) or []
-                if len(result) == 0 and time.time() - start < 30 and self.log_manager.is_running(execute_id):
-                    time.sleep(0.1)
-                else:
+                sequence = self.log_manager.sequence
+                result = self.log_manager.get_execute_log_details(execute_id, after, **params) or []
+                if len(result) > 0 or not self.log_manager.is_running(execute_id):
                     break
+                timeout = deadline - time.time()
+                try:
+                    if timeout <= 0 or not self.log_manager.wait_for_changes(sequence, timeout):
+                        break
+                except TooManyWaitersException as e:
+                    raise falcon.HTTPServiceUnavailable('Too many waiting clients', str(e), e.retry_after)
         else:
-            result = self.log_manager.get_execute_log_details(execute_id)
+            result = self.log_manager.get_execute_log_details(execute_id, **params)
 
         resp.json = {'is_running': self.log_manager.is_running(), 'logs': result}
+        if 'take' in params:
+            resp.json['next'] = result[-1].get('id') if len(result) == params['take'] else None
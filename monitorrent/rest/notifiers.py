@@ -6,11 +6,13 @@ from builtins import object
 
 import structlog
 from monitorrent.plugin_managers import NotifierManager
+from monitorrent.rest import versioned
 
 log = structlog.get_logger()
 
 
 # noinspection PyUnusedLocal
+@versioned
 class NotifierCollection(object):
     def __init__(self, notifier_manager):
         """
@@ -13,7 +13,10 @@ class SettingsLogs(object):
         self.settings_manager = settings_manager
 
     def on_get(self, req, resp):
-        resp.json = {'interval': self.settings_manager.remove_logs_interval}
+        resp.json = {
+            'interval': self.settings_manager.remove_logs_interval,
+            'max_size': self.settings_manager.remove_logs_max_size
+        }
 
     def on_put(self, req, resp):
         if req.json is None:
@@ -23,5 +26,11 @@ class SettingsLogs(object):
         if interval is None or not isinstance(interval, six.integer_types):
             raise falcon.HTTPBadRequest('WrongValue', '"interval" is required and have to be int')
 
+        max_size = req.json.get('max_size')
+        if max_size is not None and (not isinstance(max_size, six.integer_types) or max_size < 0):
+            raise falcon.HTTPBadRequest('WrongValue', '"max_size" have to be not negative int')
+
         self.settings_manager.remove_logs_interval = interval
+        if max_size is not None:
+            self.settings_manager.remove_logs_max_size = max_size
         resp.status = falcon.HTTP_NO_CONTENT
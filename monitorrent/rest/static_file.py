@@ -1,11 +1,17 @@
 from builtins import object
 import os
+import gzip
+import io
 import time
 import mimetypes
+from stat import S_ISREG
 import falcon
-from monitorrent.rest import no_auth, AuthMiddleware
+import structlog
+from monitorrent.rest import no_auth, AuthMiddleware, CompressionMiddleware
 from email.utils import formatdate, parsedate
 
+log = structlog.get_logger()
+
 
 @no_auth
 class StaticFiles(object):
@@ -60,3 +66,186 @@ class StaticFiles(object):
     def _get_static_info(file_path):
         mtime = os.stat(file_path).st_mtime
         return str(mtime), formatdate(mtime, usegmt=True)
+
+
+class StaticAsset(object):
+    """
+    Indexed static file with precomputed headers, small files content is kept in memory
+    """
+    def __init__(self, path, content_type, size, mtime):
+        self.path = path
+        self.content_type = content_type
+        self.size = size
+        self.mtime = mtime
+        self.etag = '"{0:x}-{1:x}"'.format(int(mtime * 1000), size)
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.data = None
+        self.gzip_data = None
+        self.gzip_path = None
+        self.gzip_size = None
+
+
+@no_auth
+class StaticAssets(object):
+    """
+    Serves static files from folder indexed on creation.
+
+    Files smaller than max_cached_size are kept in memory together with gzip variant,
+    gzip variant of bigger file is served only if it was prebuilt as file.gz near the original file.
+    Bigger files are streamed from disk, so WSGI server can use wsgi.file_wrapper (sendfile),
+    they are reindexed when their size or mtime is changed, and file missed in index is looked up on disk.
+    It can be used as falcon sink, so one instance serves all nested folders.
+    """
+    compressible_types = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                          'image/svg+xml')
+
+    def __init__(self, folder, aliases=None, public_files=None, max_cached_size=256 * 1024,
+                 compress_min_size=1024, max_age=86400):
+        """
+        :param aliases: dict of url path to file path, e.g. {'': 'index.html'}
+        :param public_files: file paths which can be requested without authentication,
+            request of other files without authentication is redirected to login page
+        """
+        self.folder = folder
+        self.aliases = aliases or {}
+        self.public_files = set(public_files or [])
+        self.max_cached_size = max_cached_size
+        self.compress_min_size = compress_min_size
+        self.max_age = max_age
+        self.assets = self._index()
+        self._root = os.path.realpath(folder)
+
+    def _index(self):
+        assets = dict()
+        cached_size = 0
+        for directory, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.folder).replace(os.path.sep, '/')
+                asset = self._create_asset(path)
+                assets[key] = asset
+                if asset.data is not None:
+                    cached_size += len(asset.data) + len(asset.gzip_data or b'')
+        log.info("Static files indexed", folder=self.folder, count=len(assets), cached_size=cached_size)
+        return assets
+
+    def _create_asset(self, path):
+        stat = os.stat(path)
+        mime_type, _ = mimetypes.guess_type(path)
+        asset = StaticAsset(path, mime_type or 'text/plain', stat.st_size, stat.st_mtime)
+
+        gzip_path = path + '.gz'
+        if os.path.isfile(gzip_path):
+            asset.gzip_path = gzip_path
+            asset.gzip_size = os.path.getsize(gzip_path)
+
+        if asset.size > self.max_cached_size:
+            return asset
+
+        with open(path, 'rb') as f:
+            asset.data = f.read()
+        if asset.gzip_path is not None and asset.gzip_size <= self.max_cached_size:
+            with open(asset.gzip_path, 'rb') as f:
+                asset.gzip_data = f.read()
+        elif asset.size >= self.compress_min_size and asset.content_type.startswith(self.compressible_types):
+            gzip_data = self._compress(asset.data)
+            if len(gzip_data) < asset.size:
+                asset.gzip_data = gzip_data
+        return asset
+
+    def _get_asset(self, key):
+        asset = self.assets.get(key)
+        if asset is not None and asset.data is not None:
+            return asset
+
+        path = os.path.realpath(os.path.join(self._root, key))
+        if not path.startswith(os.path.join(self._root, '')):
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or not S_ISREG(stat.st_mode):
+            self.assets.pop(key, None)
+            return None
+        if asset is not None and asset.size == stat.st_size and asset.mtime == stat.st_mtime:
+            return asset
+
+        asset = self._create_asset(path)
+        self.assets[key] = asset
+        log.info("Static file reindexed", path=key)
+        return asset
+
+    @staticmethod
+    def _compress(data):
+        buf = io.BytesIO()
+        # mtime=0 makes compressed content and its ETag stable between restarts
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(data)
+        return buf.getvalue()
+
+    def __call__(self, req, resp, **kwargs):
+        if req.method not in ('GET', 'HEAD'):
+            raise falcon.HTTPMethodNotAllowed(['GET', 'HEAD'])
+        self.on_get(req, resp)
+
+    def on_get(self, req, resp, **kwargs):
+        """
+        :type req: falcon.Request
+        :type resp: falcon.Response
+        """
+        key = req.path.strip('/')
+        key = self.aliases.get(key, key)
+        asset = self._get_asset(key)
+        if asset is None:
+            raise falcon.HTTPNotFound(description='Requested page not found')
+
+        if key not in self.public_files and not AuthMiddleware.validate_auth(req):
+            resp.status = falcon.HTTP_FOUND
+            # noinspection PyUnresolvedReferences
+            resp.location = '/login'
+            return
+
+        # noinspection PyUnresolvedReferences
+        resp.content_type = asset.content_type
+        resp.set_headers({'Date': formatdate(time.time(), usegmt=True),
+                          'ETag': asset.etag,
+                          'Last-Modified': asset.last_modified,
+                          'Cache-Control': 'max-age={0}'.format(self.max_age)})
+        has_gzip = asset.gzip_data is not None or asset.gzip_path is not None
+        if has_gzip:
+            resp.append_header('Vary', 'Accept-Encoding')
+
+        if_none_match = req.get_header('If-None-Match')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*' or asset.etag in if_none_match:
+                resp.status = falcon.HTTP_NOT_MODIFIED
+                return
+        else:
+            if_modified_since = req.get_header('If-Modified-Since')
+            modified_since = parsedate(if_modified_since) if if_modified_since else None
+            # unparseable date is ignored, like a missed header
+            if modified_since is not None and modified_since >= parsedate(asset.last_modified):
+                resp.status = falcon.HTTP_NOT_MODIFIED
+                return
+
+        use_gzip = has_gzip and \
+            CompressionMiddleware.select_encoding(req.get_header('Accept-Encoding'), ['gzip']) is not None
+        if use_gzip:
+            resp.set_header('Content-Encoding', 'gzip')
+
+        if use_gzip and asset.gzip_data is not None:
+            resp.data = asset.gzip_data
+        elif use_gzip:
+            self._set_stream(resp, asset.gzip_path)
+        elif asset.data is not None:
+            resp.data = asset.data
+        else:
+            self._set_stream(resp, asset.path)
+
+    @staticmethod
+    def _set_stream(resp, path):
+        stream = open(path, mode='rb')
+        # length of opened file, file can be replaced after it was indexed
+        resp.stream_len = os.fstat(stream.fileno()).st_size
+        resp.stream = stream
@@ -3,9 +3,12 @@ from builtins import object
 import falcon
 import six
 from monitorrent.plugin_managers import TrackersManager
+from monitorrent.plugins.status import Status
+from monitorrent.rest import versioned, JSONTranslator
 
 
 # noinspection PyUnusedLocal
+@versioned
 class TopicCollection(object):
     def __init__(self, tracker_manager):
         """
@@ -14,7 +17,35 @@ class TopicCollection(object):
         self.tracker_manager = tracker_manager
 
     def on_get(self, req, resp):
-        resp.json = self.tracker_manager.get_watching_topics()
+        params = {}
+        req.get_param('tracker', store=params)
+        req.get_param_as_list('statuses', transform=parse_status, store=params)
+        req.get_param_as_bool('paused', store=params)
+        req.get_param('search', store=params)
+        filters = dict(params)
+        req.get_param('order_by', store=params)
+        req.get_param_as_bool('desc', store=params)
+        if params.get('order_by', 'id') not in self.tracker_manager.topics_order_columns:
+            raise falcon.HTTPBadRequest("wrong order_by", "order_by should be one of: {0}"
+                                        .format(', '.join(sorted(self.tracker_manager.topics_order_columns))))
+
+        take = req.get_param_as_int('take', min=1, max=500)
+        after = req.get_param_as_int('after', min=0)
+        if take is None:
+            if after is not None:
+                raise falcon.HTTPBadRequest("wrong params", "after can be used only with take")
+            resp.json = self.tracker_manager.get_watching_topics(**params)
+            return
+
+        try:
+            topics = self.tracker_manager.get_watching_topics(take=take, after=after, **params)
+        except KeyError as e:
+            raise falcon.HTTPBadRequest("wrong after", "Topic from previous page was removed: {0}".format(e))
+        resp.json = {
+            'data': topics,
+            'count': self.tracker_manager.get_watching_topics_count(**filters),
+            'next': topics[-1]['id'] if len(topics) == take else None
+        }
 
     def on_post(self, req, resp):
         body = req.json
@@ -44,6 +75,50 @@ class TopicParse(object):
         resp.json = title
 
 
+class TopicBulk(object):
+    """
+    Add many topics at once, results are streamed back as newline delimited json
+    """
+    max_urls = 1000
+
+    def __init__(self, tracker_manager):
+        """
+        :type tracker_manager: TrackersManager
+        """
+        self.tracker_manager = tracker_manager
+
+    def on_post(self, req, resp):
+        body = req.json
+        if not isinstance(body, dict):
+            raise falcon.HTTPBadRequest('WrongParameters', 'Body has to be object')
+        urls = body.get('urls')
+        settings = body.get('settings') or {}
+        if not isinstance(urls, list) or not urls or not isinstance(settings, dict):
+            raise falcon.HTTPBadRequest('WrongParameters', '\'urls\' has to be not empty list')
+        if len(urls) > self.max_urls:
+            raise falcon.HTTPBadRequest('WrongParameters', 'Too many urls, max is {0}'.format(self.max_urls))
+        items = []
+        for url in urls:
+            if isinstance(url, dict):
+                url_settings = url.get('settings') or {}
+                url = url.get('url')
+                if not isinstance(url_settings, dict):
+                    raise falcon.HTTPBadRequest('WrongParameters', '\'settings\' has to be object')
+            else:
+                url_settings = None
+            if not isinstance(url, six.string_types) or not url:
+                raise falcon.HTTPBadRequest('WrongParameters', 'Url has to be not empty string')
+            items.append((url, url_settings))
+
+        resp.content_type = 'application/x-ndjson; charset=utf-8'
+        resp.stream = self._results_stream(self.tracker_manager.add_topics(items, settings))
+
+    @staticmethod
+    def _results_stream(results):
+        for result in results:
+            yield (JSONTranslator.serialize(result) + '\n').encode('utf-8')
+
+
 # noinspection PyUnusedLocal,PyShadowingBuiltins
 class Topic(object):
     def __init__(self, tracker_manager):
@@ -117,3 +192,87 @@ class TopicPauseState(object):
         if not updated:
             raise falcon.HTTPInternalServerError('ServerError', 'Can\'t reset topic {} status'.format(id))
         resp.status = falcon.HTTP_204
+
+
+def parse_status(name):
+    try:
+        return Status.parse(name)
+    except KeyError:
+        raise ValueError('Unknown status {0}'.format(name))
+
+
+def parse_topics_filter(body):
+    """
+    Parse topics selection from request body, all specified params are combined
+
+    :rtype: dict
+    """
+    if not isinstance(body, dict):
+        raise falcon.HTTPBadRequest('WrongParameters', 'Body has to be object')
+    params = {}
+    try:
+        ids = body.get('ids')
+        if ids is not None:
+            # bool is int too, but true/false can't be topic id
+            if not isinstance(ids, list) or \
+                    not all(isinstance(id, six.integer_types) and not isinstance(id, bool) for id in ids):
+                raise ValueError('ids has to be list of int')
+            params['ids'] = ids
+        tracker = body.get('tracker')
+        if tracker is not None:
+            if not isinstance(tracker, six.string_types):
+                raise ValueError('tracker has to be string')
+            params['tracker'] = six.text_type(tracker)
+        statuses = body.get('statuses')
+        if statuses is not None:
+            if not isinstance(statuses, list):
+                raise ValueError('statuses has to be list')
+            params['statuses'] = [parse_status(status) for status in statuses]
+    except (TypeError, ValueError, AttributeError):
+        raise falcon.HTTPBadRequest('WrongParameters', 'ids has to be list of int, statuses has to be list of ' +
+                                    'status names and tracker has to be string')
+    if len(params) == 0:
+        raise falcon.HTTPBadRequest('WrongParameters', 'At least one of params is required: ids, statuses or tracker')
+    return params
+
+
+# noinspection PyUnusedLocal
+class TopicBulkDelete(object):
+    def __init__(self, tracker_manager):
+        """
+        :type tracker_manager: TrackersManager
+        """
+        self.tracker_manager = tracker_manager
+
+    def on_post(self, req, resp):
+        params = parse_topics_filter(req.json)
+        resp.json = {'count': self.tracker_manager.remove_topics(**params)}
+
+
+# noinspection PyUnusedLocal
+class TopicBulkResetStatus(object):
+    def __init__(self, tracker_manager):
+        """
+        :type tracker_manager: TrackersManager
+        """
+        self.tracker_manager = tracker_manager
+
+    def on_post(self, req, resp):
+        params = parse_topics_filter(req.json)
+        resp.json = {'count': self.tracker_manager.reset_topics_status(**params)}
+
+
+# noinspection PyUnusedLocal
+class TopicBulkPauseState(object):
+    def __init__(self, tracker_manager):
+        """
+        :type tracker_manager: TrackersManager
+        """
+        self.tracker_manager = tracker_manager
+
+    def on_post(self, req, resp):
+        params = parse_topics_filter(req.json)
+        paused = req.json.get('paused', None)
+        if not isinstance(paused, bool):
+            raise falcon.HTTPBadRequest('BadRequest', "'paused' has to exist and be bool")
+        resp.json = {'count': self.tracker_manager.set_topics_paused(paused, **params)}
@@ -3,9 +3,11 @@ from builtins import object
 import falcon
 from monitorrent.plugin_managers import TrackersManager
 from monitorrent.plugins.trackers import WithCredentialsMixin
+from monitorrent.rest import versioned
 
 
 # noinspection PyUnusedLocal
+@versioned
 class TrackerCollection(object):
     def __init__(self, tracker_manager):
         """
@@ -1,9 +1,10 @@
 from builtins import str
 from builtins import object
+import threading
 from enum import Enum
 
 from sqlalchemy import Column, Integer, String
-from monitorrent.db import DBSession, Base
+from monitorrent.db import DBSession, Base, get_engine
 from monitorrent.plugins.trackers import TrackerSettings
 
 
@@ -29,6 +30,71 @@ class NotificationLevel(Enum):
 
 
 
+class SettingsCache(object):
+    """
+    Process-wide in-memory copy of settings and settings_proxy tables.
+    Both tables are loaded with one read on first access and reloaded only after invalidate
+    or when database engine was changed (reinitialized).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engine = None
+        self._generation = 0
+        self._settings = None
+        self._proxies = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_setting(self, name, default=None):
+        return self._load()[0].get(name, default)
+
+    def get_proxies(self):
+        return dict(self._load()[1])
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._settings = None
+            self._proxies = None
+            self.invalidations += 1
+
+    @property
+    def generation(self):
+        """
+        Number which is changed on every invalidate, i.e. on every settings write
+        """
+        return self._generation
+
+    @property
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+    def _load(self):
+        engine = get_engine()
+        with self._lock:
+            if self._settings is not None and self._engine is engine:
+                self.hits += 1
+                return self._settings, self._proxies
+            self.misses += 1
+            generation = self._generation
+
+        with DBSession() as db:
+            settings = {s.name: s.value for s in db.query(Settings).all()}
+            proxies = {p.key: p.url for p in db.query(ProxySettings).all()}
+
+        with self._lock:
+            # do not store values which was read concurrently with invalidate
+            if generation == self._generation:
+                self._engine = engine
+                self._settings = settings
+                self._proxies = proxies
+        return settings, proxies
+
+
+settings_cache = SettingsCache()
+
+
 class SettingsManager(object):
     __password_settings_name = "monitorrent.password"
     __enable_authentication_settings_name = "monitorrent.is_authentication_enabled"
@@ -36,6 +102,7 @@ class SettingsManager(object):
     __developer_mode_settings_name = "monitorrent.developer_mode"
     __requests_timeout = "monitorrent.requests_timeout"
     __remove_logs_interval_settings_name = "monitorrent.remove_logs_interval"
+    __remove_logs_max_size_settings_name = "monitorrent.remove_logs_max_size"
     __proxy_enabled_name = "monitorrent.proxy_enabled"
     __proxy_id_format = "monitorrent.proxy_{0}"
     __new_version_checker_enabled = "monitorrent.new_version_checker_enabled"
@@ -98,29 +165,26 @@ class SettingsManager(object):
         self._set_settings(self.__proxy_enabled_name, str(value))
 
     def get_proxy(self, key):
-        with DBSession() as db:
-            setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
-            if setting is None:
-                return None
-            return setting.url
+        return settings_cache.get_proxies().get(key, None)
 
     def set_proxy(self, key, url):
-        with DBSession() as db:
-            setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
-            if url is not None and url != "":
-                if setting is None:
-                    setting = ProxySettings(key=key)
-                setting.url = url
-                db.add(setting)
-            else:
-                if setting is None:
-                    return
-                db.delete(setting)
+        try:
+            with DBSession() as db:
+                setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
+                if url is not None and url != "":
+                    if setting is None:
+                        setting = ProxySettings(key=key)
+                    setting.url = url
+                    db.add(setting)
+                else:
+                    if setting is None:
+                        return
+                    db.delete(setting)
+        finally:
+            settings_cache.invalidate()
 
     def get_proxies(self):
-        with DBSession() as db:
-            settings = db.query(ProxySettings).all()
-            return {s.key: s.url for s in settings}
+        return settings_cache.get_proxies()
 
     def get_is_new_version_checker_enabled(self):
         return self._get_settings(self.__new_version_checker_enabled, 'True') == 'True'
@@ -167,25 +231,41 @@ class SettingsManager(object):
     def remove_logs_interval(self, value):
         self._set_settings(self.__remove_logs_interval_settings_name, str(value))
 
+    @property
+    def remove_logs_max_size(self):
+        """max database size in megabytes, 0 means unlimited"""
+        return int(self._get_settings(self.__remove_logs_max_size_settings_name, 0))
+
+    @remove_logs_max_size.setter
+    def remove_logs_max_size(self, value):
+        self._set_settings(self.__remove_logs_max_size_settings_name, str(value))
+
+    @property
+    def cache_statistics(self):
+        return settings_cache.statistics
+
+    @property
+    def settings_generation(self):
+        return settings_cache.generation
+
     @staticmethod
     def _get_settings(name, default=None):
-        with DBSession() as db:
-            setting = db.query(Settings).filter(Settings.name == name).first()
-            if not setting:
-                return default
-            return setting.value
+        return settings_cache.get_setting(name, default)
 
     @staticmethod
     def _set_settings(name, value):
-        with DBSession() as db:
-            setting = db.query(Settings).filter(Settings.name == name).first()
-            if not setting:
+        try:
+            with DBSession() as db:
+                setting = db.query(Settings).filter(Settings.name == name).first()
+                if not setting:
+                    if value is None:
+                        # Do not set None value, None mean remove value at all
+                        return
+                    setting = Settings(name=name)
+                    db.add(setting)
                 if value is None:
-                    # Do not set None value, None mean remove value at all
-                    return
-                setting = Settings(name=name)
-                db.add(setting)
-            if value is None:
-                db.delete(setting)
-            else:
-                setting.value = str(value)
+                    db.delete(setting)
+                else:
+                    setting.value = str(value)
+        finally:
+            settings_cache.invalidate()
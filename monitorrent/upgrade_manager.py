@@ -1,13 +1,42 @@
 from __future__ import print_function
 from __future__ import absolute_import
-from .db import get_engine, DBSession, MigrationContext, MonitorrentOperations
+import threading
+from sqlalchemy import Column, String, Integer
+from .db import get_engine, DBSession, MigrationContext, MonitorrentOperations, Base
 
 
 upgrades = list()
+# slow data fix-ups (i.e. network requests), are called in background after all upgrades
+post_upgrades = list()
+# upgrade function -> schema version it upgrades to, upgrades without version are called on every start
+schema_versions = dict()
 
 
-def add_upgrade(upgrade_func):
+class SchemaVersion(Base):
+    __tablename__ = 'schema_versions'
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+
+def add_upgrade(upgrade_func, schema_version=None):
+    """
+    :param schema_version: should be increased on every new migration in upgrade_func,
+     upgrade_func isn't called when database has the same or newer schema version
+    """
     upgrades.append(upgrade_func)
+    if schema_version is not None:
+        schema_versions[upgrade_func] = schema_version
+
+
+def add_post_upgrade(post_upgrade_func, schema_version=None):
+    """
+    :param schema_version: version is stored only when post_upgrade_func finishes successfully,
+     so interrupted post upgrade is called again on next start
+    """
+    post_upgrades.append(post_upgrade_func)
+    if schema_version is not None:
+        schema_versions[post_upgrade_func] = schema_version
 
 
 def core_upgrade(operation_factory):
@@ -17,16 +46,62 @@ def core_upgrade(operation_factory):
 
 
 def upgrade():
-    core_upgrade(_operation_factory)
-    call_ugprades(upgrades)
+    engine = get_engine()
+    with engine.connect() as connection:
+        has_schema_versions = engine.dialect.has_table(connection, SchemaVersion.__tablename__)
+    if not has_schema_versions:
+        core_upgrade(_operation_factory)
+        SchemaVersion.__table__.create(engine)
+    call_ugprades(upgrades, check_versions=True)
+
+
+def post_upgrade(post_upgrade_funcs=None):
+    """
+    Starts post upgrades in background thread, should be called after upgrade and create_db
 
+    :rtype: threading.Thread
+    """
+    if post_upgrade_funcs is None:
+        post_upgrade_funcs = list(post_upgrades)
+    thread = threading.Thread(target=call_ugprades, args=(post_upgrade_funcs,), kwargs={'check_versions': True},
+                              name='post-upgrade')
+    thread.daemon = True
+    thread.start()
+    return thread
 
-def call_ugprades(upgrade_funcs):
+
+def call_ugprades(upgrade_funcs, check_versions=False):
+    """
+    :param check_versions: skip upgrades which schema version is already stored in database
+     and store versions of successful upgrades, schema_versions table should exist
+    """
+    # stored versions are loaded by one query, so up to date database is not reflected at all
+    stored_versions = get_stored_versions() if check_versions else dict()
     for upgrade_func in upgrade_funcs:
+        schema_version = schema_versions.get(upgrade_func) if check_versions else None
+        if schema_version is not None and stored_versions.get(get_upgrade_name(upgrade_func), -1) >= schema_version:
+            continue
         try:
             upgrade_func(get_engine(), _operation_factory)
         except Exception as e:
             print(e)
+            continue
+        if schema_version is not None:
+            set_stored_version(get_upgrade_name(upgrade_func), schema_version)
+
+
+def get_upgrade_name(upgrade_func):
+    return "{0}.{1}".format(upgrade_func.__module__, upgrade_func.__name__)
+
+
+def get_stored_versions():
+    with DBSession() as db:
+        return {row.name: row.version for row in db.query(SchemaVersion.name, SchemaVersion.version)}
+
+
+def set_stored_version(name, version):
+    with DBSession() as db:
+        db.merge(SchemaVersion(name=name, version=version))
 
 
 def _operation_factory(session=None):
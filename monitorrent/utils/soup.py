@@ -1,8 +1,9 @@
-from bs4 import BeautifulSoup
 import sys
 
 
 def get_soup(url, parser=None):
+    # bs4 is imported on first parse, so it doesn't slow down import of all plugins on start
+    from bs4 import BeautifulSoup
     if parser:
         return BeautifulSoup(url, parser)
     else:
@@ -0,0 +1,92 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import structlog
+
+log = structlog.get_logger()
+
+
+class StartupProfile(object):
+    """
+    Collects time spent in each startup phase
+    """
+
+    def __init__(self):
+        self.phases = list()
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - started)
+
+    def add(self, name, duration):
+        with self._lock:
+            self.phases.append((name, duration))
+        log.info("Startup phase finished", phase=name, duration=round(duration, 3))
+
+    def report(self):
+        with self._lock:
+            phases = list(self.phases)
+        lines = ['{0:<32} {1:8.3f}s'.format(name, duration) for name, duration in phases]
+        lines.append('{0:<32} {1:8.3f}s'.format('total', time.time() - self._started))
+        return '\n'.join(lines)
+
+
+class DeferredTasks(object):
+    """
+    Startup tasks which shouldn't delay the HTTP server start
+
+    Tasks are called one by one in background thread after the server has bound its port.
+    Task which doesn't finish in its timeout is left running in background, and next task is started.
+    """
+
+    def __init__(self, profile=None):
+        """
+        :type profile: StartupProfile | None
+        """
+        self.tasks = list()
+        self.profile = profile
+        self.thread = None
+
+    def add(self, name, task_func, timeout=30):
+        self.tasks.append((name, task_func, timeout))
+
+    def start(self):
+        """
+        :rtype: threading.Thread
+        """
+        self.thread = threading.Thread(target=self.run, name='deferred-startup')
+        self.thread.daemon = True
+        self.thread.start()
+        return self.thread
+
+    def run(self):
+        for name, task_func, timeout in self.tasks:
+            started = time.time()
+            finished = self._call(name, task_func, timeout)
+            if self.profile is not None:
+                self.profile.add(name if finished else name + ' (timeout)', time.time() - started)
+
+    @staticmethod
+    def _call(name, task_func, timeout):
+        # noinspection PyBroadException
+        def task_fn():
+            try:
+                task_func()
+            except Exception as e:
+                log.error("Deferred startup task failed", task=name, exception=str(e))
+
+        thread = threading.Thread(target=task_fn, name='deferred-' + name)
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            log.warning("Deferred startup task timed out", task=name, timeout=timeout)
+            return False
+        return True
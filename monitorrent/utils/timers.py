@@ -1,15 +1,127 @@
+import heapq
+import itertools
+import random
 import threading
+import time
 
+import structlog
 
-def timer(interval, timer_func, *args, **kwargs):
-    stopped = threading.Event()
+log = structlog.get_logger()
+
+# monotonic clock isn't affected by system time changes, it is available on python 3 only
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class Job(object):
+    def __init__(self, scheduler, interval, jitter, job_func, args, kwargs):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.jitter = jitter
+        self.job_func = job_func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        # planned time without jitter, next runs are planned from it, so execution time doesn't shift schedule
+        self.planned = None
+        self.entry = None
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class Scheduler(object):
+    """
+    Calls all timers from one background thread
+
+    Jobs are kept in a heap ordered by due time, so thread sleeps exactly until the nearest job.
+    Periodic jobs are planned from their previous planned time, not from the finish time,
+    so long jobs and wake up delays don't accumulate drift.
+    Jobs are called in scheduler thread one by one, so they should be short,
+    and long work should be passed to another thread (i.e. by message queue like EngineRunner does).
+    """
+
+    def __init__(self, name='scheduler'):
+        self.name = name
+        self._heap = list()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, interval, job_func, *args, **kwargs):
+        """
+        Call job_func every interval seconds, the first call is after interval
 
-    def loop_fn():
-        while not stopped.wait(interval):
-            timer_func(*args, **kwargs)
+        :param jitter: keyword only, max random delay in seconds added to each call,
+         it spreads jobs with the same interval, schedule isn't shifted by it
+        :rtype: Job
+        """
+        jitter = kwargs.pop('jitter', 0)
+        job = Job(self, interval, jitter, job_func, args, kwargs)
+        with self._condition:
+            job.planned = _clock() + interval
+            self._push(job)
+            self._ensure_thread()
+            self._condition.notify()
+        return job
 
-    thread = threading.Thread(target=loop_fn, name="timer")
-    thread.daemon = True
-    thread.start()
+    def cancel(self, job):
+        with self._condition:
+            job.cancelled = True
+            if job.entry is not None:
+                self._heap.remove(job.entry)
+                heapq.heapify(self._heap)
+                job.entry = None
+            self._condition.notify()
+
+    def _push(self, job):
+        due = job.planned + (random.uniform(0, job.jitter) if job.jitter else 0)
+        job.entry = (due, next(self._counter), job)
+        heapq.heappush(self._heap, job.entry)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                if len(self._heap) == 0:
+                    self._condition.wait()
+                    continue
+                due, _, job = self._heap[0]
+                now = _clock()
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+                job.planned += job.interval
+                if job.planned <= now:
+                    # missed runs (i.e. after system sleep) are skipped, but phase of schedule is kept
+                    job.planned += (now - job.planned) // job.interval * job.interval + job.interval
+                self._push(job)
+                return job
+
+    # noinspection PyBroadException
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job.cancelled:
+                continue
+            try:
+                job.job_func(*job.args, **job.kwargs)
+            except Exception as e:
+                log.error("Timer job failed", job=repr(job.job_func), exception=str(e))
+
+
+scheduler = Scheduler()
+
+
+def timer(interval, timer_func, *args, **kwargs):
+    """
+    Call timer_func every interval seconds in shared scheduler thread
 
-    return stopped.set
+    :return: function which cancels timer
+    """
+    return scheduler.schedule(interval, timer_func, *args, **kwargs).cancel
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket rate limiter
+
+    Allows bursts up to capacity calls and rate calls per second on average.
+    Callers are queued by reservation order, so concurrent callers are served fairly.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, wait until it is available
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def suspend(self, seconds):
+        """
+        Don't give tokens for next seconds, i.e. when service asked to retry after some time
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -1,29 +1,29 @@
 #!/usr/bin/env python
+from __future__ import print_function
 from builtins import range
 import os
-import sys
 
 import logging
-import six
 import random
 import string
-import argparse
-import warnings
 
 import structlog
 from structlog.stdlib import LoggerFactory
 from cheroot import wsgi
-from monitorrent.engine import DBEngineRunner, DbLoggerWrapper, ExecuteLogManager
+from monitorrent.engine import DBEngineRunner, DbLoggerWrapper, ExecuteLogManager, ExecuteLogRetention
 from monitorrent.db import init_db_engine, create_db
 from monitorrent.plugin_managers import load_plugins, get_plugins, TrackersManager, DbClientsManager, NotifierManager
 from monitorrent.rest.notifiers import NotifierCollection, Notifier, NotifierCheck, NotifierEnabled
-from monitorrent.upgrade_manager import upgrade
+from monitorrent.upgrade_manager import upgrade, post_upgrade
 from monitorrent.settings_manager import SettingsManager
 from monitorrent.new_version_checker import NewVersionChecker
-from monitorrent.rest import create_api, AuthMiddleware
-from monitorrent.rest.static_file import StaticFiles
+from monitorrent.config import Config, create_parser
+from monitorrent.utils.startup import StartupProfile, DeferredTasks
+from monitorrent.rest import create_api, AuthMiddleware, CompressionMiddleware
+from monitorrent.rest.static_file import StaticAssets
 from monitorrent.rest.login import Login, Logout
-from monitorrent.rest.topics import TopicCollection, TopicParse, Topic, TopicResetStatus, TopicPauseState
+from monitorrent.rest.topics import TopicCollection, TopicParse, TopicBulk, Topic, TopicResetStatus, \
+    TopicPauseState, TopicBulkDelete, TopicBulkResetStatus, TopicBulkPauseState
 from monitorrent.rest.trackers import TrackerCollection, Tracker, TrackerCheck
 from monitorrent.rest.clients import ClientCollection, Client, ClientCheck, DefaultClient, ClientDefault
 from monitorrent.rest.settings_authentication import SettingsAuthentication
@@ -35,7 +35,7 @@ from monitorrent.rest.settings_proxy import SettingsProxyEnabled, SettingsProxy
 from monitorrent.rest.settings_new_version_checker import SettingsNewVersionChecker
 from monitorrent.rest.settings_notify_on import SettingsNotifyOn
 from monitorrent.rest.new_version import NewVersion
-from monitorrent.rest.execute import ExecuteLogCurrent, ExecuteCall
+from monitorrent.rest.execute import ExecuteLogCurrent, ExecuteEvents, ExecuteCall
 from monitorrent.rest.execute_logs import ExecuteLogs
 from monitorrent.rest.execute_logs_details import ExecuteLogsDetails
 
@@ -61,20 +61,19 @@ def add_static_route(api, files_dir, log):
     log.debug('Adding static routes', dir=files_dir)
     file_dir = os.path.dirname(os.path.realpath(__file__))
     static_dir = os.path.join(file_dir, files_dir)
-    api.add_route('/', StaticFiles(static_dir, 'index.html'))
-    api.add_route('/favicon.ico', StaticFiles(static_dir, 'favicon.ico', False))
-    api.add_route('/styles/monitorrent.css', StaticFiles(os.path.join(static_dir, 'styles'), 'monitorrent.css', False))
-    api.add_route('/login', StaticFiles(static_dir, 'login.html', False))
-    for d, dirnames, files in os.walk(static_dir):
-        parts = d[len(file_dir) + 1:].split(os.path.sep)
-        url = '/' + '/'.join(parts[1:] + ['{filename}'])
-        api.add_route(url, StaticFiles(d))
+    static_assets = StaticAssets(static_dir,
+                                 aliases={'': 'index.html', 'login': 'login.html'},
+                                 public_files=['favicon.ico', 'styles/monitorrent.css', 'login.html'])
+    # sink is used only when no api route matched, so one sink serves all static folders
+    api.add_sink(static_assets, r'/(?!api/)')
 
 
 def create_app(secret_key, token, tracker_manager, clients_manager, notifier_manager, settings_manager,
-               engine_runner, log_manager, new_version_checker, log):
-    AuthMiddleware.init(secret_key, token, lambda: settings_manager.get_is_authentication_enabled())
-    app = create_api()
+               engine_runner, log_manager, new_version_checker, log,
+               compression_level=CompressionMiddleware.DEFAULT_LEVEL):
+    AuthMiddleware.init(secret_key, token, lambda: settings_manager.get_is_authentication_enabled(),
+                        lambda: settings_manager.settings_generation)
+    app = create_api(compression_level=compression_level)
     add_static_route(app, 'webapp', log)
     app.add_route('/api/login', Login(settings_manager))
     app.add_route('/api/logout', Logout())
@@ -83,6 +82,10 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/topics/{id}/reset_status', TopicResetStatus(tracker_manager))
     app.add_route('/api/topics/{id}/pause', TopicPauseState(tracker_manager))
     app.add_route('/api/topics/parse', TopicParse(tracker_manager))
+    app.add_route('/api/topics/bulk', TopicBulk(tracker_manager))
+    app.add_route('/api/topics/bulk/delete', TopicBulkDelete(tracker_manager))
+    app.add_route('/api/topics/bulk/reset_status', TopicBulkResetStatus(tracker_manager))
+    app.add_route('/api/topics/bulk/pause', TopicBulkPauseState(tracker_manager))
     app.add_route('/api/trackers', TrackerCollection(tracker_manager))
     app.add_route('/api/trackers/{tracker}', Tracker(tracker_manager))
     app.add_route('/api/trackers/{tracker}/check', TrackerCheck(tracker_manager))
@@ -108,66 +111,13 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/execute/logs', ExecuteLogs(log_manager))
     app.add_route('/api/execute/logs/{execute_id}/details', ExecuteLogsDetails(log_manager))
     app.add_route('/api/execute/logs/current', ExecuteLogCurrent(log_manager))
+    app.add_route('/api/execute/events', ExecuteEvents(log_manager))
     app.add_route('/api/execute/call', ExecuteCall(engine_runner))
     return app
 
 
 def main():
-    def try_int(s, base=10, val=None):
-        if s is None:
-            return None
-        try:
-            return int(s, base)
-        except ValueError:
-            return val
-
-    class Config(object):
-        debug = False
-        ip = '0.0.0.0'
-        port = 6687
-        db_path = 'monitorrent.db'
-        config = 'config.py'
-
-        def __init__(self, parsed_args):
-            if parsed_args.config is not None and not os.path.isfile(parsed_args.config):
-                warnings.warn('File not found: {}'.format(parsed_args.config))
-            config_path = parsed_args.config or self.config
-            if os.path.isfile(config_path):
-                # noinspection PyBroadException
-                log.bind(config_is_file=True)
-                try:
-                    parsed_config = {}
-                    with open(config_path) as config_file:
-                        six.exec_(compile(config_file.read(), config_path, 'exec'), {}, parsed_config)
-                    self.debug = parsed_config.get('debug', self.debug)
-                    self.ip = parsed_config.get('ip', self.ip)
-                    self.port = parsed_config.get('port', self.port)
-                    self.db_path = parsed_config.get('db_path', self.db_path)
-                except:
-                    ex, val, tb = sys.exc_info()
-                    warnings.warn('Error reading: {0}: {1} ({2}'.format(parsed_args.config, ex, val))
-
-            env_debug = (os.environ.get('MONITORRENT_DEBUG', None) in ['true', 'True', '1'])
-
-            self.debug = parsed_args.debug or env_debug or self.debug
-            self.ip = parsed_args.ip or os.environ.get('MONITORRENT_IP', None) or self.ip
-            self.port = parsed_args.port or try_int(os.environ.get('MONITORRENT_PORT', None)) or self.port
-            self.db_path = parsed_args.db_path or os.environ.get('MONITORRENT_DB_PATH', None) or self.db_path
-
-    parser = argparse.ArgumentParser(description='Monitorrent server')
-    parser.add_argument('--debug', action='store_true',
-                        help='Run in debug mode. Secret key is always the same.')
-    parser.add_argument('--ip', type=str, dest='ip',
-                        help='Bind interface. Default is {0}'.format(Config.ip))
-    parser.add_argument('--port', type=int, dest='port',
-                        help='Port for server. Default is {0}'.format(Config.port))
-    parser.add_argument('--db-path', type=str, dest='db_path',
-                        help='Path to SQL lite database. Default is to {0}'.format(Config.db_path))
-    parser.add_argument('--config', type=str, dest='config',
-                        default=os.environ.get('MONITORRENT_CONFIG', None),
-                        help='Path to config file (default {0})'.format(Config.config))
-
-    parsed_args = parser.parse_args()
+    parsed_args = create_parser().parse_args()
     config = Config(parsed_args)
     if config.debug:
         logging.basicConfig(level=logging.DEBUG)
@@ -177,30 +127,36 @@ def main():
     log.info("Configuration finished", config=config.__dict__)
     db_connection_string = "sqlite:///" + config.db_path
 
-    init_db_engine(db_connection_string, False)
-    load_plugins()
-    upgrade()
-    create_db()
-
-    settings_manager = SettingsManager()
-    tracker_manager = TrackersManager(settings_manager, get_plugins('tracker'))
-    clients_manager = DbClientsManager(settings_manager, get_plugins('client'))
-    notifier_manager = NotifierManager(settings_manager, get_plugins('notifier'))
-
-    log_manager = ExecuteLogManager()
-    engine_runner_logger = DbLoggerWrapper(log_manager, settings_manager)
-    engine_runner = DBEngineRunner(engine_runner_logger, settings_manager, tracker_manager,
-                                   clients_manager, notifier_manager)
-
-    include_prerelease = settings_manager.get_new_version_check_include_prerelease()
-    new_version_checker = NewVersionChecker(notifier_manager, include_prerelease)
-    if settings_manager.get_is_new_version_checker_enabled():
-        # noinspection PyBroadException
-        try:
-            new_version_checker.execute()
-        except:
-            pass
-        new_version_checker.start(settings_manager.new_version_check_interval)
+    profile = StartupProfile()
+
+    with profile.phase('init db engine'):
+        init_db_engine(db_connection_string, False)
+    with profile.phase('load plugins'):
+        load_plugins(lazy=False)
+    with profile.phase('upgrade'):
+        upgrade()
+    with profile.phase('create db'):
+        create_db()
+        post_upgrade()
+
+    with profile.phase('create managers'):
+        settings_manager = SettingsManager()
+        tracker_manager = TrackersManager(settings_manager, get_plugins('tracker'))
+        clients_manager = DbClientsManager(settings_manager, get_plugins('client'))
+        notifier_manager = NotifierManager(settings_manager, get_plugins('notifier'))
+
+        # waiting requests never take more than longpoll_threads workers, so regular requests can't be starved
+        log_manager = ExecuteLogManager(max_waiters=config.longpoll_threads)
+        engine_runner_logger = DbLoggerWrapper(log_manager)
+        # runner is started by deferred tasks after server is listening
+        engine_runner = DBEngineRunner(engine_runner_logger, settings_manager, tracker_manager,
+                                       clients_manager, notifier_manager, autostart=False)
+
+        log_retention = ExecuteLogRetention(log_manager, settings_manager)
+        log_retention.start()
+
+        include_prerelease = settings_manager.get_new_version_check_include_prerelease()
+        new_version_checker = NewVersionChecker(notifier_manager, include_prerelease)
 
     debug = config.debug
 
@@ -211,17 +167,55 @@ def main():
         secret_key = os.urandom(24)
         token = ''.join(random.choice(string.ascii_letters) for _ in range(8))
 
-    app = create_app(secret_key, token, tracker_manager, clients_manager, notifier_manager, settings_manager,
-                     engine_runner, log_manager, new_version_checker, log)
+    with profile.phase('create app'):
+        app = create_app(secret_key, token, tracker_manager, clients_manager, notifier_manager, settings_manager,
+                         engine_runner, log_manager, new_version_checker, log, config.compression_level)
     server_start_params = (config.ip, config.port)
-    server = wsgi.Server(server_start_params, app)
+    max_threads = config.max_threads + config.longpoll_threads if config.max_threads > 0 else config.max_threads
+    server = wsgi.Server(server_start_params, app,
+                         numthreads=config.threads + config.longpoll_threads,
+                         max=max_threads,
+                         request_queue_size=config.request_queue_size,
+                         timeout=config.socket_timeout)
+    if hasattr(server, 'keep_alive_conn_limit'):
+        # available since cheroot 8.1
+        server.keep_alive_conn_limit = config.keep_alive_conn_limit
+    # prepare binds port and starts worker threads, available since cheroot 6.0
+    can_prepare = hasattr(server, 'prepare') and hasattr(server, 'serve')
+    if can_prepare:
+        with profile.phase('bind http server'):
+            server.prepare()
     print('Server started on {0}:{1}'.format(*server_start_params))
 
+    def check_new_version():
+        if settings_manager.get_is_new_version_checker_enabled():
+            try:
+                new_version_checker.execute()
+            finally:
+                # checker could be already started from settings API during check
+                if not new_version_checker.is_started():
+                    new_version_checker.start(settings_manager.new_version_check_interval)
+
+    # slow tasks, like requests to github, are executed in background when server is already listening
+    deferred_tasks = DeferredTasks(profile)
+    deferred_tasks.add('start engine runner', engine_runner.start, timeout=5)
+    deferred_tasks.add('check new version', check_new_version, timeout=new_version_checker.timeout * 2)
+    if parsed_args.startup_profile:
+        deferred_tasks.add('report startup profile', lambda: print(profile.report()), timeout=5)
+    deferred_tasks.start()
+
     try:
-        server.start()
+        if can_prepare:
+            server.serve()
+        else:
+            server.start()
     except KeyboardInterrupt:
         print('Stopping engine')
         engine_runner.stop()
+        print('Sending pending notifications')
+        notifier_manager.dispatcher.join(timeout=10)
+        print('Stopping log retention')
+        log_retention.stop()
         print('Stopping new_version_checker')
         new_version_checker.stop()
         server.stop()
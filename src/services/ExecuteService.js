@@ -1,9 +1,24 @@
-app.factory('ExecuteService', function ($http, $q, mtToastService) {
+app.factory('ExecuteService', function ($http, $q, $timeout, mtToastService) {
     var executeSubscription = function (params) {
         var canceller = $q.defer();
 
         var execute_id = null;
         var log_id = 0;
+        var cancelled = false;
+
+        // server answers 503 when too many clients are waiting for changes, request is repeated after Retry-After
+        var retryLater = function (listener) {
+            return function (response) {
+                if (response.status === 503 && !cancelled) {
+                    var retryAfter = parseInt(response.headers('Retry-After'), 10) || 5;
+                    $timeout(function () {
+                        if (!cancelled) {
+                            listener();
+                        }
+                    }, retryAfter * 1000);
+                }
+            };
+        };
 
         var processEvents = function (logs) {
             if (logs.length > 0) {
@@ -29,7 +44,7 @@ app.factory('ExecuteService', function ($http, $q, mtToastService) {
                 } else {
                     executeListener();
                 }
-            });
+            }, retryLater(executeListener));
         };
 
         var executeDetailsListener = function () {
@@ -46,7 +61,7 @@ app.factory('ExecuteService', function ($http, $q, mtToastService) {
                         executeListener();
                     }
                 }
-            });
+            }, retryLater(executeDetailsListener));
         };
 
         if (params.execute_id && params.after) {
@@ -58,6 +73,7 @@ app.factory('ExecuteService', function ($http, $q, mtToastService) {
         }
 
         return function () {
+            cancelled = true;
             canceller.resolve();
         };
     };
@@ -1,4 +1,6 @@
 import smtplib
+import threading
+from time import sleep
 
 from mock import Mock, ANY
 
@@ -35,6 +37,7 @@ class EmailTest(DbTestCase):
     def setUp(self):
         super(EmailTest, self).setUp()
         self.notifier = EmailNotifierPlugin()
+        self.addCleanup(self.notifier.close_session)
         self.helper = EmailHelper()
         self.helper.real_host = "localhost"
         self.helper.real_port = "1025"
@@ -124,6 +127,10 @@ class EmailTest(DbTestCase):
 
         server.sendmail.assert_called_once_with(self.helper.real_login, self.helper.real_to_addr, ANY)
         self.assertTrue(response)
+        # connection is kept for next messages
+        server.quit.assert_not_called()
+
+        self.notifier.close_session()
         server.quit.assert_called_once_with()
 
     def test_notify_link(self):
@@ -146,8 +153,128 @@ class EmailTest(DbTestCase):
 
         server.sendmail.assert_called_once_with(self.helper.real_login, self.helper.real_to_addr, ANY)
         self.assertTrue(response)
+        # connection is kept for next messages
+        server.quit.assert_not_called()
+
+        self.notifier.close_session()
         server.quit.assert_called_once_with()
 
+    def _set_settings(self):
+        settings = EmailSettings()
+        settings.host = self.helper.real_host
+        settings.port = self.helper.real_port
+        settings.to_addr = self.helper.real_to_addr
+        settings.login = self.helper.real_login
+        settings.password = self.helper.real_password
+        settings.connection_security = self.helper.real_connection_security
+        self.notifier.update_settings(settings)
+        return settings
+
+    def _mock_servers(self, count):
+        servers = [Mock() for _ in range(count)]
+        self.notifier._create_server = Mock(side_effect=servers)
+        self.notifier._server_authenticate = Mock()
+        return servers
+
+    def test_notify_reuses_session(self):
+        self._set_settings()
+        server, = self._mock_servers(1)
+
+        self.assertTrue(self.notifier.notify('hello', 'message 1'))
+        self.assertTrue(self.notifier.notify('hello', 'message 2'))
+
+        self.notifier._create_server.assert_called_once_with(ANY)
+        self.notifier._server_authenticate.assert_called_once_with(server, ANY)
+        self.assertEqual(2, server.sendmail.call_count)
+        server.quit.assert_not_called()
+
+    def test_notify_reconnects_closed_session(self):
+        self._set_settings()
+        server1, server2 = self._mock_servers(2)
+
+        self.notifier.notify('hello', 'message 1')
+        server1.sendmail = Mock(side_effect=smtplib.SMTPServerDisconnected())
+        self.assertTrue(self.notifier.notify('hello', 'message 2'))
+
+        server1.quit.assert_called_once_with()
+        server2.sendmail.assert_called_once_with(self.helper.real_login, self.helper.real_to_addr, ANY)
+
+    def test_notify_new_session_is_not_reconnected(self):
+        self._set_settings()
+        server, = self._mock_servers(1)
+        server.sendmail = Mock(side_effect=smtplib.SMTPServerDisconnected())
+
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            self.notifier.notify('hello', 'message 1')
+
+        self.notifier._create_server.assert_called_once_with(ANY)
+        server.quit.assert_called_once_with()
+
+    def test_notify_reconnects_on_settings_change(self):
+        settings = self._set_settings()
+        server1, server2 = self._mock_servers(2)
+
+        self.notifier.notify('hello', 'message 1')
+        settings.host = 'other_host'
+        self.notifier.update_settings(settings)
+        self.notifier.notify('hello', 'message 2')
+
+        server1.quit.assert_called_once_with()
+        server2.sendmail.assert_called_once_with(self.helper.real_login, self.helper.real_to_addr, ANY)
+
+    def test_notify_max_messages_per_session(self):
+        self._set_settings()
+        server1, server2 = self._mock_servers(2)
+        self.notifier.max_messages_per_session = 2
+
+        for i in range(3):
+            self.notifier.notify('hello', 'message {0}'.format(i))
+
+        self.assertEqual(2, server1.sendmail.call_count)
+        server1.quit.assert_called_once_with()
+        self.assertEqual(1, server2.sendmail.call_count)
+
+    def test_idle_session_is_closed(self):
+        self._set_settings()
+        server, = self._mock_servers(1)
+        self.notifier.session_idle_timeout = 0.05
+
+        self.notifier.notify('hello', 'message 1')
+        for _ in range(100):
+            if self.notifier._session is None:
+                break
+            sleep(0.05)
+
+        server.close.assert_called_once_with()
+        self.assertIsNone(self.notifier._session)
+        self.assertIsNone(self.notifier._session_timer)
+
+    def test_used_session_is_not_closed_by_idle_check(self):
+        self._set_settings()
+        server, = self._mock_servers(1)
+
+        self.notifier.notify('hello', 'message 1')
+        self.notifier._close_idle_session()
+
+        server.close.assert_not_called()
+        self.assertIsNotNone(self.notifier._session)
+
+    def test_idle_check_does_not_wait_for_sending_session(self):
+        self._set_settings()
+        server, = self._mock_servers(1)
+        self.notifier.notify('hello', 'message 1')
+        self.notifier._session_last_used -= self.notifier.session_idle_timeout
+
+        with self.notifier._session_lock:
+            # lock is held by notify in another thread
+            thread = threading.Thread(target=self.notifier._close_idle_session)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+        server.close.assert_not_called()
+        self.assertIsNotNone(self.notifier._session)
+
     def test_create_server(self):
         settings = EmailSettings()
         settings.host = "smtp.gmail.com"
@@ -1,4 +1,5 @@
 from pytest import raises
+from mock import patch
 
 from sqlalchemy import Column, Integer, String, ForeignKey
 from monitorrent.db import DBSession
@@ -115,3 +116,63 @@ class TestUpdateSettings(DbTestCase):
             settings = db.query(NotifierMockSettings).all()
 
             assert len(settings) == 0
+
+
+class TestSettingsCache(DbTestCase):
+    def test_get_settings_should_be_cached(self):
+        notifier = NotifierMock()
+        notifier.update_settings(NotifierMockSettings(access_token="TOKEN"))
+        settings = notifier.get_settings()
+
+        with DBSession() as db:
+            db.query(NotifierMockSettings).one().access_token = "TOKEN1"
+
+        assert notifier.get_settings() is settings
+        assert notifier.get_settings().access_token == "TOKEN"
+
+    def test_update_settings_should_invalidate_cache(self):
+        notifier = NotifierMock()
+        assert notifier.get_settings() is None
+
+        notifier.update_settings(NotifierMockSettings(access_token="TOKEN"))
+        assert notifier.get_settings().access_token == "TOKEN"
+
+        notifier.is_enabled = False
+        assert not notifier.get_settings().is_enabled
+
+        notifier.update_settings(NotifierMockSettings(access_token=None))
+        assert notifier.get_settings() is None
+
+    def test_settings_read_concurrently_with_update_should_not_be_cached(self):
+        notifier = NotifierMock()
+        notifier.update_settings(NotifierMockSettings(access_token="TOKEN1"))
+        writes = [lambda: notifier.update_settings(NotifierMockSettings(access_token="TOKEN2"))]
+
+        class WriteAfterReadSession(object):
+            # update is committed after read of old settings, but before they are stored in cache
+            def __init__(self):
+                self.session = DBSession()
+
+            def __enter__(self):
+                return self.session.__enter__()
+
+            def __exit__(self, *args):
+                result = self.session.__exit__(*args)
+                if writes:
+                    writes.pop()()
+                return result
+
+        with patch('monitorrent.plugins.notifiers.DBSession', WriteAfterReadSession):
+            assert notifier.get_settings().access_token == "TOKEN1"
+
+        assert notifier.get_settings().access_token == "TOKEN2"
+
+    def test_cache_should_not_outlive_db_engine(self):
+        notifier = NotifierMock()
+        notifier.update_settings(NotifierMockSettings(access_token="TOKEN"))
+        assert notifier.get_settings() is not None
+
+        self.tearDown()
+        self.setUp()
+
+        assert notifier.get_settings() is None
@@ -1,3 +1,4 @@
+from mock import Mock, patch
 from monitorrent.plugins.notifiers import NotifierType
 from monitorrent.plugins.notifiers.telegram import TelegramNotifierPlugin, TelegramSettings, TelegramException
 from tests import use_vcr, DbTestCase
@@ -88,3 +89,67 @@ class TelegramTest(DbTestCase):
         self.notifier.update_settings(settings)
         response = self.notifier.notify('hello', 'yay', 'http://mywebsite.com')
         self.assertTrue(response)
+
+    def _set_settings(self, chat_ids):
+        settings = TelegramSettings()
+        settings.access_token = self.helper.fake_token
+        settings.chat_ids = chat_ids
+        self.notifier.update_settings(settings)
+
+    @staticmethod
+    def _response(status_code, json=None):
+        response = Mock()
+        response.status_code = status_code
+        response.json = Mock(return_value=json)
+        return response
+
+    def test_notify_sends_to_every_chat_once(self):
+        self._set_settings('1, 2, -3, 1')
+        session = Mock()
+        session.post = Mock(return_value=self._response(200))
+        self.notifier._get_session = Mock(return_value=session)
+
+        self.assertTrue(self.notifier.notify('hello', 'yay'))
+
+        chat_ids = sorted(c[1]['data']['chat_id'] for c in session.post.call_args_list)
+        self.assertEqual(['-3', '1', '2'], chat_ids)
+
+    def test_notify_failed_chats(self):
+        self._set_settings('1, 2, 3')
+        session = Mock()
+        session.post = Mock(side_effect=lambda url, data, timeout:
+                            self._response(400 if data['chat_id'] == '2' else 200))
+        self.notifier._get_session = Mock(return_value=session)
+
+        with self.assertRaises(TelegramException) as e:
+            self.notifier.notify('hello', 'yay')
+
+        self.assertEqual(2, e.exception.code)
+        self.assertIn("['2']", e.exception.message)
+
+    @patch('monitorrent.utils.token_bucket.time')
+    def test_notify_retry_after(self, time_mock):
+        time_mock.time.return_value = 1000
+        self._set_settings('1')
+        session = Mock()
+        session.post = Mock(side_effect=[self._response(429, {'parameters': {'retry_after': 5}}),
+                                         self._response(200)])
+        self.notifier._get_session = Mock(return_value=session)
+
+        self.assertTrue(self.notifier.notify('hello', 'yay'))
+
+        self.assertEqual(2, session.post.call_count)
+        self.assertGreaterEqual(time_mock.sleep.call_args[0][0], 5)
+
+    @patch('monitorrent.utils.token_bucket.time')
+    def test_notify_too_long_retry_after(self, time_mock):
+        time_mock.time.return_value = 1000
+        self._set_settings('1')
+        session = Mock()
+        session.post = Mock(return_value=self._response(429, {'parameters': {'retry_after': 3600}}))
+        self.notifier._get_session = Mock(return_value=session)
+
+        with self.assertRaises(TelegramException):
+            self.notifier.notify('hello', 'yay')
+
+        self.assertEqual(1, session.post.call_count)
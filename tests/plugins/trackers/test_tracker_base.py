@@ -576,6 +576,52 @@ class TrackerPluginBaseTest(DbTestCase):
             topic = self.WrongMockTopic(**fields)
             plugin.save_topic(topic, None, Status.Ok)
 
+    def test_save_topics_batch(self):
+        plugin = MockTrackerPlugin()
+        plugin.topic_private_fields = plugin.topic_private_fields + ['additional_attribute']
+        plugin.topic_class = self.MockTopic
+        topic_last_update = datetime(2016, 3, 14, 18, 58, 12, tzinfo=pytz.utc)
+        last_update = datetime(2016, 3, 15, 18, 58, 12, tzinfo=pytz.utc)
+        with DBSession() as db:
+            for i in range(3):
+                db.add(self.MockTopic(url='http://base.mocktracker.org/torrent/{0}'.format(i),
+                                      display_name='Name {0}'.format(i), additional_attribute='Text',
+                                      type='base.mocktracker.com', status=Status.Ok,
+                                      last_update=topic_last_update))
+
+        topics = plugin.get_topics(None)
+        with plugin.start_topics_batch() as topics_batch:
+            plugin.save_topic(topics[0], last_update, Status.Ok)
+            plugin.save_topic(topics[1], None, Status.Error)
+            plugin.save_status(topics[2].id, Status.NotFound)
+            self.assertEqual(3, len(topics_batch))
+
+            # nothing is persisted until batch commit
+            self.assertEqual([Status.Ok] * 3, [t.status for t in plugin.get_topics(None)])
+
+        self.assertIsNone(plugin.topics_batch)
+        topics = plugin.get_topics([t.id for t in topics])
+        self.assertEqual(last_update, topics[0].last_update)
+        self.assertEqual([Status.Ok, Status.Error, Status.NotFound], [t.status for t in topics])
+        self.assertEqual(topic_last_update, topics[2].last_update)
+        self.assertEqual(['Text'] * 3, [t.additional_attribute for t in topics])
+
+    def test_save_topics_batch_commit_on_error(self):
+        plugin = MockTrackerPlugin()
+        plugin.topic_class = self.MockTopic
+        with DBSession() as db:
+            db.add(self.MockTopic(url='http://base.mocktracker.org/torrent/1', display_name='Name',
+                                  additional_attribute='Text', type='base.mocktracker.com', status=Status.Ok))
+
+        topic = plugin.get_topics(None)[0]
+        with self.assertRaises(Exception):
+            with plugin.start_topics_batch():
+                plugin.save_topic(topic, None, Status.Error)
+                raise Exception('Some error')
+
+        self.assertIsNone(plugin.topics_batch)
+        self.assertEqual(Status.Error, plugin.get_topics(None)[0].status)
+
     def test_update_topic(self):
         plugin = MockTrackerPlugin()
         plugin.topic_private_fields = plugin.topic_private_fields + ['additional_attribute']
@@ -3,7 +3,7 @@ import pytz
 from monitorrent.db import UTCDateTime, row2dict, DBSession
 from monitorrent.plugins.status import Status
 from monitorrent.settings_manager import Settings, ProxySettings
-from monitorrent.plugins.trackers.lostfilm import upgrade, get_current_version
+from monitorrent.plugins.trackers.lostfilm import upgrade, post_upgrade, get_current_version
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
 from datetime import datetime
 from tests import UpgradeTestCase, use_vcr
@@ -231,6 +231,18 @@ class LostFilmTrackerUpgradeTest(UpgradeTestCase):
         assert lostfilm_topics[6]['cat'] == 131
         assert lostfilm_topics[7]['cat'] == 0
 
+        # urls are requested from lostfilm.tv only by post upgrade
+        assert len(topics4) == 7
+        assert topics4[1]['url'] == 'http://www.lostfilm.tv/browse.php?cat=236'
+        assert topics4[1]['status'] == Status.Ok
+        assert topics4[7]['status'] == Status.Error
+
+        post_upgrade(self.engine, self.operation_factory)
+
+        with DBSession() as db:
+            topics4 = [row2dict(t, self.Topic4) for t in db.query(self.Topic4)]
+            topics4 = {t['id']: t for t in topics4}
+
         assert len(topics4) == 7
         assert topics4[1]['url'] == 'https://www.lostfilm.tv/series/12_Monkeys/seasons'
         assert topics4[1]['status'] == Status.Ok
@@ -1,9 +1,13 @@
 from builtins import str
 from builtins import object
+import gzip
+import json
+import zlib
 import falcon
 from enum import Enum
 from datetime import datetime
-from monitorrent.rest import MonitorrentJSONEncoder
+from mock import patch
+from monitorrent.rest import MonitorrentJSONEncoder, CompressionMiddleware, versioned
 from unittest import TestCase
 from ddt import ddt, data, unpack
 from monitorrent.plugins.status import Status
@@ -58,3 +62,130 @@ class JSONTranslatorTest(RestTestBase):
 
         self.assertEqual(falcon.HTTP_BAD_REQUEST, self.srmock.status)
 
+
+@versioned
+class VersionedResource(object):
+    def __init__(self):
+        self.calls = 0
+
+    def on_get(self, req, resp):
+        self.calls += 1
+        resp.json = {'calls': self.calls}
+
+
+class ETagMiddlewareTest(RestTestBase):
+    def setUp(self, disable_auth=True):
+        super(ETagMiddlewareTest, self).setUp(disable_auth)
+        self.resource = VersionedResource()
+        self.api.add_route('/route', self.resource)
+
+    def test_etag(self):
+        with patch('monitorrent.rest.data_version.value', 1):
+            body = self.simulate_request('/route', decode='utf-8')
+            self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+            self.assertEqual('{"calls": 1}', body)
+            etag = self.srmock.headers_dict['ETag']
+
+            self.simulate_request('/route', headers={'If-None-Match': etag})
+            self.assertEqual(falcon.HTTP_NOT_MODIFIED, self.srmock.status)
+            self.assertEqual(etag, self.srmock.headers_dict['ETag'])
+
+            # body is served from cache without resource call
+            body = self.simulate_request('/route', decode='utf-8')
+            self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+            self.assertEqual('{"calls": 1}', body)
+            self.assertTrue('application/json' in self.srmock.headers_dict['Content-Type'])
+            self.assertEqual(etag, self.srmock.headers_dict['ETag'])
+
+        with patch('monitorrent.rest.data_version.value', 2):
+            body = self.simulate_request('/route', headers={'If-None-Match': etag}, decode='utf-8')
+            self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+            self.assertEqual('{"calls": 2}', body)
+            self.assertNotEqual(etag, self.srmock.headers_dict['ETag'])
+
+        self.assertEqual(2, self.resource.calls)
+
+    def test_cache_per_query_string(self):
+        with patch('monitorrent.rest.data_version.value', 1):
+            self.assertEqual('{"calls": 1}', self.simulate_request('/route', query_string='take=10', decode='utf-8'))
+            self.assertEqual('{"calls": 2}', self.simulate_request('/route', query_string='take=20', decode='utf-8'))
+            self.assertEqual('{"calls": 1}', self.simulate_request('/route', query_string='take=10', decode='utf-8'))
+
+    def test_not_versioned_resource(self):
+        class NotVersionedResource(object):
+            def on_get(self, req, resp):
+                resp.json = {'status': 'ok'}
+
+        self.api.add_route('/not_versioned', NotVersionedResource())
+
+        self.simulate_request('/not_versioned')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertFalse('ETag' in self.srmock.headers_dict)
+
+
+class JsonResource(object):
+    def __init__(self, count):
+        self.count = count
+
+    def on_get(self, req, resp):
+        resp.json = [{'id': i, 'display_name': u'Topic {0}'.format(i)} for i in range(self.count)]
+
+
+@ddt
+class CompressionMiddlewareTest(RestTestBase):
+    @unpack
+    @data(('gzip', 'gzip'),
+          ('deflate', 'deflate'),
+          ('gzip, deflate', 'gzip'),
+          ('gzip;q=0.5, deflate', 'deflate'),
+          ('gzip;q=0, deflate;q=0', None),
+          ('*', 'gzip'),
+          ('*;q=0.1, gzip;q=0', 'deflate'),
+          ('br', None),
+          ('', None),
+          (None, None))
+    def test_select_encoding(self, accept_encoding, expected):
+        self.assertEqual(expected, CompressionMiddleware().select_encoding(accept_encoding))
+
+    def get(self, count, accept_encoding):
+        self.api.add_route('/route', JsonResource(count))
+        headers = {'Accept-Encoding': accept_encoding} if accept_encoding else None
+        return b''.join(self.simulate_request('/route', headers=headers))
+
+    def test_gzip(self):
+        body = self.get(1000, 'gzip')
+
+        self.assertEqual('gzip', self.srmock.headers_dict['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', self.srmock.headers_dict['Vary'])
+        self.assertEqual(1000, len(json.loads(gzip.decompress(body).decode('utf-8'))))
+
+    def test_deflate_stream(self):
+        body = self.get(20000, 'deflate')
+
+        self.assertEqual('deflate', self.srmock.headers_dict['Content-Encoding'])
+        self.assertFalse('Content-Length' in self.srmock.headers_dict)
+        self.assertEqual(20000, len(json.loads(zlib.decompress(body).decode('utf-8'))))
+
+    def test_small_body_is_not_compressed(self):
+        body = self.get(1, 'gzip')
+
+        self.assertFalse('Content-Encoding' in self.srmock.headers_dict)
+        self.assertEqual(1, len(json.loads(body.decode('utf-8'))))
+
+    def test_not_accepted(self):
+        body = self.get(1000, None)
+
+        self.assertFalse('Content-Encoding' in self.srmock.headers_dict)
+        self.assertEqual('Accept-Encoding', self.srmock.headers_dict['Vary'])
+        self.assertEqual(1000, len(json.loads(body.decode('utf-8'))))
+
+    def test_versioned_etag_is_weak(self):
+        self.api.add_route('/route', versioned(type('VersionedJsonResource', (JsonResource,), {}))(1000))
+
+        self.simulate_request('/route', headers={'Accept-Encoding': 'gzip'})
+        etag = self.srmock.headers_dict['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        self.simulate_request('/route', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(falcon.HTTP_NOT_MODIFIED, self.srmock.status)
@@ -1,5 +1,7 @@
 import falcon
 from falcon.testing import TestResource as ResourceMock
+from itsdangerous import JSONWebSignatureSerializer
+from mock import Mock, patch
 from tests import RestTestBase
 from monitorrent.rest import no_auth, AuthMiddleware
 
@@ -59,3 +61,63 @@ class TestAuthMiddleware(RestTestBase):
         self.simulate_request(self.test_route, headers={'Cookie': 'jwt=random; HttpOnly; Path=/'})
 
         self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+
+
+class TestAuthMiddlewareCache(RestTestBase):
+    def setUp(self, disable_auth=False):
+        super(TestAuthMiddlewareCache, self).setUp(disable_auth)
+        self.generation = 1
+        self.auth_enabled = Mock(return_value=True)
+        AuthMiddleware.init('secret!', 'monitorrent', self.auth_enabled, lambda: self.generation)
+        self.cookie = AuthMiddleware.cookie_name + '=' + AuthMiddleware.serializer.dumps('monitorrent').decode()
+        self.api.add_route(self.test_route, ResourceMock())
+
+    @classmethod
+    def tearDownClass(cls):
+        AuthMiddleware.init('secret!', 'monitorrent', None)
+        super(TestAuthMiddlewareCache, cls).tearDownClass()
+
+    def test_verified_token_cache(self):
+        with patch.object(AuthMiddleware.serializer, 'loads', wraps=AuthMiddleware.serializer.loads) as loads:
+            for _ in range(3):
+                self.simulate_request(self.test_route, headers={'Cookie': self.cookie})
+                self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+            self.assertEqual(1, loads.call_count)
+            self.assertEqual(1, self.auth_enabled.call_count)
+
+            # settings change drops cached values
+            self.generation = 2
+            self.simulate_request(self.test_route, headers={'Cookie': self.cookie})
+            self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+            self.assertEqual(2, loads.call_count)
+            self.assertEqual(2, self.auth_enabled.call_count)
+
+    def test_invalid_token_is_not_cached(self):
+        with patch.object(AuthMiddleware.serializer, 'loads', wraps=AuthMiddleware.serializer.loads) as loads:
+            for _ in range(2):
+                self.simulate_request(self.test_route, headers={'Cookie': 'jwt=random'})
+                self.assertEqual(falcon.HTTP_UNAUTHORIZED, self.srmock.status)
+            self.assertEqual(2, loads.call_count)
+
+    def test_auth_enabled_cache(self):
+        self.auth_enabled.return_value = False
+        for _ in range(3):
+            self.simulate_request(self.test_route)
+            self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(1, self.auth_enabled.call_count)
+
+        self.auth_enabled.return_value = True
+        self.generation = 2
+        self.simulate_request(self.test_route)
+        self.assertEqual(falcon.HTTP_UNAUTHORIZED, self.srmock.status)
+
+    def test_verified_tokens_limit(self):
+        AuthMiddleware.max_verified_tokens = 2
+        try:
+            for i in range(3):
+                cookie = AuthMiddleware.cookie_name + '=' + \
+                         JSONWebSignatureSerializer('secret!', salt=str(i)).dumps('monitorrent').decode()
+                self.simulate_request(self.test_route, headers={'Cookie': cookie})
+            self.assertLessEqual(len(AuthMiddleware._verified_tokens), 2)
+        finally:
+            AuthMiddleware.max_verified_tokens = 64
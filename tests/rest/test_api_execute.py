@@ -4,7 +4,8 @@ from ddt import ddt, data
 from mock import MagicMock, Mock, patch, call
 from monitorrent.plugins.status import Status
 from tests import RestTestBase, TimeMock
-from monitorrent.rest.execute import ExecuteCall, ExecuteLogCurrent, ExecuteLogManager
+from monitorrent.rest.execute import ExecuteCall, ExecuteLogCurrent, ExecuteEvents, ExecuteLogManager, \
+    TooManyWaitersException
 
 
 class ExecuteLogCurrentTest(RestTestBase):
@@ -16,6 +17,7 @@ class ExecuteLogCurrentTest(RestTestBase):
         log_manager.is_running = Mock(return_value=False)
 
         time = TimeMock()
+        log_manager.wait_for_changes = Mock(side_effect=lambda sequence, timeout: time.sleep(timeout))
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_current = ExecuteLogCurrent(log_manager)
@@ -85,6 +87,8 @@ class ExecuteLogCurrentTest(RestTestBase):
 
         time = TimeMock()
         time.call_on(115, set_result)
+        wait_for_changes_mock = Mock(side_effect=lambda sequence, timeout: time.sleep(1) or True)
+        log_manager.wait_for_changes = wait_for_changes_mock
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_current = ExecuteLogCurrent(log_manager)
@@ -99,6 +103,47 @@ class ExecuteLogCurrentTest(RestTestBase):
 
             self.assertEqual(result, {'is_running': True, 'logs': [{}]})
 
+        # no DB queries while waiting, only one query per data change
+        self.assertEqual(15, wait_for_changes_mock.call_count)
+        self.assertEqual(16, log_manager.get_current_execute_log_details.call_count)
+
+    def test_wait_timeout_get(self):
+        log_manager = ExecuteLogManager()
+        log_manager.get_current_execute_log_details = Mock(return_value=[])
+        log_manager.is_running = Mock(return_value=True)
+        log_manager.wait_for_changes = Mock(return_value=False)
+
+        time = TimeMock()
+
+        with patch("monitorrent.rest.execute.time", time):
+            execute_log_current = ExecuteLogCurrent(log_manager)
+
+            self.api.add_route(self.test_route, execute_log_current)
+
+            body = self.simulate_request(self.test_route, query_string="after=17", decode='utf-8')
+
+            self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+            result = json.loads(body)
+
+            self.assertEqual(result, {'is_running': True, 'logs': []})
+
+        log_manager.wait_for_changes.assert_called_once_with(0, 30)
+        self.assertEqual(1, log_manager.get_current_execute_log_details.call_count)
+
+    def test_too_many_waiters_get(self):
+        log_manager = ExecuteLogManager(max_waiters=0)
+        log_manager.get_current_execute_log_details = Mock(return_value=[])
+        log_manager.is_running = Mock(return_value=True)
+
+        self.api.add_route(self.test_route, ExecuteLogCurrent(log_manager))
+        self.simulate_request(self.test_route, query_string="after=17")
+
+        # client has to repeat request later instead of polling in loop
+        self.assertEqual(self.srmock.status, falcon.HTTP_SERVICE_UNAVAILABLE)
+        self.assertEqual(str(ExecuteLogManager.RETRY_AFTER), self.srmock.headers_dict['Retry-After'])
+        self.assertEqual(1, log_manager.get_current_execute_log_details.call_count)
+
     def test_execute_logs_failure(self):
         log_manager = ExecuteLogManager()
         log_manager.get_current_execute_log_details = Mock(side_effect=Exception)
@@ -113,6 +158,96 @@ class ExecuteLogCurrentTest(RestTestBase):
             self.assertEqual(self.srmock.status, falcon.HTTP_INTERNAL_SERVER_ERROR)
 
 
+class ExecuteEventsTest(RestTestBase):
+    test_route = '/api/execute/events'
+
+    def get_events(self, log_manager, headers=None, query_string=None):
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager, wait_timeout=0.01))
+        kwargs = {'query_string': query_string} if query_string else {}
+        body = b''.join(self.simulate_request(self.test_route, headers=headers, **kwargs)).decode('utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertTrue('text/event-stream' in self.srmock.headers_dict['Content-Type'])
+
+        messages = [m for m in body.split('\n\n') if m]
+        self.assertEqual('retry: 1000', messages[0])
+        result = []
+        for message in messages[1:]:
+            fields = dict(line.split(': ', 1) for line in message.split('\n'))
+            result.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+        return result
+
+    def test_get_state(self):
+        log_manager = ExecuteLogManager()
+        log_manager._publish('log', {'id': 1})
+
+        events = self.get_events(log_manager)
+
+        self.assertEqual(events, [(1, 'state', {'is_running': False, 'progress': None, 'reset': False})])
+
+    def test_get_after_last_event_id(self):
+        log_manager = ExecuteLogManager()
+        log_manager._publish('started', {'execute_id': 1})
+        log_manager._publish('progress', {'execute_id': 1, 'progress': 50})
+        log_manager._publish('log', {'id': 10, 'message': u'Message'})
+
+        events = self.get_events(log_manager, headers={'Last-Event-ID': '1'})
+
+        self.assertEqual(events, [(2, 'progress', {'execute_id': 1, 'progress': 50}),
+                                  (3, 'log', {'id': 10, 'message': u'Message'})])
+
+    def test_get_after_last_event_id_query(self):
+        log_manager = ExecuteLogManager()
+        log_manager._publish('started', {'execute_id': 1})
+        log_manager._publish('finished', {'execute_id': 1})
+
+        events = self.get_events(log_manager, query_string='last_event_id=1')
+
+        self.assertEqual(events, [(2, 'finished', {'execute_id': 1})])
+
+    def test_get_missed_events(self):
+        log_manager = ExecuteLogManager(events_buffer_size=2)
+        for i in range(5):
+            log_manager._publish('log', {'id': i})
+
+        events = self.get_events(log_manager, headers={'Last-Event-ID': '1'})
+
+        self.assertEqual(events, [(5, 'state', {'is_running': False, 'progress': None, 'reset': True})])
+
+    def test_get_waits_for_events(self):
+        log_manager = ExecuteLogManager()
+
+        def wait_for_changes(sequence, timeout):
+            if sequence == 0:
+                log_manager._publish('started', {'execute_id': 1})
+                return True
+            return False
+
+        log_manager.wait_for_changes = Mock(side_effect=wait_for_changes)
+
+        events = self.get_events(log_manager, headers={'Last-Event-ID': '0'})
+
+        self.assertEqual(events, [(1, 'started', {'execute_id': 1})])
+        self.assertEqual(2, log_manager.wait_for_changes.call_count)
+
+    def test_get_too_many_waiters_delays_reconnect(self):
+        log_manager = ExecuteLogManager()
+        log_manager.wait_for_changes = Mock(side_effect=TooManyWaitersException(5))
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+        body = b''.join(self.simulate_request(self.test_route, headers={'Last-Event-ID': '0'})).decode('utf-8')
+
+        messages = [m for m in body.split('\n\n') if m]
+        self.assertEqual(['retry: 1000', 'retry: 5000'], messages)
+        log_manager.wait_for_changes.assert_called_once_with(0, 30)
+
+    def test_get_bad_last_event_id(self):
+        self.api.add_route(self.test_route, ExecuteEvents(ExecuteLogManager()))
+        self.simulate_request(self.test_route, headers={'Last-Event-ID': 'abc'})
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+
 @ddt
 class ExecuteCallTest(RestTestBase):
     def test_execute(self):
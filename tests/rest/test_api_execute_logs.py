@@ -119,3 +119,58 @@ class ExecuteLogsTest(RestTestBase):
 
         self.simulate_request('/api/execute/logs', query_string='take=10&skip=-1')
         self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, 'skip should be greater or equal to 0')
+
+    def test_get_keyset_paged(self):
+        entries = [{'id': i} for i in range(10, 0, -1)]
+
+        log_manager = MagicMock()
+        log_manager.get_log_entries = MagicMock(return_value=(entries[0:5], None))
+
+        # noinspection PyTypeChecker
+        execute_logs = ExecuteLogs(log_manager)
+
+        self.api.add_route('/api/execute/logs', execute_logs)
+
+        body = self.simulate_request('/api/execute/logs', query_string='take=5&after=11&count=none', decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+        result = json.loads(body)
+
+        self.assertEqual(entries[0:5], result['data'])
+        self.assertIsNone(result['count'])
+        self.assertEqual(6, result['next'])
+
+        log_manager.get_log_entries.assert_called_once_with(0, 5, after=11, count='none')
+
+    def test_get_last_page_has_no_next(self):
+        log_manager = MagicMock()
+        log_manager.get_log_entries = MagicMock(return_value=([{'id': 1}], 1))
+
+        # noinspection PyTypeChecker
+        execute_logs = ExecuteLogs(log_manager)
+
+        self.api.add_route('/api/execute/logs', execute_logs)
+
+        body = self.simulate_request('/api/execute/logs', query_string='take=5&after=2', decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+        result = json.loads(body)
+
+        self.assertIsNone(result['next'])
+
+    def test_bad_keyset_requests(self):
+        log_manager = MagicMock()
+        log_manager.get_log_entries = MagicMock(return_value=([], 0))
+
+        # noinspection PyTypeChecker
+        execute_logs = ExecuteLogs(log_manager)
+
+        self.api.add_route('/api/execute/logs', execute_logs)
+
+        self.simulate_request('/api/execute/logs', query_string='take=10&after=abcd')
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, 'after should be int')
+
+        self.simulate_request('/api/execute/logs', query_string='take=10&count=random')
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, 'count should be exact, approximate or none')
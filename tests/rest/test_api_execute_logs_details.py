@@ -79,6 +79,18 @@ class ExecuteLogDetailsTest(RestTestBase):
 
             self.assertEqual(result, {'is_running': True, 'logs': [{}]})
 
+    def test_too_many_waiters_get(self):
+        log_manager = ExecuteLogManager(max_waiters=0)
+        log_manager.get_execute_log_details = Mock(return_value=[])
+        log_manager.is_running = Mock(return_value=True)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/details', ExecuteLogsDetails(log_manager))
+        self.simulate_request('/api/execute/logs/1/details', query_string="after=17")
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_SERVICE_UNAVAILABLE)
+        self.assertEqual(str(ExecuteLogManager.RETRY_AFTER), self.srmock.headers_dict['Retry-After'])
+        self.assertEqual(1, log_manager.get_execute_log_details.call_count)
+
     def test_no_wait_after_get(self):
         log_manager = ExecuteLogManager()
         get_execute_log_details_mock = Mock(return_value=[{}])
@@ -114,6 +126,8 @@ class ExecuteLogDetailsTest(RestTestBase):
 
         time = TimeMock()
         time.call_on(115, set_result)
+        wait_for_changes_mock = Mock(side_effect=lambda sequence, timeout: time.sleep(1) or True)
+        log_manager.wait_for_changes = wait_for_changes_mock
 
         with patch("monitorrent.rest.execute_logs_details.time", time):
             execute_log_details = ExecuteLogsDetails(log_manager)
@@ -127,3 +141,54 @@ class ExecuteLogDetailsTest(RestTestBase):
             result = json.loads(body)
 
             self.assertEqual(result, {'is_running': True, 'logs': [{}]})
+
+        self.assertEqual(15, wait_for_changes_mock.call_count)
+
+    def test_wait_stopped_execute_get(self):
+        log_manager = ExecuteLogManager()
+        log_manager.get_execute_log_details = Mock(return_value=[])
+        log_manager.is_running = Mock(return_value=False)
+        log_manager.wait_for_changes = Mock()
+
+        execute_log_details = ExecuteLogsDetails(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/details', execute_log_details)
+
+        body = self.simulate_request('/api/execute/logs/1/details', query_string="after=17", decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(json.loads(body), {'is_running': False, 'logs': []})
+        log_manager.wait_for_changes.assert_not_called()
+
+    def test_get_paged(self):
+        log_manager = MagicMock()
+        get_execute_log_details_mock = Mock(return_value=[{'id': 18}, {'id': 19}])
+        log_manager.get_execute_log_details = get_execute_log_details_mock
+        log_manager.is_running = MagicMock(return_value=False)
+
+        # noinspection PyTypeChecker
+        execute_log_details = ExecuteLogsDetails(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/details', execute_log_details)
+
+        body = self.simulate_request('/api/execute/logs/1/details', query_string="after=17&take=2", decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+        result = json.loads(body)
+
+        self.assertEqual(result, {'is_running': False, 'logs': [{'id': 18}, {'id': 19}], 'next': 19})
+
+        get_execute_log_details_mock.assert_has_calls([call(1, 17, take=2)])
+
+    def test_get_paged_bad_request(self):
+        log_manager = MagicMock()
+
+        # noinspection PyTypeChecker
+        execute_log_details = ExecuteLogsDetails(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/details', execute_log_details)
+
+        self.simulate_request('/api/execute/logs/1/details', query_string="take=0")
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
@@ -10,11 +10,14 @@ from monitorrent.settings_manager import SettingsManager
 @ddt
 class SettingsLogsTest(RestTestBase):
     remove_logs_interval_property = 'monitorrent.settings_manager.SettingsManager.remove_logs_interval'
+    remove_logs_max_size_property = 'monitorrent.settings_manager.SettingsManager.remove_logs_max_size'
 
     @data(10, 11, 12, 13)
     def test_is_developer_mode(self, value):
-        with patch(self.remove_logs_interval_property, new_callable=PropertyMock) as remove_logs_interval_mock:
+        with patch(self.remove_logs_interval_property, new_callable=PropertyMock) as remove_logs_interval_mock, \
+                patch(self.remove_logs_max_size_property, new_callable=PropertyMock) as remove_logs_max_size_mock:
             remove_logs_interval_mock.return_value = value
+            remove_logs_max_size_mock.return_value = 0
             settings_manager = SettingsManager()
             settings_logs_resource = SettingsLogs(settings_manager)
             self.api.add_route('/api/settings/logs', settings_logs_resource)
@@ -26,7 +29,7 @@ class SettingsLogsTest(RestTestBase):
 
             result = json.loads(body)
 
-            self.assertEqual(result, {'interval': value})
+            self.assertEqual(result, {'interval': value, 'max_size': 0})
 
             remove_logs_interval_mock.assert_called_once_with()
 
@@ -45,9 +48,26 @@ class SettingsLogsTest(RestTestBase):
 
             remove_logs_interval_mock.assert_called_once_with(value)
 
+    def test_set_max_size(self):
+        with patch(self.remove_logs_interval_property, new_callable=PropertyMock) as remove_logs_interval_mock, \
+                patch(self.remove_logs_max_size_property, new_callable=PropertyMock) as remove_logs_max_size_mock:
+            settings_manager = SettingsManager()
+            settings_logs_resource = SettingsLogs(settings_manager)
+            self.api.add_route('/api/settings/logs', settings_logs_resource)
+
+            request = {'interval': 10, 'max_size': 100}
+            self.simulate_request("/api/settings/logs", method="PUT", body=json.dumps(request))
+
+            self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+
+            remove_logs_interval_mock.assert_called_once_with(10)
+            remove_logs_max_size_mock.assert_called_once_with(100)
+
     @data({'interval': 'random_text'},
           {'interval': '10'},
           {'wrong_param': '10'},
+          {'interval': 10, 'max_size': '10'},
+          {'interval': 10, 'max_size': -1},
           None)
     def test_bad_request(self, body):
         settings_manager = SettingsManager()
@@ -2,10 +2,16 @@ from builtins import str
 # coding=utf-8
 from email.utils import formatdate
 from collections import namedtuple
+import gzip
+import mimetypes
+import os
+import shutil
+import tempfile
 import falcon
 from ddt import ddt, data
 from mock import patch, mock_open, MagicMock, Mock
-from monitorrent.rest.static_file import StaticFiles
+from monitorrent.rest import AuthMiddleware
+from monitorrent.rest.static_file import StaticFiles, StaticAssets
 from tests import RestTestBase
 
 
@@ -102,3 +108,140 @@ class TestStaticFiles(RestTestBase):
 
             self.simulate_request('/index.html')
             self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
+
+
+class TestStaticAssets(RestTestBase):
+    index_text = b'<HTML>' + b'Index ' * 500 + b'</HTML>'
+    script_text = b'var a = 1;'
+
+    def setUp(self, disable_auth=True):
+        super(TestStaticAssets, self).setUp(disable_auth)
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'scripts'))
+        self.write('index.html', self.index_text)
+        self.write('login.html', b'<HTML>Login</HTML>')
+        self.write('scripts/app.js', self.script_text)
+        self.write('scripts/big.js', b'var b = 2;' * 1000)
+        self.write('scripts/big.js.gz', gzip.compress(b'var b = 2;' * 1000))
+
+        self.assets = StaticAssets(self.folder, aliases={'': 'index.html', 'login': 'login.html'},
+                                   public_files=['login.html'], max_cached_size=4096)
+        self.api.add_sink(self.assets, r'/(?!api/)')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        super(TestStaticAssets, self).tearDown()
+
+    def write(self, name, content):
+        with open(os.path.join(self.folder, name), 'wb') as f:
+            f.write(content)
+
+    def get(self, path, headers=None):
+        with patch.object(AuthMiddleware, 'validate_auth', Mock(return_value=True)):
+            return b''.join(self.simulate_request(path, headers=headers))
+
+    def test_index(self):
+        self.assertEqual(5, len(self.assets.assets))
+        self.assertIsNotNone(self.assets.assets['index.html'].data)
+        self.assertIsNotNone(self.assets.assets['index.html'].gzip_data)
+        self.assertIsNone(self.assets.assets['scripts/app.js'].gzip_data)
+        self.assertIsNone(self.assets.assets['scripts/big.js'].data)
+        self.assertIsNotNone(self.assets.assets['scripts/big.js'].gzip_path)
+
+    def test_get_cached(self):
+        with patch('monitorrent.rest.static_file.open', create=True) as open_mock:
+            body = self.get('/scripts/app.js')
+            open_mock.assert_not_called()
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(self.script_text, body)
+        self.assertEqual(mimetypes.guess_type('app.js')[0], self.srmock.headers_dict['Content-Type'])
+        self.assertEqual(self.assets.assets['scripts/app.js'].etag, self.srmock.headers_dict['ETag'])
+        self.assertFalse('Content-Encoding' in self.srmock.headers_dict)
+
+    def test_get_alias_gzip(self):
+        body = self.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual('gzip', self.srmock.headers_dict['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', self.srmock.headers_dict['Vary'])
+        self.assertEqual(self.index_text, gzip.decompress(body))
+
+    def test_get_big_file(self):
+        body = self.get('/scripts/big.js')
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(b'var b = 2;' * 1000, body)
+
+        body = self.get('/scripts/big.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual('gzip', self.srmock.headers_dict['Content-Encoding'])
+        self.assertEqual(b'var b = 2;' * 1000, gzip.decompress(body))
+
+    def test_if_none_match(self):
+        etag = self.assets.assets['index.html'].etag
+
+        self.get('/', headers={'If-None-Match': etag})
+
+        self.assertEqual(falcon.HTTP_NOT_MODIFIED, self.srmock.status)
+
+    def test_if_modified_since(self):
+        self.get('/', headers={'If-Modified-Since': self.assets.assets['index.html'].last_modified})
+
+        self.assertEqual(falcon.HTTP_NOT_MODIFIED, self.srmock.status)
+
+    def test_if_modified_since_wrong_date(self):
+        body = self.get('/', headers={'If-Modified-Since': 'yesterday'})
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(self.index_text, body)
+
+    def test_get_big_file_changed_after_index(self):
+        etag = self.assets.assets['scripts/big.js'].etag
+        self.write('scripts/big.js', b'var c = 3;' * 2000)
+        big_path = os.path.join(self.folder, 'scripts', 'big.js')
+        os.utime(big_path, (os.path.getatime(big_path), os.path.getmtime(big_path) + 10))
+
+        body = self.get('/scripts/big.js')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(b'var c = 3;' * 2000, body)
+        self.assertEqual(str(len(body)), self.srmock.headers_dict['Content-Length'])
+        self.assertNotEqual(etag, self.srmock.headers_dict['ETag'])
+
+    def test_get_file_added_after_index(self):
+        self.write('scripts/new.js', b'var n = 1;')
+
+        body = self.get('/scripts/new.js')
+
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(b'var n = 1;', body)
+        self.assertIn('scripts/new.js', self.assets.assets)
+
+    def test_get_file_removed_after_index(self):
+        os.remove(os.path.join(self.folder, 'scripts', 'big.js'))
+
+        self.get('/scripts/big.js')
+
+        self.assertEqual(falcon.HTTP_NOT_FOUND, self.srmock.status)
+        self.assertNotIn('scripts/big.js', self.assets.assets)
+
+    def test_not_found(self):
+        self.get('/scripts/unknown.js')
+        self.assertEqual(falcon.HTTP_NOT_FOUND, self.srmock.status)
+
+        self.get('/../index.html')
+        self.assertEqual(falcon.HTTP_NOT_FOUND, self.srmock.status)
+
+    def test_method_not_allowed(self):
+        self.simulate_request('/', method='POST')
+        self.assertEqual(falcon.HTTP_METHOD_NOT_ALLOWED, self.srmock.status)
+
+    def test_redirect_to_login(self):
+        with patch.object(AuthMiddleware, 'validate_auth', Mock(return_value=False)):
+            self.simulate_request('/')
+            self.assertEqual(falcon.HTTP_FOUND, self.srmock.status)
+            self.assertEqual('/login', self.srmock.headers_dict['location'])
+
+            body = b''.join(self.simulate_request('/login'))
+        self.assertEqual(falcon.HTTP_OK, self.srmock.status)
+        self.assertEqual(b'<HTML>Login</HTML>', body)
@@ -4,9 +4,11 @@ import falcon
 from mock import MagicMock, Mock
 from ddt import ddt, data
 from tests import RestTestBase
-from monitorrent.rest.topics import TopicCollection, TopicParse, Topic, TopicResetStatus, TopicPauseState
+from monitorrent.rest.topics import TopicCollection, TopicParse, TopicBulk, Topic, TopicResetStatus, TopicPauseState, \
+    TopicBulkDelete, TopicBulkResetStatus, TopicBulkPauseState
 from monitorrent.plugins.trackers import TrackerSettings
 from monitorrent.plugin_managers import TrackersManager
+from monitorrent.plugins.status import Status
 
 
 class TrackersManagerMixin(object):
@@ -46,6 +48,57 @@ class TopicCollectionTest(RestTestBase, TrackersManagerMixin):
 
         self.assertEqual(result[0], topic1)
 
+    def test_get_filtered(self):
+        topic1 = {'id': 1, 'url': 'http://1', 'display_name': '1', 'last_update': None}
+        self.tracker_manager.get_watching_topics = MagicMock(return_value=[topic1])
+
+        self.api.add_route('/api/topics', TopicCollection(self.tracker_manager))
+
+        query = 'tracker=lostfilm.tv&statuses=error,notfound&paused=false&search=Mon&order_by=display_name&desc=true'
+        body = self.simulate_request('/api/topics', query_string=query, decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual([topic1], json.loads(body))
+        self.tracker_manager.get_watching_topics.assert_called_once_with(
+            tracker='lostfilm.tv', statuses=[Status.Error, Status.NotFound], paused=False, search='Mon',
+            order_by='display_name', desc=True)
+
+    @data(2, 3)
+    def test_get_page(self, take):
+        topics = [{'id': 3, 'display_name': '3'}, {'id': 5, 'display_name': '5'}]
+        self.tracker_manager.get_watching_topics = MagicMock(return_value=topics)
+        self.tracker_manager.get_watching_topics_count = MagicMock(return_value=10)
+
+        self.api.add_route('/api/topics', TopicCollection(self.tracker_manager))
+
+        query = 'paused=true&take={0}&after=1'.format(take)
+        body = self.simulate_request('/api/topics', query_string=query, decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual({'data': topics, 'count': 10, 'next': 5 if take == 2 else None}, json.loads(body))
+        self.tracker_manager.get_watching_topics.assert_called_once_with(paused=True, take=take, after=1)
+        self.tracker_manager.get_watching_topics_count.assert_called_once_with(paused=True)
+
+    @data('order_by=name', 'statuses=wrong', 'take=0', 'take=1000', 'after=1', 'paused=maybe')
+    def test_get_wrong_params(self, query):
+        self.tracker_manager.get_watching_topics = MagicMock(return_value=[])
+
+        self.api.add_route('/api/topics', TopicCollection(self.tracker_manager))
+
+        self.simulate_request('/api/topics', query_string=query)
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.tracker_manager.get_watching_topics.assert_not_called()
+
+    def test_get_page_removed_after(self):
+        self.tracker_manager.get_watching_topics = MagicMock(side_effect=KeyError('Topic 1 not found'))
+
+        self.api.add_route('/api/topics', TopicCollection(self.tracker_manager))
+
+        self.simulate_request('/api/topics', query_string='take=10&after=1&order_by=display_name')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
     def test_successful_add_topic(self):
         self.tracker_manager.add_topic = MagicMock(return_value=True)
 
@@ -137,6 +190,56 @@ class TopicParseTest(RestTestBase, TrackersManagerMixin):
         self.assertTrue('application/json' in self.srmock.headers_dict['Content-Type'])
 
 
+@ddt
+class TopicBulkTest(RestTestBase, TrackersManagerMixin):
+    def setUp(self, disable_auth=True):
+        super(TopicBulkTest, self).setUp(disable_auth)
+        self.trackers_manager_set_up()
+
+    def test_successful_add_topics(self):
+        results = [{'url': 'http://1', 'status': 'parsed', 'tracker': 't', 'display_name': '1'},
+                   {'url': 'http://2', 'status': 'unsupported'},
+                   {'status': 'completed', 'added': 1, 'exists': 0, 'unsupported': 1, 'failed': 0}]
+        self.tracker_manager.add_topics = MagicMock(return_value=iter(results))
+
+        self.api.add_route('/api/topics/bulk', TopicBulk(self.tracker_manager))
+
+        request = {'urls': ['http://1', {'url': 'http://2', 'settings': {'download_dir': '/tmp'}}],
+                   'settings': {'quality': 'SD'}}
+        body = b''.join(self.simulate_request('/api/topics/bulk', method="POST", body=json.dumps(request)))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertTrue('application/x-ndjson' in self.srmock.headers_dict['Content-Type'])
+        self.assertEqual(results, [json.loads(line) for line in body.decode('utf-8').splitlines()])
+        self.tracker_manager.add_topics.assert_called_once_with(
+            [('http://1', None), ('http://2', {'download_dir': '/tmp'})], {'quality': 'SD'})
+
+    @data({'urls': []}, {'urls': 'http://1'}, {'urls': ['http://1'], 'settings': 1}, {'urls': [1]},
+          {'urls': [{'settings': {}}]}, {'urls': [{'url': 'http://1', 'settings': 'a'}]}, ['http://1'])
+    def test_failed_add_topics(self, request):
+        self.tracker_manager.add_topics = MagicMock()
+
+        self.api.add_route('/api/topics/bulk', TopicBulk(self.tracker_manager))
+
+        self.simulate_request('/api/topics/bulk', method="POST", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.tracker_manager.add_topics.assert_not_called()
+
+    def test_too_many_urls(self):
+        self.tracker_manager.add_topics = MagicMock()
+
+        topic_bulk = TopicBulk(self.tracker_manager)
+        topic_bulk.max_urls = 2
+        self.api.add_route('/api/topics/bulk', topic_bulk)
+
+        request = {'urls': ['http://1', 'http://2', 'http://3']}
+        self.simulate_request('/api/topics/bulk', method="POST", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.tracker_manager.add_topics.assert_not_called()
+
+
 @ddt
 class TopicTest(RestTestBase, TrackersManagerMixin):
     def setUp(self, disable_auth=True):
@@ -324,3 +427,89 @@ class TopicPauseStateTest(RestTestBase, TrackersManagerMixin):
                               body=json.dumps({'paused': True}))
         set_topic_paused_mock.assert_called_once_with('1', True)
         self.assertEqual(self.srmock.status, falcon.HTTP_INTERNAL_SERVER_ERROR)
+
+
+@ddt
+class TopicBulkActionsTest(RestTestBase, TrackersManagerMixin):
+    def setUp(self, disable_auth=True):
+        super(TopicBulkActionsTest, self).setUp(disable_auth)
+        self.trackers_manager_set_up()
+
+    def test_delete(self):
+        self.tracker_manager.remove_topics = MagicMock(return_value=2)
+        self.api.add_route('/api/topics/bulk/delete', TopicBulkDelete(self.tracker_manager))
+
+        request = {'ids': [1, 2], 'statuses': ['error', 'notfound'], 'tracker': 'lostfilm.tv'}
+        body = self.simulate_request('/api/topics/bulk/delete', method="POST", body=json.dumps(request),
+                                     decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual({'count': 2}, json.loads(body))
+        self.tracker_manager.remove_topics.assert_called_once_with(ids=[1, 2], statuses=[Status.Error, Status.NotFound],
+                                                                   tracker='lostfilm.tv')
+
+    def test_reset_status(self):
+        self.tracker_manager.reset_topics_status = MagicMock(return_value=3)
+        self.api.add_route('/api/topics/bulk/reset_status', TopicBulkResetStatus(self.tracker_manager))
+
+        body = self.simulate_request('/api/topics/bulk/reset_status', method="POST",
+                                     body=json.dumps({'statuses': ['error']}), decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual({'count': 3}, json.loads(body))
+        self.tracker_manager.reset_topics_status.assert_called_once_with(statuses=[Status.Error])
+
+    def test_pause(self):
+        self.tracker_manager.set_topics_paused = MagicMock(return_value=400)
+        self.tracker_manager.set_topic_paused = MagicMock(return_value=True)
+        self.api.add_route('/api/topics/{id}/pause', TopicPauseState(self.tracker_manager))
+        self.api.add_route('/api/topics/bulk/pause', TopicBulkPauseState(self.tracker_manager))
+
+        body = self.simulate_request('/api/topics/bulk/pause', method="POST",
+                                     body=json.dumps({'tracker': 'lostfilm.tv', 'paused': True}), decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual({'count': 400}, json.loads(body))
+        self.tracker_manager.set_topics_paused.assert_called_once_with(True, tracker='lostfilm.tv')
+        self.tracker_manager.set_topic_paused.assert_not_called()
+
+    @data({'ids': [1]}, {'ids': [1], 'paused': 'true'})
+    def test_pause_wrong_state(self, request):
+        self.tracker_manager.set_topics_paused = MagicMock(return_value=1)
+        self.api.add_route('/api/topics/bulk/pause', TopicBulkPauseState(self.tracker_manager))
+
+        self.simulate_request('/api/topics/bulk/pause', method="POST", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.tracker_manager.set_topics_paused.assert_not_called()
+
+    @data({}, {'ids': None}, {'ids': 1}, {'ids': ['a']}, {'statuses': ['unknown_status']}, {'statuses': [1]},
+          [1, 2])
+    def test_wrong_filter(self, request):
+        self.tracker_manager.remove_topics = MagicMock(return_value=2)
+        self.api.add_route('/api/topics/bulk/delete', TopicBulkDelete(self.tracker_manager))
+
+        self.simulate_request('/api/topics/bulk/delete', method="POST", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.tracker_manager.remove_topics.assert_not_called()
+
+    @data({'ids': '12'}, {'ids': 12}, {'ids': ['1', '2']}, {'ids': [True]}, {'statuses': 'error'},
+          {'statuses': 1}, {'tracker': 5}, {'tracker': ['lostfilm.tv']}, '12', 12)
+    def test_wrong_filter_types_for_all_actions(self, request):
+        self.tracker_manager.remove_topics = MagicMock(return_value=2)
+        self.tracker_manager.reset_topics_status = MagicMock(return_value=2)
+        self.tracker_manager.set_topics_paused = MagicMock(return_value=2)
+        self.api.add_route('/api/topics/bulk/delete', TopicBulkDelete(self.tracker_manager))
+        self.api.add_route('/api/topics/bulk/reset_status', TopicBulkResetStatus(self.tracker_manager))
+        self.api.add_route('/api/topics/bulk/pause', TopicBulkPauseState(self.tracker_manager))
+
+        for url in ['/api/topics/bulk/delete', '/api/topics/bulk/reset_status', '/api/topics/bulk/pause']:
+            body = dict(request, paused=True) if isinstance(request, dict) else request
+            self.simulate_request(url, method="POST", body=json.dumps(body))
+
+            self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, url)
+
+        self.tracker_manager.remove_topics.assert_not_called()
+        self.tracker_manager.reset_topics_status.assert_not_called()
+        self.tracker_manager.set_topics_paused.assert_not_called()
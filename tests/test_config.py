@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from ddt import ddt, data, unpack
+from mock import patch
+from tests import TestCase
+from monitorrent.config import Config, create_parser
+
+
+@ddt
+class ConfigTest(TestCase):
+    def setUp(self):
+        super(ConfigTest, self).setUp()
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        environ_patcher = patch.dict(os.environ, clear=True)
+        environ_patcher.start()
+        self.addCleanup(environ_patcher.stop)
+
+    def create_config(self, args=None, config_content=None):
+        config_path = os.path.join(self.config_dir, 'config.py')
+        if config_content is not None:
+            with open(config_path, 'w') as config_file:
+                config_file.write(config_content)
+        return Config(create_parser().parse_args(['--config', config_path] + (args or [])))
+
+    def test_defaults(self):
+        with patch('monitorrent.config.warnings'):
+            config = self.create_config()
+
+        self.assertEqual(6687, config.port)
+        self.assertEqual(10, config.threads)
+        self.assertEqual(-1, config.max_threads)
+        self.assertEqual(4, config.longpoll_threads)
+        self.assertEqual(5, config.request_queue_size)
+        self.assertEqual(10, config.socket_timeout)
+        self.assertEqual(10, config.keep_alive_conn_limit)
+
+    @data(('threads', 20), ('max_threads', 40), ('longpoll_threads', 8), ('request_queue_size', 50),
+          ('socket_timeout', 30), ('keep_alive_conn_limit', 100))
+    @unpack
+    def test_server_option_from_config_file(self, option, value):
+        config = self.create_config(config_content='{0} = {1}\n'.format(option, value))
+
+        self.assertEqual(value, getattr(config, option))
+
+    @data(('threads', 20), ('max_threads', 40), ('longpoll_threads', 8), ('request_queue_size', 50),
+          ('socket_timeout', 30), ('keep_alive_conn_limit', 100))
+    @unpack
+    def test_server_option_from_environment(self, option, value):
+        os.environ['MONITORRENT_' + option.upper()] = str(value)
+
+        config = self.create_config(config_content='{0} = 1\n'.format(option))
+
+        self.assertEqual(value, getattr(config, option))
+
+    @data(('threads', 20), ('max_threads', 40), ('longpoll_threads', 8), ('request_queue_size', 50),
+          ('socket_timeout', 30), ('keep_alive_conn_limit', 100))
+    @unpack
+    def test_server_option_from_arguments(self, option, value):
+        os.environ['MONITORRENT_' + option.upper()] = '2'
+
+        config = self.create_config(['--' + option.replace('_', '-'), str(value)],
+                                    config_content='{0} = 1\n'.format(option))
+
+        self.assertEqual(value, getattr(config, option))
+
+    def test_wrong_environment_value_is_ignored(self):
+        os.environ['MONITORRENT_THREADS'] = 'many'
+
+        config = self.create_config(config_content='threads = 12\n')
+
+        self.assertEqual(12, config.threads)
+
+    def test_broken_config_file_is_ignored(self):
+        with patch('monitorrent.config.warnings') as warnings_mock:
+            config = self.create_config(config_content='threads = \n')
+
+        warnings_mock.warn.assert_called_once()
+        self.assertEqual(10, config.threads)
+
+    @data('compression_level = 0\n', 'compression_level = -1\n', 'compression_level = 9\n')
+    def test_compression_level_from_config_file(self, config_content):
+        config = self.create_config(config_content=config_content)
+
+        self.assertEqual(int(config_content.split('=')[1]), config.compression_level)
+
+    @data('compression_level = 10\n', 'compression_level = -2\n', 'compression_level = "6"\n',
+          'compression_level = True\n')
+    def test_wrong_compression_level_from_config_file_raises(self, config_content):
+        with self.assertRaises(ValueError):
+            self.create_config(config_content=config_content)
+
+    @data('-1', '0', '9')
+    def test_compression_level_from_arguments(self, value):
+        config = self.create_config(['--compression-level', value], config_content='compression_level = 1\n')
+
+        self.assertEqual(int(value), config.compression_level)
+
+    def test_wrong_compression_level_from_arguments_raises(self):
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            self.create_config(['--compression-level', '10'], config_content='')
+
+    def test_wrong_compression_level_from_environment_raises(self):
+        os.environ['MONITORRENT_COMPRESSION_LEVEL'] = '15'
+
+        with self.assertRaises(ValueError):
+            self.create_config(config_content='')
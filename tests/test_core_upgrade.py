@@ -1,8 +1,9 @@
 from mock import Mock, patch, call
 from sqlalchemy import Column, String, Integer, Table, MetaData
 from monitorrent.db import DBSession
-from monitorrent.upgrade_manager import core_upgrade, upgrade, _operation_factory
-from tests import UpgradeTestCase
+from monitorrent.upgrade_manager import core_upgrade, upgrade, _operation_factory, call_ugprades, \
+    get_stored_versions, SchemaVersion, post_upgrade
+from tests import UpgradeTestCase, DbTestCase
 
 
 class CoreUpgradeTest(UpgradeTestCase):
@@ -60,4 +61,72 @@ class UpgradeTest(UpgradeTestCase):
             self._upgrade()
 
         core_upgrade_mock.assert_called_once_with(_operation_factory)
-        call_ugprades_mock.assert_called_once_with(upgrades_mock)
+        call_ugprades_mock.assert_called_once_with(upgrades_mock, check_versions=True)
+
+    def test_upgrade_creates_schema_versions_once(self):
+        core_upgrade_mock = Mock()
+        with patch("monitorrent.upgrade_manager.core_upgrade", core_upgrade_mock), \
+                patch("monitorrent.upgrade_manager.upgrades", list()):
+            self._upgrade()
+            self._upgrade()
+
+        self.assertTrue(self.has_table(SchemaVersion.__tablename__))
+        core_upgrade_mock.assert_called_once_with(_operation_factory)
+
+
+calls = []
+
+
+# noinspection PyUnusedLocal
+def versioned_upgrade(engine, operations_factory):
+    calls.append(engine)
+
+
+class SchemaVersionsTest(DbTestCase):
+    def setUp(self):
+        super(SchemaVersionsTest, self).setUp()
+        del calls[:]
+        self.name = 'tests.test_core_upgrade.versioned_upgrade'
+
+    def test_upgrade_is_skipped_for_stored_version(self):
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {versioned_upgrade: 2}):
+            call_ugprades([versioned_upgrade], check_versions=True)
+            call_ugprades([versioned_upgrade], check_versions=True)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual({self.name: 2}, get_stored_versions())
+
+    def test_upgrade_is_called_for_new_version(self):
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {versioned_upgrade: 1}):
+            call_ugprades([versioned_upgrade], check_versions=True)
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {versioned_upgrade: 2}):
+            call_ugprades([versioned_upgrade], check_versions=True)
+
+        self.assertEqual(2, len(calls))
+        self.assertEqual({self.name: 2}, get_stored_versions())
+
+    def test_failed_upgrade_version_is_not_stored(self):
+        failed_upgrade = Mock(side_effect=Exception, __module__='tests', __name__='failed_upgrade')
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {failed_upgrade: 1}):
+            call_ugprades([failed_upgrade], check_versions=True)
+            call_ugprades([failed_upgrade], check_versions=True)
+
+        self.assertEqual(2, failed_upgrade.call_count)
+        self.assertEqual({}, get_stored_versions())
+
+    def test_upgrade_without_version_is_always_called(self):
+        call_ugprades([versioned_upgrade], check_versions=True)
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {versioned_upgrade: 1}):
+            call_ugprades([versioned_upgrade])
+            call_ugprades([versioned_upgrade])
+
+        self.assertEqual(3, len(calls))
+        self.assertEqual({}, get_stored_versions())
+
+    def test_post_upgrade_is_called_in_background(self):
+        with patch.dict("monitorrent.upgrade_manager.schema_versions", {versioned_upgrade: 1}):
+            post_upgrade([versioned_upgrade]).join(10)
+            post_upgrade([versioned_upgrade]).join(10)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual({self.name: 1}, get_stored_versions())
@@ -1,6 +1,7 @@
 from mock import Mock
 from sqlalchemy import MetaData, Table, Column, String, Integer
-from monitorrent.db import DBSession, MigrationContext, MonitorrentOperations, UTCDateTime
+from monitorrent.db import DBSession, MigrationContext, MonitorrentOperations, UTCDateTime, data_version, \
+    create_db
 from monitorrent.upgrade_manager import call_ugprades
 from tests import DbTestCase
 
@@ -12,6 +13,18 @@ class DbTest(DbTestCase):
 
         self.assertEqual(1, upgrade_func.call_count)
 
+    def test_create_db_creates_only_missing_tables(self):
+        with DBSession() as db:
+            db.execute("DROP TABLE schema_versions")
+            db.execute("INSERT INTO topics (display_name, url, type, status, paused) "
+                       "VALUES ('Topic', 'http://tracker/1', 'topic', 'Ok', 0)")
+
+        create_db()
+
+        self.assertTrue(self.has_table('schema_versions'))
+        with DBSession() as db:
+            self.assertEqual(1, db.execute("SELECT COUNT(*) FROM topics").scalar())
+
     def test_monitorrent_operations_create_table(self):
         with DBSession() as db:
             migration_context = MigrationContext.configure(db)
@@ -43,3 +56,69 @@ class DbTest(DbTestCase):
                                                 Column('new_column', Integer))
 
             db.rollback()
+
+    def test_data_version(self):
+        with DBSession() as db:
+            db.execute('CREATE TABLE account (id INTEGER PRIMARY KEY, name VARCHAR)')
+
+        version = data_version.value
+        with DBSession() as db:
+            db.execute('SELECT * FROM account').fetchall()
+        self.assertEqual(version, data_version.value)
+
+        with DBSession() as db:
+            db.execute("INSERT INTO account (name) VALUES ('name')")
+            # version is bumped only after connection is released
+            self.assertEqual(version, data_version.value)
+        self.assertEqual(version + 1, data_version.value)
+
+        with self.engine.connect() as connection:
+            connection.execute("UPDATE account SET name = 'name 2'")
+        self.assertEqual(version + 2, data_version.value)
+
+    def test_data_version_is_write_statement(self):
+        self.assertTrue(data_version.is_write_statement('INSERT INTO account VALUES (1)'))
+        self.assertTrue(data_version.is_write_statement('  update account SET name = 1'))
+        self.assertTrue(data_version.is_write_statement('DELETE FROM account'))
+        self.assertFalse(data_version.is_write_statement('SELECT * FROM account'))
+        self.assertFalse(data_version.is_write_statement('PRAGMA page_count'))
+
+    def _create_accounts(self, count):
+        m = MetaData()
+        accounts = Table('account', m,
+                         Column('id', Integer, primary_key=True),
+                         Column('name', String, nullable=False),
+                         Column('description', String))
+        accounts1 = Table('account1', m,
+                          Column('id', Integer, primary_key=True),
+                          Column('name', String, nullable=False))
+        m.create_all(self.engine)
+        with DBSession() as db:
+            db.execute(accounts.insert(), [{'name': 'name {0}'.format(i), 'description': 'description'}
+                                           for i in range(count)])
+        return accounts, accounts1
+
+    def test_monitorrent_operations_copy_table(self):
+        accounts, accounts1 = self._create_accounts(10)
+
+        with DBSession() as db:
+            monitorrent_operations = MonitorrentOperations(db, MigrationContext.configure(db))
+            self.assertEqual(10, monitorrent_operations.copy_table(accounts, accounts1))
+
+        with DBSession() as db:
+            rows = db.execute(accounts1.select().order_by(accounts1.c.id)).fetchall()
+        self.assertEqual([(i + 1, 'name {0}'.format(i)) for i in range(10)], [tuple(r) for r in rows])
+
+    def test_monitorrent_operations_copy_table_with_row_mapping_by_batches(self):
+        accounts, accounts1 = self._create_accounts(10)
+        row_mapping = Mock(side_effect=lambda row: {'id': row['id'], 'name': row['name'].upper()})
+
+        with DBSession() as db:
+            monitorrent_operations = MonitorrentOperations(db, MigrationContext.configure(db))
+            monitorrent_operations.batch_size = 3
+            self.assertEqual(10, monitorrent_operations.copy_table(accounts, accounts1, row_mapping))
+
+        self.assertEqual(10, row_mapping.call_count)
+        with DBSession() as db:
+            rows = db.execute(accounts1.select().order_by(accounts1.c.id)).fetchall()
+        self.assertEqual([(i + 1, 'NAME {0}'.format(i)) for i in range(10)], [tuple(r) for r in rows])
@@ -1,5 +1,5 @@
 import sys
-from threading import Event
+from threading import Event, Thread, current_thread
 from ddt import ddt, data
 from time import time, sleep
 from datetime import datetime, timedelta
@@ -8,7 +8,7 @@ import pytz
 from monitorrent.utils.bittorrent_ex import Torrent
 from tests import TestCase, DbTestCase, DBSession
 from monitorrent.engine import Engine, Logger, EngineRunner, DBEngineRunner, DbLoggerWrapper, Execute, ExecuteLog,\
-    ExecuteLogManager, ExecuteSettings
+    ExecuteLogManager, ExecuteSettings, ExecuteLogRetention, TooManyWaitersException
 from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import ClientsManager, TrackersManager, NotifierManager
 from monitorrent.plugins.trackers import TrackerSettings
@@ -174,6 +174,18 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
 
         execute_mock.assert_not_called()
 
+    def test_not_started_without_autostart(self):
+        self.settings_manager = Mock()
+        self.engine_runner = EngineRunner(Logger(), self.settings_manager, self.trackers_manager,
+                                          ClientsManager({}), NotifierManager(self.settings_manager, {}),
+                                          interval=10, autostart=False)
+
+        self.assertFalse(self.engine_runner.is_alive())
+
+        self.engine_runner.start()
+        self.assertTrue(self.engine_runner.is_alive())
+        self.stop_runner()
+
     def test_stop_after_execute(self):
         waiter = Event()
 
@@ -868,15 +880,12 @@ class TestDbLoggerWrapper(DbTestCase):
         assert failed_message in entries[0].message
         assert 'failed' == entries[0].level
 
-    def test_remove_old_entries(self):
-        settings_manager_mock = Mock()
-        settings_manager_mock.remove_logs_interval = 10
-
+    def test_finished_should_not_remove_old_entries(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
         log_manager.remove_old_entries = Mock()
         # noinspection PyTypeChecker
-        db_logger = DbLoggerWrapper(log_manager, settings_manager_mock)
+        db_logger = DbLoggerWrapper(log_manager)
 
         finish_time_1 = datetime.now(pytz.utc)
 
@@ -885,7 +894,7 @@ class TestDbLoggerWrapper(DbTestCase):
         db_logger.finished(finish_time_1, None)
 
         # noinspection PyUnresolvedReferences
-        log_manager.remove_old_entries.assert_called_once_with(10)
+        log_manager.remove_old_entries.assert_not_called()
 
 
 class ExecuteLogManagerTest(DbTestCase):
@@ -964,6 +973,61 @@ class ExecuteLogManagerTest(DbTestCase):
         self.assertEqual(execute['failed'], 0)
         self.assertEqual(execute['status'], 'finished')
 
+    def test_log_entries_keyset_paging(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        finish_time_1 = datetime.now(pytz.utc)
+        finish_time_2 = finish_time_1 + timedelta(seconds=10)
+
+        # two executes share the same finish_time, they should be ordered by id
+        for finish_time in [finish_time_1, finish_time_2, finish_time_2]:
+            log_manager.started(finish_time)
+            log_manager.log_entry(u'Download', 'downloaded')
+            log_manager.finished(finish_time, None)
+
+        entries, count = log_manager.get_log_entries(0, 2)
+
+        self.assertEqual(count, 3)
+        self.assertEqual([3, 2], [e['id'] for e in entries])
+
+        entries, count = log_manager.get_log_entries(0, 1, after=3)
+
+        self.assertEqual(count, 3)
+        self.assertEqual([2], [e['id'] for e in entries])
+        self.assertEqual(entries[0]['downloaded'], 1)
+
+        entries, count = log_manager.get_log_entries(0, 2, after=2, count='approximate')
+
+        self.assertEqual(count, 3)
+        self.assertEqual([1], [e['id'] for e in entries])
+
+        entries, count = log_manager.get_log_entries(0, 2, after=1, count='none')
+
+        self.assertIsNone(count)
+        self.assertEqual([], entries)
+
+    def test_log_entries_keyset_paging_removed_cursor(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        entries, count = log_manager.get_log_entries(0, 10, after=100)
+
+        self.assertEqual([], entries)
+        self.assertEqual(count, 1)
+
+    def test_log_entries_approximate_count_empty(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        entries, count = log_manager.get_log_entries(0, 10, count='approximate')
+
+        self.assertEqual([], entries)
+        self.assertEqual(count, 0)
+
     def test_log_entries_details(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1022,6 +1086,27 @@ class ExecuteLogManagerTest(DbTestCase):
         self.assertEqual(entries[1]['level'], 'failed')
         self.assertEqual(entries[1]['message'], message3)
 
+    def test_log_entries_details_take(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        for i in range(5):
+            log_manager.log_entry(u'Message {0}'.format(i), 'info')
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        entries = log_manager.get_execute_log_details(1, take=2)
+
+        self.assertEqual([u'Message 0', u'Message 1'], [e['message'] for e in entries])
+
+        entries = log_manager.get_execute_log_details(1, after=entries[-1]['id'], take=2)
+
+        self.assertEqual([u'Message 2', u'Message 3'], [e['message'] for e in entries])
+
+        entries = log_manager.get_execute_log_details(1, after=entries[-1]['id'], take=2)
+
+        self.assertEqual([u'Message 4'], [e['message'] for e in entries])
+
     def test_log_entries_details_multiple_execute(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1163,6 +1248,112 @@ class ExecuteLogManagerTest(DbTestCase):
 
         self.assertIsNone(log_manager.get_current_execute_log_details())
 
+    def test_sequence(self):
+        log_manager = ExecuteLogManager()
+
+        sequence = log_manager.sequence
+        log_manager.started(datetime.now(pytz.utc))
+        self.assertEqual(sequence + 1, log_manager.sequence)
+        log_manager.log_entry(u'Message 1', 'info')
+        self.assertEqual(sequence + 2, log_manager.sequence)
+        log_manager.finished(datetime.now(pytz.utc), None)
+        self.assertEqual(sequence + 3, log_manager.sequence)
+
+        # sequence already changed, so there is nothing to wait for
+        self.assertTrue(log_manager.wait_for_changes(sequence, 10))
+
+    def test_events(self):
+        log_manager = ExecuteLogManager()
+        start_time = datetime.now(pytz.utc)
+        finish_time = start_time + timedelta(seconds=10)
+
+        log_manager.update_progress(10)
+        log_manager.started(start_time)
+        log_manager.tracker_started('tracker.com')
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.update_progress(10.2)
+        log_manager.update_progress(10.7)
+        log_manager.update_progress(55.5)
+        log_manager.tracker_finished('tracker.com', None)
+        log_manager.finished(finish_time, None)
+
+        events, missed = log_manager.get_events(0)
+
+        self.assertFalse(missed)
+        self.assertEqual([1, 2, 3, 4, 5, 6, 7], [e[0] for e in events])
+        self.assertEqual(['started', 'tracker_started', 'log', 'progress', 'progress', 'tracker_finished',
+                          'finished'], [e[1] for e in events])
+        self.assertEqual({'execute_id': 1, 'start_time': start_time}, events[0][2])
+        self.assertEqual(u'Message 1', events[2][2]['message'])
+        self.assertIsNotNone(events[2][2]['id'])
+        self.assertEqual([10, 55], [e[2]['progress'] for e in events if e[1] == 'progress'])
+        self.assertEqual({'execute_id': 1, 'tracker': 'tracker.com', 'status': 'finished'}, events[5][2])
+        self.assertEqual({'execute_id': 1, 'status': 'finished', 'finish_time': finish_time}, events[6][2])
+        self.assertIsNone(log_manager.progress)
+
+        self.assertEqual((events[5:], False), log_manager.get_events(5))
+        self.assertEqual(([], False), log_manager.get_events(7))
+
+    def test_events_missed(self):
+        log_manager = ExecuteLogManager(events_buffer_size=2)
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Message 2', 'info')
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        events, missed = log_manager.get_events(1)
+        self.assertTrue(missed)
+        self.assertEqual([3, 4], [e[0] for e in events])
+
+        events, missed = log_manager.get_events(2)
+        self.assertFalse(missed)
+        self.assertEqual([3, 4], [e[0] for e in events])
+
+        # sequence from previous server run
+        events, missed = log_manager.get_events(100)
+        self.assertTrue(missed)
+
+    def test_wait_for_changes_timeout(self):
+        log_manager = ExecuteLogManager()
+
+        start = time()
+        self.assertFalse(log_manager.wait_for_changes(log_manager.sequence, 0.1))
+        self.assertGreaterEqual(time() - start, 0.09)
+
+    def test_wait_for_changes_wakes_on_log_entry(self):
+        log_manager = ExecuteLogManager()
+        log_manager.started(datetime.now(pytz.utc))
+
+        waiting = Event()
+        result = {}
+
+        def wait():
+            sequence = log_manager.sequence
+            waiting.set()
+            result['changed'] = log_manager.wait_for_changes(sequence, 30)
+
+        thread = Thread(target=wait)
+        start = time()
+        thread.start()
+        waiting.wait(1)
+        log_manager.log_entry(u'Message 1', 'info')
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(result['changed'])
+        self.assertLess(time() - start, 5)
+
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+    def test_wait_for_changes_max_waiters(self):
+        log_manager = ExecuteLogManager(max_waiters=0)
+
+        start = time()
+        with self.assertRaises(TooManyWaitersException) as cm:
+            log_manager.wait_for_changes(log_manager.sequence, 30)
+        self.assertLess(time() - start, 1)
+        self.assertEqual(ExecuteLogManager.RETRY_AFTER, cm.exception.retry_after)
+
     def test_remove_old_entries(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1266,3 +1457,167 @@ class ExecuteLogManagerTest(DbTestCase):
 
         self.assertEqual(details[0]['level'], 'info')
         self.assertEqual(details[0]['message'], message11 + ' 1')
+
+    def test_remove_old_entries_in_chunks(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        now = datetime.now(pytz.utc)
+
+        for days in [13, 12, 11, 5]:
+            start = now - timedelta(days=days)
+            log_manager.started(start)
+            for i in range(7):
+                log_manager.log_entry(u'Message {0}'.format(i), 'info')
+            log_manager.finished(start, None)
+
+        self.assertEqual(3, log_manager.remove_old_entries(10, chunk_size=2))
+
+        entries, count = log_manager.get_log_entries(0, 10)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(len(log_manager.get_execute_log_details(entries[0]['id'])), 7)
+
+        with DBSession() as db:
+            self.assertEqual(7, db.query(ExecuteLog).count())
+
+    def test_remove_entries_over_size(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        now = datetime.now(pytz.utc)
+
+        for i in range(5):
+            log_manager.started(now)
+            log_manager.log_entry(u'Message {0}'.format(i), 'info')
+            log_manager.finished(now, None)
+
+        sizes = [300, 200, 100]
+        log_manager.get_database_size = Mock(side_effect=lambda: sizes.pop(0))
+
+        self.assertEqual(4, log_manager.remove_entries_over_size(150, executes_chunk_size=2))
+
+        entries, count = log_manager.get_log_entries(0, 10)
+
+        # the latest execute is always kept
+        self.assertEqual(count, 1)
+        self.assertEqual(entries[0]['id'], 5)
+
+    def test_remove_entries_over_size_keep_latest(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        log_manager.get_database_size = Mock(return_value=1000)
+
+        self.assertEqual(0, log_manager.remove_entries_over_size(100))
+
+        entries, count = log_manager.get_log_entries(0, 10)
+
+        self.assertEqual(count, 1)
+
+    def test_database_size_and_reclaim_space(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        self.assertGreater(log_manager.get_database_size(), 0)
+
+        log_manager.reclaim_space()
+
+        with self.engine.connect() as connection:
+            self.assertEqual(2, connection.execute('PRAGMA auto_vacuum').scalar())
+
+        # second call runs incremental vacuum only
+        log_manager.reclaim_space()
+
+
+class ExecuteLogRetentionTest(TestCase):
+    def setUp(self):
+        self.log_manager = Mock()
+        self.log_manager.is_running = Mock(return_value=False)
+        self.log_manager.remove_old_entries = Mock(return_value=0)
+        self.log_manager.remove_entries_over_size = Mock(return_value=0)
+        self.settings_manager = Mock()
+        self.settings_manager.remove_logs_interval = 10
+        self.settings_manager.remove_logs_max_size = 0
+
+    def test_execute(self):
+        self.log_manager.remove_old_entries = Mock(return_value=3)
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager, chunk_size=100)
+
+        self.assertTrue(retention.execute())
+
+        self.log_manager.remove_old_entries.assert_called_once_with(10, 100)
+        self.log_manager.remove_entries_over_size.assert_not_called()
+        self.log_manager.reclaim_space.assert_called_once_with()
+
+    def test_execute_with_max_size(self):
+        self.settings_manager.remove_logs_max_size = 2
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager, chunk_size=100)
+
+        self.assertTrue(retention.execute())
+
+        self.log_manager.remove_entries_over_size.assert_called_once_with(2 * 1024 * 1024, 100)
+        self.log_manager.reclaim_space.assert_not_called()
+
+    def test_execute_skipped_while_engine_is_running(self):
+        self.log_manager.is_running = Mock(return_value=True)
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager)
+
+        self.assertFalse(retention.execute())
+
+        self.log_manager.remove_old_entries.assert_not_called()
+
+    def test_execute_failed(self):
+        self.log_manager.remove_old_entries = Mock(side_effect=Exception)
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager)
+
+        self.assertFalse(retention.execute())
+
+    @patch('monitorrent.engine.timer')
+    def test_start_stop(self, timer_mock):
+        cancel = Mock()
+        timer_mock.return_value = cancel
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager, interval=10)
+        retention.start()
+
+        timer_mock.assert_called_once_with(10, retention.execute_timer)
+        with self.assertRaises(Exception):
+            retention.start()
+
+        retention.stop()
+        cancel.assert_called_once_with()
+
+    def test_execute_timer_runs_out_of_timer_thread_once(self):
+        started = Event()
+        release = Event()
+        threads = []
+
+        def execute():
+            threads.append(current_thread())
+            started.set()
+            release.wait(5)
+
+        # noinspection PyTypeChecker
+        retention = ExecuteLogRetention(self.log_manager, self.settings_manager)
+        retention.execute = execute
+
+        retention.execute_timer()
+        self.assertTrue(started.wait(5))
+        # previous retention is still running, so next timer call is skipped
+        retention.execute_timer()
+        release.set()
+        retention.execute_thread.join(5)
+
+        self.assertEqual(1, len(threads))
+        self.assertNotEqual(current_thread(), threads[0])
@@ -71,6 +71,33 @@ class EngineExecuteTest(EngineTest):
         tracker.init.assert_called_once()
         tracker.execute.assert_called_once_with(topics, ANY)
 
+    def test_execute_progress(self):
+        topics = [Topic(), Topic()]
+
+        def execute(execute_topics, engine_tracker):
+            with engine_tracker.start(len(execute_topics)) as engine_topics:
+                for i in range(len(execute_topics)):
+                    with engine_topics.start(i, 'Topic {0}'.format(i)):
+                        pass
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+
+        self.trackers_manager.trackers = {'test.com': tracker}
+        self.log_mock.update_progress = Mock()
+        self.log_mock.tracker_started = Mock()
+        self.log_mock.tracker_finished = Mock()
+
+        self.engine.execute(None)
+
+        progress = [c[0][0] for c in self.log_mock.update_progress.call_args_list]
+        self.assertEqual(sorted(progress), progress)
+        self.assertEqual(0, progress[0])
+        self.assertEqual(100, progress[-1])
+        self.log_mock.tracker_started.assert_called_once_with('test.com')
+        self.log_mock.tracker_finished.assert_called_once_with('test.com', None)
+
     def test_empty_execute(self):
         topics = []
 
@@ -220,6 +247,8 @@ class EngineTrackerTest(TestCase):
                                            call(u'End checking for <b>tracker</b>')])
         self.engine.failed.assert_not_called()
         self.engine.downloaded.assert_not_called()
+        self.engine.tracker_started.assert_called_once_with('tracker')
+        self.engine.tracker_finished.assert_called_once_with('tracker', None)
 
     def test_exception_exit_should_call_failed_and_not_crash(self):
         error_message = u"Some error"
@@ -231,6 +260,7 @@ class EngineTrackerTest(TestCase):
         self.engine.info.assert_called_once_with(u'Start checking for <b>tracker</b>')
         assert exception == self.engine.failed.mock_calls[0][1][2]
         self.engine.downloaded.assert_not_called()
+        self.engine.tracker_finished.assert_called_once_with('tracker', exception)
 
 
 class TestEngineTopics(TestCase):
@@ -1,7 +1,9 @@
 import os
 from mock import Mock, MagicMock, patch
 from tests import TestCase
-from monitorrent.plugin_managers import load_plugins, register_plugin, get_plugins, get_all_plugins
+from monitorrent.plugin_managers import load_plugins, register_plugin, get_plugins, get_all_plugins, \
+    PluginInfo, PluginsDict, ClientsManager, plugins_manifest
+from monitorrent.plugins.notifiers import NotifierType
 
 
 class LoadPluginsTest(TestCase):
@@ -14,7 +16,9 @@ class LoadPluginsTest(TestCase):
         os_walk_mock = MagicMock(return_value=walk_result)
         import_mock = MagicMock()
         with patch('monitorrent.plugin_managers.os.walk', os_walk_mock), \
-                patch('monitorrent.plugin_managers.__import__', import_mock, create=True):
+                patch('monitorrent.plugin_managers.__import__', import_mock, create=True), \
+                patch('monitorrent.plugin_managers.plugins', dict()), \
+                patch('monitorrent.plugin_managers.plugins_manifest', list()):
             load_plugins('plugins')
 
         self.assertTrue(os_walk_mock.call_count, 1)
@@ -41,3 +45,113 @@ class RegisterPluginTest(TestCase):
             self.assertEqual(get_plugins('type2'), {'name3': plugin3})
 
             self.assertEqual(upgrades, [upgrade])
+
+
+class LazyPluginsTest(TestCase):
+    def setUp(self):
+        self.plugin1 = object()
+        self.plugin2 = object()
+        self.manifest = [PluginInfo('type1', 'name1', 'monitorrent.plugins.plugin1'),
+                         PluginInfo('type1', 'name2', 'monitorrent.plugins.plugin2')]
+        self.modules = {'monitorrent.plugins.plugin1': ('type1', 'name1', self.plugin1),
+                        'monitorrent.plugins.plugin2': ('type1', 'name2', self.plugin2)}
+
+        # noinspection PyUnusedLocal
+        def import_module(name, *args, **kwargs):
+            register_plugin(*self.modules[name])
+
+        self.import_mock = MagicMock(side_effect=import_module)
+        dir_name = os.path.realpath(os.path.join(__file__, '../../monitorrent'))
+        walk_result = [
+            (os.path.join(dir_name, 'plugins'), [], ['__init__.py', 'plugin1.py', 'plugin2.py']),
+        ]
+        for p in [patch('monitorrent.plugin_managers.os.walk', MagicMock(return_value=walk_result)),
+                  patch('monitorrent.plugin_managers.__import__', self.import_mock, create=True),
+                  patch('monitorrent.plugin_managers.plugins', dict()),
+                  patch('monitorrent.plugin_managers.plugins_manifest', self.manifest)]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_load_plugins_does_not_import_manifest_modules(self):
+        load_plugins('plugins')
+
+        self.import_mock.assert_not_called()
+        plugins = get_plugins('type1')
+        self.assertEqual(['name1', 'name2'], sorted(plugins.keys()))
+        self.assertTrue('name1' in plugins)
+        self.assertEqual(2, len(plugins))
+        self.import_mock.assert_not_called()
+
+    def test_plugin_is_imported_on_first_access(self):
+        load_plugins('plugins')
+
+        plugins = get_plugins('type1')
+        self.assertEqual(self.plugin1, plugins['name1'])
+        self.assertEqual(self.plugin1, plugins.get('name1'))
+        self.import_mock.assert_called_once_with('monitorrent.plugins.plugin1')
+
+        self.assertEqual({self.plugin1, self.plugin2}, set(plugins.values()))
+        self.assertEqual(2, self.import_mock.call_count)
+
+    def test_not_registered_plugin_raises(self):
+        self.modules['monitorrent.plugins.plugin1'] = ('type1', 'name3', self.plugin1)
+        load_plugins('plugins')
+
+        with self.assertRaises(ImportError):
+            get_plugins('type1')['name1']
+
+    def test_not_lazy_load_plugins_imports_manifest_modules(self):
+        load_plugins('plugins', lazy=False)
+
+        self.assertEqual(2, self.import_mock.call_count)
+        self.import_mock.assert_any_call('monitorrent.plugins.plugin1')
+        self.import_mock.assert_any_call('monitorrent.plugins.plugin2')
+
+    def test_upgrade_is_registered_on_not_lazy_load(self):
+        upgrade = Mock()
+        plugin1 = self.plugin1
+
+        # noinspection PyUnusedLocal
+        def import_module(name, *args, **kwargs):
+            register_plugin('type1', 'name1', plugin1, upgrade=upgrade)
+
+        self.import_mock.side_effect = import_module
+        del self.manifest[1]
+        with patch('monitorrent.upgrade_manager.upgrades', list()) as upgrades:
+            load_plugins('plugins', lazy=False)
+
+            self.assertEqual([upgrade], upgrades)
+        upgrade.assert_not_called()
+
+    def test_ensure_loaded(self):
+        load_plugins('plugins')
+
+        self.assertEqual(self.plugin1, get_plugins('type1').ensure_loaded('name1'))
+        self.import_mock.assert_called_once_with('monitorrent.plugins.plugin1')
+
+    def test_clients_manager_loads_only_default_client(self):
+        self.manifest[:] = [info._replace(type='client') for info in self.manifest]
+        self.modules = {module: ('client', name, plugin) for module, (t, name, plugin) in self.modules.items()}
+        load_plugins('plugins')
+
+        clients_manager = ClientsManager(get_plugins('client'), 'name2')
+
+        self.assertEqual(self.plugin2, clients_manager.get_default())
+        self.import_mock.assert_called_once_with('monitorrent.plugins.plugin2')
+
+
+class PluginsManifestTest(TestCase):
+    def test_manifest_modules_register_plugins(self):
+        for info in plugins_manifest:
+            __import__(info.module)
+            plugin = get_plugins(info.type)[info.name]
+            self.assertEqual(info.module, type(plugin).__module__)
+
+    def test_full_text_notifiers_are_not_batched(self):
+        for info in plugins_manifest:
+            if info.type != 'notifier':
+                continue
+            __import__(info.module)
+            plugin = get_plugins(info.type)[info.name]
+            if plugin.get_type == NotifierType.full_text:
+                self.assertEqual(0, plugin.batch_window, info.name)
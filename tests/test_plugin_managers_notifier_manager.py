@@ -1,10 +1,13 @@
+import threading
+import time
 from unittest import TestCase
-from mock import Mock, MagicMock, PropertyMock, call
+from mock import Mock, MagicMock, PropertyMock, call, patch
+from sqlalchemy import event
 
 from ddt import ddt
 
 from monitorrent.db import DBSession
-from monitorrent.plugin_managers import NotifierManager
+from monitorrent.plugin_managers import NotifierManager, NotificationDispatcher
 from monitorrent.plugins.notifiers import Notifier, NotifierType
 from tests import DbTestCase
 
@@ -102,6 +105,105 @@ class NotifierManagerTest(TestCase):
         self.notifier_manager.set_enabled(NOTIFIER1_NAME, True)
 
 
+def create_notifier_mock(notifier_type=None, batch_window=0, min_interval=0, max_message_length=None):
+    notifier = MagicMock()
+    notifier.get_type = notifier_type
+    notifier.batch_window = batch_window
+    notifier.min_interval = min_interval
+    notifier.max_message_length = max_message_length
+    return notifier
+
+
+class NotificationDispatcherTest(TestCase):
+    def setUp(self):
+        super(NotificationDispatcherTest, self).setUp()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+        self.slow_notifier = create_notifier_mock()
+        self.slow_notifier.notify = Mock(side_effect=lambda header, body: self.release.wait(5))
+        self.fast_notifier = create_notifier_mock()
+
+    def test_dispatch_does_not_wait_notifier(self):
+        dispatcher = NotificationDispatcher()
+
+        self.assertTrue(dispatcher.dispatch(self.slow_notifier, "Header", "Message 1"))
+        self.assertTrue(dispatcher.dispatch(self.slow_notifier, "Header", "Message 2"))
+        self.assertTrue(dispatcher.dispatch(self.fast_notifier, "Header", "Message 1"))
+
+        # fast notifier isn't blocked by slow one
+        self.assertFalse(dispatcher.join(0.5))
+        self.fast_notifier.notify.assert_called_once_with("Header", "Message 1")
+        self.slow_notifier.notify.assert_called_once_with("Header", "Message 1")
+
+        self.release.set()
+        self.assertTrue(dispatcher.join(5))
+        self.slow_notifier.notify.assert_has_calls([call("Header", "Message 1"), call("Header", "Message 2")])
+
+    def test_dispatch_drops_message_when_queue_is_full(self):
+        dispatcher = NotificationDispatcher(queue_size=1)
+
+        self.assertTrue(dispatcher.dispatch(self.slow_notifier, "Header", "Message 1"))
+        # wait until worker takes first message from queue
+        while not self.slow_notifier.notify.called:
+            dispatcher.join(0.01)
+        self.assertTrue(dispatcher.dispatch(self.slow_notifier, "Header", "Message 2"))
+        self.assertFalse(dispatcher.dispatch(self.slow_notifier, "Header", "Message 3"))
+
+        self.release.set()
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(2, self.slow_notifier.notify.call_count)
+
+    def test_failed_notify_does_not_stop_worker(self):
+        dispatcher = NotificationDispatcher()
+        self.fast_notifier.notify = Mock(side_effect=[Exception('Failed'), True])
+
+        dispatcher.dispatch(self.fast_notifier, "Header", "Message 1")
+        dispatcher.dispatch(self.fast_notifier, "Header", "Message 2")
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(2, self.fast_notifier.notify.call_count)
+
+
+    def test_messages_in_batch_window_are_merged(self):
+        dispatcher = NotificationDispatcher()
+        notifier = create_notifier_mock(batch_window=0.3)
+
+        dispatcher.dispatch(notifier, "Header", "Message 1")
+        dispatcher.dispatch(notifier, "Header", "Message 2")
+        dispatcher.dispatch(notifier, "Other Header", "Message 3")
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual([call("Header", "Message 1\nMessage 2"), call("Other Header", "Message 3")],
+                         notifier.notify.mock_calls)
+
+    def test_min_interval(self):
+        dispatcher = NotificationDispatcher()
+        notifier = create_notifier_mock(min_interval=0.2)
+        times = []
+        notifier.notify = Mock(side_effect=lambda header, body: times.append(time.time()))
+
+        dispatcher.dispatch(notifier, "Header", "Message 1")
+        self.assertTrue(dispatcher.join(5))
+        # messages received while waiting for rate limit are merged
+        dispatcher.dispatch(notifier, "Header", "Message 2")
+        dispatcher.dispatch(notifier, "Header", "Message 3")
+        self.assertTrue(dispatcher.join(5))
+
+        self.assertEqual([call("Header", "Message 1"), call("Header", "Message 2\nMessage 3")],
+                         notifier.notify.mock_calls)
+        self.assertGreaterEqual(times[1] - times[0], 0.19)
+
+    def test_digest_split_by_max_length(self):
+        messages = [("H", "1234"), ("H", "5678"), ("H", "90"), ("H", "abcdefghijk"), ("O", "xyz")]
+
+        digest = NotificationDispatcher._digest(messages, 10)
+
+        self.assertEqual([("H", "1234\n5678"), ("H", "90"), ("H", "abcdefghij"), ("H", "k"), ("O", "xyz")], digest)
+        self.assertEqual([("H", "1234\n5678\n90\nabcdefghijk"), ("O", "xyz")],
+                         NotificationDispatcher._digest(messages, None))
+
+
 class Notifier1Settings(Notifier):
     __mapper_args__ = {
         'polymorphic_identity': NOTIFIER1_NAME
@@ -145,14 +247,9 @@ class NotifierManagerNotificationsTest(DbTestCase):
             db.add(self.settings2)
             db.add(self.settings3)
 
-        self.notifier1 = MagicMock()
-        self.notifier1.get_type = NotifierType.short_text
-
-        self.notifier2 = MagicMock()
-        self.notifier2.get_type = NotifierType.short_text
-
-        self.notifier3 = MagicMock()
-        self.notifier3.get_type = NotifierType.full_text
+        self.notifier1 = create_notifier_mock(NotifierType.short_text)
+        self.notifier2 = create_notifier_mock(NotifierType.short_text)
+        self.notifier3 = create_notifier_mock(NotifierType.full_text)
 
         # noinspection PyTypeChecker
         self.notifier_manager = NotifierManager(
@@ -175,6 +272,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
 
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify(message)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_called_once_with("Monitorrent Update", message)
         self.notifier2.notify.assert_not_called()
@@ -187,6 +285,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
 
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify(message)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_called_once_with("Monitorrent Update", message)
         self.notifier2.notify.assert_not_called()
@@ -196,6 +295,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
     def test_end_execute_not_called(self):
         with self.notifier_manager.execute():
             pass
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_not_called()
         self.notifier2.notify.assert_not_called()
@@ -206,6 +306,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
 
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify(message)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_called_once_with("Monitorrent Update", message)
         self.notifier2.notify.assert_not_called()
@@ -225,6 +326,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify(message1)
             notifier_execute.notify(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_has_calls([call("Monitorrent Update", message1),
                                                 call("Monitorrent Update", message2)])
@@ -247,6 +349,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_failed(message1)
             notifier_execute.notify_failed(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_has_calls([call("Monitorrent Update", message1),
                                                 call("Monitorrent Update", message2)])
@@ -266,6 +369,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_failed(message1)
             notifier_execute.notify_failed(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_not_called()
         self.notifier2.notify.assert_not_called()
@@ -284,6 +388,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_download(message1)
             notifier_execute.notify_download(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_has_calls([call("Monitorrent Update", message1),
                                                 call("Monitorrent Update", message2)])
@@ -303,6 +408,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_download(message1)
             notifier_execute.notify_download(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_not_called()
         self.notifier2.notify.assert_not_called()
@@ -321,6 +427,7 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_status_changed(message1)
             notifier_execute.notify_status_changed(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_has_calls([call("Monitorrent Update", message1),
                                                 call("Monitorrent Update", message2)])
@@ -340,7 +447,107 @@ class NotifierManagerNotificationsTest(DbTestCase):
         with self.notifier_manager.execute() as notifier_execute:
             notifier_execute.notify_status_changed(message1)
             notifier_execute.notify_status_changed(message2)
+        self.notifier_manager.dispatcher.join()
 
         self.notifier1.notify.assert_not_called()
         self.notifier2.notify.assert_not_called()
         self.notifier3.notify.assert_not_called()
+
+    def test_execute_does_not_wait_notifiers(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.notifier1.notify = Mock(side_effect=lambda header, body: release.wait(5))
+
+        with self.notifier_manager.execute() as notifier_execute:
+            notifier_execute.notify("Message 1")
+            notifier_execute.notify("Message 2")
+
+        self.assertFalse(self.notifier_manager.dispatcher.join(0.1))
+        release.set()
+        self.assertTrue(self.notifier_manager.dispatcher.join(5))
+        self.notifier1.notify.assert_has_calls([call("Monitorrent Update", "Message 1"),
+                                                call("Monitorrent Update", "Message 2")])
+        self.notifier3.notify.assert_called_once_with("Monitorrent Update",
+                                                      "Monitorrent execute result\nMessage 1\nMessage 2")
+
+    def test_summary_is_limited(self):
+        self.notifier_manager.dispatcher = Mock()
+        self.settings_manager.get_external_notifications_levels = Mock(return_value=[])
+
+        with self.notifier_manager.execute() as notifier_execute:
+            notifier_execute.max_summary_messages = 2
+            for i in range(5):
+                notifier_execute.notify("Message {0}".format(i))
+
+        summary = "Monitorrent execute result\nMessage 0\nMessage 1\nand 3 more messages"
+        self.notifier_manager.dispatcher.dispatch.assert_called_with(self.notifier3, "Monitorrent Update", summary)
+
+    def _capture_selects(self):
+        statements = []
+
+        # noinspection PyUnusedLocal
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT'):
+                statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', before_cursor_execute)
+        self.addCleanup(event.remove, self.engine, 'before_cursor_execute', before_cursor_execute)
+        return statements
+
+    def test_enabled_notifiers_are_resolved_once(self):
+        self.notifier_manager.dispatcher = Mock()
+        self.notifier_manager.get_enabled_notifiers()
+
+        statements = self._capture_selects()
+        for _ in range(2):
+            with self.notifier_manager.execute() as notifier_execute:
+                for i in range(3):
+                    notifier_execute.notify("Message {0}".format(i))
+
+        self.assertEqual([], statements)
+        self.assertEqual(6 + 2, self.notifier_manager.dispatcher.dispatch.call_count)
+
+    def test_set_enabled_invalidates_enabled_notifiers(self):
+        self.assertEqual([self.notifier1, self.notifier3], self.notifier_manager.get_enabled_notifiers())
+
+        self.notifier_manager.set_enabled(NOTIFIER2_NAME, True)
+        with DBSession() as db:
+            db.query(Notifier2Settings).one().is_enabled = True
+
+        self.assertEqual([self.notifier1, self.notifier2, self.notifier3],
+                         self.notifier_manager.get_enabled_notifiers())
+
+    def test_update_settings_invalidates_enabled_notifiers(self):
+        self.assertEqual([self.notifier1, self.notifier3], self.notifier_manager.get_enabled_notifiers())
+
+        self.notifier_manager.update_settings(NOTIFIER1_NAME, {})
+        with DBSession() as db:
+            db.query(Notifier1Settings).one().is_enabled = False
+
+        self.assertEqual([self.notifier3], self.notifier_manager.get_enabled_notifiers())
+
+    def test_enabled_notifiers_read_concurrently_with_write_are_not_cached(self):
+        manager = self.notifier_manager
+
+        def enable_notifier2():
+            with DBSession() as db:
+                db.query(Notifier2Settings).one().is_enabled = True
+            manager.set_enabled(NOTIFIER2_NAME, True)
+
+        class WriteAfterReadSession(object):
+            # write is committed after read of old rows, but before read result is stored in cache
+            def __init__(self):
+                self.session = DBSession()
+
+            def __enter__(self):
+                return self.session.__enter__()
+
+            def __exit__(self, *args):
+                result = self.session.__exit__(*args)
+                enable_notifier2()
+                return result
+
+        with patch('monitorrent.plugin_managers.DBSession', WriteAfterReadSession):
+            self.assertEqual([self.notifier1, self.notifier3], manager.get_enabled_notifiers())
+
+        self.assertEqual([self.notifier1, self.notifier2, self.notifier3], manager.get_enabled_notifiers())
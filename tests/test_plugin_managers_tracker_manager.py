@@ -1,18 +1,21 @@
 from builtins import str
 from collections import OrderedDict
+from datetime import datetime
 
+import pytz
 from ddt import ddt, data
 from mock import Mock, MagicMock, patch
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, event
 from monitorrent.db import DBSession, row2dict
 from monitorrent.plugins.trackers import Topic
 from monitorrent.plugins.status import Status
 from tests import TestCase, DbTestCase
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, TrackerSettings
-from monitorrent.plugin_managers import TrackersManager
+from monitorrent.plugin_managers import TrackersManager, PluginsDict, PluginInfo, register_plugin
 
 TRACKER1_PLUGIN_NAME = 'tracker1.com'
 TRACKER2_PLUGIN_NAME = 'tracker2.com'
+LAZY_TRACKER_PLUGIN_NAME = 'lazy-tracker.com'
 
 
 class Tracker1Topic(Topic):
@@ -384,6 +387,55 @@ class TrackersManagerDbPartTest(DbTestCase):
             }],
             topics)
 
+    def _capture_selects(self):
+        statements = []
+
+        # noinspection PyUnusedLocal
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT'):
+                statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', before_cursor_execute)
+        self.addCleanup(event.remove, self.engine, 'before_cursor_execute', before_cursor_execute)
+        return statements
+
+    def test_get_watching_topics_loads_topics_per_tracker(self):
+        with DBSession() as db:
+            for i in range(3):
+                db.add(Tracker2Topic(display_name=self.DISPLAY_NAME1 + str(i),
+                                     url=self.URL1 + str(i),
+                                     type=TRACKER2_PLUGIN_NAME,
+                                     some_addition_field=10 + i))
+
+        self.tracker1.get_topic_info = lambda t: str(t.some_addition_field)
+        self.tracker2.get_topic_info = lambda t: str(t.some_addition_field)
+
+        statements = self._capture_selects()
+
+        topics = self.trackers_manager.get_watching_topics()
+
+        self.assertEqual(['1', '10', '11', '12'], [t['info'] for t in topics])
+        # one query per each tracker, every query joins only tracker's own table
+        self.assertEqual(2, len(statements))
+        self.assertEqual(1, len([s for s in statements if 'tracker1_topics' in s and 'tracker2_topics' not in s]))
+        self.assertEqual(1, len([s for s in statements if 'tracker2_topics' in s and 'tracker1_topics' not in s]))
+
+    def test_base_topic_operations_do_not_join_subclass_tables(self):
+        statements = self._capture_selects()
+
+        self.trackers_manager.set_topic_paused(self.tracker1_id1, True)
+        self.trackers_manager.reset_topic_status(self.tracker1_id1)
+        self.trackers_manager.remove_topic(self.tracker1_id1)
+
+        self.assertTrue(len(statements) > 0)
+        for statement in statements:
+            self.assertNotIn('tracker1_topics', statement)
+            self.assertNotIn('tracker2_topics', statement)
+
+        with DBSession() as db:
+            self.assertEqual(0, db.query(Tracker1Topic).count())
+            self.assertEqual(0, db.execute('SELECT COUNT(*) FROM tracker1_topics').scalar())
+
     def test_get_tracker_topics(self):
         topics = self.trackers_manager.get_tracker_topics(TRACKER1_PLUGIN_NAME)
 
@@ -455,3 +507,276 @@ class TrackersManagerDbPartTest(DbTestCase):
 
         self.assertEqual(len(topics), 2)
         self.assertListEqual(sorted(topics), sorted([topic1_id, topic2_id]))
+
+    def _setup_bulk_trackers(self):
+        def parse_url(url):
+            if url.endswith('/fail/'):
+                raise Exception('Some error')
+            if url.endswith('/none/'):
+                return None
+            return {'original_name': 'Name ' + url.rstrip('/').rsplit('/', 1)[-1]}
+
+        self.tracker1.can_parse_url = Mock(side_effect=lambda url: url.startswith('http://tracker.com/'))
+        self.tracker1.parse_url = Mock(side_effect=parse_url)
+        self.tracker2.can_parse_url = Mock(side_effect=lambda url: url.startswith('http://tracker2.com/'))
+        self.tracker2.parse_url = Mock(side_effect=parse_url)
+
+    def test_add_topics(self):
+        self._setup_bulk_trackers()
+        urls = ['http://tracker.com/10/', 'http://tracker2.com/20/', ('http://tracker.com/11/', {'download_dir': '/tmp'}),
+                'http://tracker.com/fail/', 'http://tracker2.com/none/', 'http://unknown.com/1/',
+                self.URL1, 'http://tracker.com/10/']
+
+        results = list(self.trackers_manager.add_topics(urls, {'download_dir': '/downloads'}, min_interval=0))
+
+        statuses = {r['url']: r['status'] for r in results[:-1]}
+        self.assertEqual(len(results) - 1, len(urls))
+        self.assertEqual({
+            'http://tracker.com/10/': 'parsed',
+            'http://tracker2.com/20/': 'parsed',
+            'http://tracker.com/11/': 'parsed',
+            'http://tracker.com/fail/': 'failed',
+            'http://tracker2.com/none/': 'failed',
+            'http://unknown.com/1/': 'unsupported',
+            self.URL1: 'exists',
+        }, statuses)
+        self.assertEqual({'status': 'completed', 'added': 3, 'exists': 2, 'unsupported': 1, 'failed': 2},
+                         results[-1])
+
+        with DBSession() as db:
+            topics = {t.url: (t.type, t.display_name, t.download_dir) for t in db.query(Topic).all()}
+        self.assertEqual(topics['http://tracker.com/10/'], (TRACKER1_PLUGIN_NAME, 'Name 10', '/downloads'))
+        self.assertEqual(topics['http://tracker2.com/20/'], (TRACKER2_PLUGIN_NAME, 'Name 20', '/downloads'))
+        self.assertEqual(topics['http://tracker.com/11/'], (TRACKER1_PLUGIN_NAME, 'Name 11', '/tmp'))
+        self.assertEqual(len(topics), 4)
+
+    def test_add_topics_duplicate_display_name(self):
+        self._setup_bulk_trackers()
+        self.tracker1.parse_url = Mock(return_value={'original_name': self.DISPLAY_NAME1})
+
+        results = list(self.trackers_manager.add_topics(['http://tracker.com/10/'], min_interval=0))
+
+        self.assertEqual('failed', results[0]['status'])
+        self.assertEqual({'status': 'completed', 'added': 0, 'exists': 0, 'unsupported': 0, 'failed': 1},
+                         results[-1])
+        with DBSession() as db:
+            self.assertEqual(1, db.query(Topic).count())
+
+    def test_add_topics_requests_to_tracker_are_rate_limited(self):
+        self._setup_bulk_trackers()
+
+        with patch('monitorrent.plugin_managers.TokenBucket') as token_bucket:
+            list(self.trackers_manager.add_topics(['http://tracker.com/10/', 'http://tracker.com/11/'],
+                                                  min_interval=0.25))
+
+        token_bucket.assert_called_once_with(4.0)
+        self.assertEqual(2, token_bucket.return_value.acquire.call_count)
+
+    def test_add_topics_commit_failed(self):
+        self._setup_bulk_trackers()
+
+        with patch('monitorrent.plugin_managers.DBSession') as db_session:
+            db_session.return_value.__enter__.return_value.query.return_value.all.return_value = []
+            db_session.return_value.__enter__.return_value.add_all.side_effect = Exception('Locked')
+            results = list(self.trackers_manager.add_topics(['http://tracker.com/10/'], min_interval=0))
+
+        self.assertEqual('parsed', results[0]['status'])
+        self.assertEqual({'status': 'error', 'error': 'Locked', 'added': 0, 'exists': 0, 'unsupported': 0,
+                          'failed': 1}, results[-1])
+
+    def _create_bulk_topics(self):
+        ids = {}
+        with DBSession() as db:
+            for i, (topic_class, status) in enumerate([(Tracker1Topic, Status.Error), (Tracker1Topic, Status.Ok),
+                                                       (Tracker2Topic, Status.Error), (Tracker2Topic, Status.NotFound)]):
+                topic = topic_class(display_name="Bulk {0}".format(i), url="http://tracker.com/bulk/{0}/".format(i),
+                                    status=status, some_addition_field=i)
+                db.add(topic)
+                db.flush()
+                ids[i] = topic.id
+        return ids
+
+    def test_set_topics_paused_by_tracker(self):
+        self._create_bulk_topics()
+
+        self.assertEqual(3, self.trackers_manager.set_topics_paused(True, tracker=TRACKER1_PLUGIN_NAME))
+
+        with DBSession() as db:
+            paused = {t.type: t.paused for t in db.query(Topic).filter(Topic.paused == True)}
+            self.assertEqual(3, db.query(Topic).filter(Topic.paused == True).count())
+        self.assertEqual({TRACKER1_PLUGIN_NAME: True}, paused)
+
+    def test_reset_topics_status_by_ids_and_statuses(self):
+        ids = self._create_bulk_topics()
+
+        count = self.trackers_manager.reset_topics_status(ids=[ids[0], ids[1], ids[3]],
+                                                          statuses=[Status.Error, Status.NotFound])
+
+        self.assertEqual(2, count)
+        with DBSession() as db:
+            statuses = {t.id: t.status for t in db.query(Topic)}
+        self.assertEqual({self.tracker1_id1: Status.Ok, ids[0]: Status.Ok, ids[1]: Status.Ok,
+                          ids[2]: Status.Error, ids[3]: Status.Ok}, statuses)
+
+    def test_remove_topics_by_statuses(self):
+        ids = self._create_bulk_topics()
+
+        self.assertEqual(2, self.trackers_manager.remove_topics(statuses=[Status.Error]))
+
+        with DBSession() as db:
+            self.assertEqual(sorted([self.tracker1_id1, ids[1], ids[3]]), sorted(t.id for t in db.query(Topic.id)))
+            self.assertEqual(sorted([self.tracker1_id1, ids[1]]),
+                             sorted(t.id for t in db.query(Tracker1Topic.__table__.c.id)))
+            self.assertEqual([ids[3]], [t.id for t in db.query(Tracker2Topic.__table__.c.id)])
+
+    def test_remove_topics_by_tracker(self):
+        ids = self._create_bulk_topics()
+
+        self.assertEqual(2, self.trackers_manager.remove_topics(tracker=TRACKER2_PLUGIN_NAME))
+
+        with DBSession() as db:
+            self.assertEqual(sorted([self.tracker1_id1, ids[0], ids[1]]), sorted(t.id for t in db.query(Topic.id)))
+            self.assertEqual(0, db.query(Tracker2Topic.__table__.c.id).count())
+
+    def _create_watching_topics(self):
+        last_updates = [datetime(2017, 1, 2, tzinfo=pytz.utc), None, datetime(2017, 1, 1, tzinfo=pytz.utc), None,
+                        datetime(2017, 1, 2, tzinfo=pytz.utc)]
+        ids = []
+        with DBSession() as db:
+            for i, last_update in enumerate(last_updates):
+                topic_class = Tracker1Topic if i % 2 == 0 else Tracker2Topic
+                topic = topic_class(display_name=u"Topic {0} Ab_c".format(5 - i) if i != 3 else u"Other 100%",
+                                    url="http://tracker.com/list/{0}/".format(i), last_update=last_update,
+                                    status=Status.Error if i in (1, 2) else Status.Ok, paused=i == 4,
+                                    some_addition_field=i)
+                db.add(topic)
+                db.flush()
+                ids.append(topic.id)
+        return ids
+
+    def test_get_watching_topics_filters(self):
+        ids = self._create_watching_topics()
+
+        def get_ids(**kwargs):
+            return [t['id'] for t in self.trackers_manager.get_watching_topics(**kwargs)]
+
+        self.assertEqual([ids[1], ids[3]], get_ids(tracker=TRACKER2_PLUGIN_NAME))
+        self.assertEqual([ids[1], ids[2]], get_ids(statuses=[Status.Error]))
+        self.assertEqual([ids[4]], get_ids(paused=True))
+        self.assertEqual([ids[3]], get_ids(search='100%'))
+        self.assertEqual([ids[0], ids[1], ids[2], ids[4]], get_ids(search='b_c'))
+        self.assertEqual([], get_ids(search='b%c'))
+        self.assertEqual([ids[2]], get_ids(tracker=TRACKER1_PLUGIN_NAME, statuses=[Status.Error], search='Topic'))
+        self.assertEqual(2, self.trackers_manager.get_watching_topics_count(statuses=[Status.Error]))
+        self.assertEqual(6, self.trackers_manager.get_watching_topics_count())
+
+    @data(('id', False), ('id', True), ('display_name', False), ('display_name', True),
+          ('last_update', False), ('last_update', True))
+    def test_get_watching_topics_pages(self, value):
+        order_by, desc = value
+        self._create_watching_topics()
+
+        all_topics = self.trackers_manager.get_watching_topics(order_by=order_by, desc=desc)
+        with DBSession() as db:
+            column = self.trackers_manager.topics_order_columns[order_by]
+            query = db.query(Topic.id).order_by(column.desc() if desc else column, Topic.id.desc() if desc else Topic.id)
+            expected = [t.id for t in query]
+        self.assertEqual(expected, [t['id'] for t in all_topics])
+
+        pages = []
+        after = None
+        while True:
+            page = self.trackers_manager.get_watching_topics(order_by=order_by, desc=desc, take=2, after=after)
+            pages.extend(page)
+            if len(page) < 2:
+                break
+            after = page[-1]['id']
+        self.assertEqual(all_topics, pages)
+
+    def test_get_watching_topics_removed_after(self):
+        ids = self._create_watching_topics()
+
+        with self.assertRaises(KeyError):
+            self.trackers_manager.get_watching_topics(order_by='display_name', take=2, after=ids[-1] + 1)
+
+        self.assertEqual([], self.trackers_manager.get_watching_topics(take=2, after=ids[-1] + 1))
+
+
+lazy_tracker_classes = []
+
+
+def define_lazy_tracker():
+    """
+    Topic class of lazy tracker is mapped only when its module is imported, like plugins from manifest
+    """
+    if len(lazy_tracker_classes) == 0:
+        class LazyTrackerTopic(Topic):
+            __tablename__ = "lazy_tracker_topics"
+
+            id = Column(Integer, ForeignKey('topics.id'), primary_key=True)
+            some_addition_field = Column(Integer)
+
+            __mapper_args__ = {
+                'polymorphic_identity': LAZY_TRACKER_PLUGIN_NAME
+            }
+
+        class LazyTracker(Tracker1):
+            topic_class = LazyTrackerTopic
+
+        lazy_tracker_classes.append(LazyTracker)
+    return lazy_tracker_classes[0]
+
+
+class TrackersManagerLazyPluginTest(DbTestCase):
+    def setUp(self):
+        super(TrackersManagerLazyPluginTest, self).setUp()
+
+        with DBSession() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS lazy_tracker_topics "
+                       "(id INTEGER PRIMARY KEY, some_addition_field INTEGER)")
+            result = db.execute(Topic.__table__.insert(), {'display_name': 'Lazy', 'url': 'http://lazy/1',
+                                                           'type': LAZY_TRACKER_PLUGIN_NAME})
+            self.topic_id = result.inserted_primary_key[0]
+            db.execute("INSERT INTO lazy_tracker_topics (id, some_addition_field) VALUES (:id, 1)",
+                       {'id': self.topic_id})
+
+        trackers = PluginsDict({LAZY_TRACKER_PLUGIN_NAME: PluginInfo('tracker', LAZY_TRACKER_PLUGIN_NAME,
+                                                                     'tests.lazy_tracker')})
+
+        # noinspection PyUnusedLocal
+        def import_module(name, *args, **kwargs):
+            register_plugin('tracker', LAZY_TRACKER_PLUGIN_NAME, define_lazy_tracker()())
+
+        self.import_mock = Mock(side_effect=import_module)
+        for p in [patch('monitorrent.plugin_managers.__import__', self.import_mock, create=True),
+                  patch('monitorrent.plugin_managers.plugins', {'tracker': trackers})]:
+            p.start()
+            self.addCleanup(p.stop)
+
+        # noinspection PyTypeChecker
+        self.trackers_manager = TrackersManager(Mock(), trackers)
+
+    def test_remove_topic_of_not_loaded_plugin_removes_tracker_row(self):
+        self.assertTrue(self.trackers_manager.remove_topic(self.topic_id))
+
+        with DBSession() as db:
+            self.assertEqual(0, db.execute("SELECT COUNT(*) FROM topics").scalar())
+            self.assertEqual(0, db.execute("SELECT COUNT(*) FROM lazy_tracker_topics").scalar())
+
+    def test_remove_topics_loads_plugin(self):
+        self.assertEqual(1, self.trackers_manager.remove_topics())
+
+        self.import_mock.assert_called_once_with('tests.lazy_tracker')
+        with DBSession() as db:
+            self.assertEqual(0, db.execute("SELECT COUNT(*) FROM lazy_tracker_topics").scalar())
+
+    def test_set_topics_paused_loads_plugin(self):
+        self.assertEqual(1, self.trackers_manager.set_topics_paused(True, tracker=LAZY_TRACKER_PLUGIN_NAME))
+
+        self.import_mock.assert_called_once_with('tests.lazy_tracker')
+
+    def test_get_watching_topics_loads_plugin(self):
+        topics = self.trackers_manager.get_watching_topics()
+
+        self.import_mock.assert_called_once_with('tests.lazy_tracker')
+        self.assertEqual([self.topic_id], [topic['id'] for topic in topics])
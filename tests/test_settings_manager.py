@@ -1,4 +1,5 @@
 from ddt import ddt, data
+from mock import patch
 from tests import DbTestCase
 from monitorrent.settings_manager import SettingsManager
 
@@ -101,6 +102,14 @@ class SettingsManagerTest(DbTestCase):
 
         self.assertEqual(20, self.settings_manager.remove_logs_interval)
 
+    def test_get_remove_logs_max_size(self):
+        self.assertEqual(0, self.settings_manager.remove_logs_max_size)
+
+    def test_set_remove_logs_max_size(self):
+        self.settings_manager.remove_logs_max_size = 50
+
+        self.assertEqual(50, self.settings_manager.remove_logs_max_size)
+
     def test_get_is_proxy_enabled(self):
         self.assertFalse(self.settings_manager.get_is_proxy_enabled())
 
@@ -218,3 +227,43 @@ class SettingsManagerTest(DbTestCase):
     def test_get_existing_external_notifications_levels_success(self):
         self.assertEqual(self.settings_manager.get_existing_external_notifications_levels(),
                          ['DOWNLOAD', 'ERROR', 'STATUS_CHANGED'])
+
+    def test_cache_reads_database_once(self):
+        self.settings_manager.set_password('secret')
+        self.settings_manager.set_is_proxy_enabled(True)
+        self.settings_manager.set_proxy('http', 'http://1.1.1.1')
+        # first read after set loads cache
+        self.settings_manager.get_password()
+
+        statistics = self.settings_manager.cache_statistics
+        with patch('monitorrent.settings_manager.DBSession') as db_session_mock:
+            self.assertEqual('secret', self.settings_manager.get_password())
+            tracker_settings = self.settings_manager.tracker_settings
+            self.assertEqual({'http': 'http://1.1.1.1'}, tracker_settings.proxies)
+            self.assertEqual('http://1.1.1.1', self.settings_manager.get_proxy('http'))
+
+            db_session_mock.assert_not_called()
+
+        new_statistics = self.settings_manager.cache_statistics
+        self.assertEqual(statistics['hits'] + 5, new_statistics['hits'])
+        self.assertEqual(statistics['misses'], new_statistics['misses'])
+
+    def test_cache_invalidated_on_set(self):
+        self.assertEqual('monitorrent', self.settings_manager.get_password())
+
+        invalidations = self.settings_manager.cache_statistics['invalidations']
+        self.settings_manager.set_password('secret')
+        self.settings_manager.set_proxy('https', 'http://2.2.2.2')
+
+        self.assertEqual(invalidations + 2, self.settings_manager.cache_statistics['invalidations'])
+        self.assertEqual('secret', SettingsManager().get_password())
+        self.assertEqual({'https': 'http://2.2.2.2'}, SettingsManager().get_proxies())
+
+    def test_cache_reloaded_for_new_database(self):
+        self.settings_manager.set_password('secret')
+        self.assertEqual('secret', self.settings_manager.get_password())
+
+        self.tearDown()
+        self.setUp()
+
+        self.assertEqual('monitorrent', self.settings_manager.get_password())
@@ -95,5 +95,9 @@ class TopicUpgradeTest(UpgradeTestCase):
         finally:
             db.close()
 
+    def test_upgrade_creates_indexes(self):
+        self._upgrade_from(None, 3)
 
-
+        indexes = [i['name'] for i in self.engine.dialect.get_indexes(self.engine.connect(), 'topics')]
+        self.assertIn('ix_topics_type_display_name', indexes)
+        self.assertIn('ix_topics_last_update_id', indexes)
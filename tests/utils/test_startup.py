@@ -0,0 +1,65 @@
+import threading
+from mock import MagicMock
+from tests import TestCase
+from monitorrent.utils.startup import StartupProfile, DeferredTasks
+
+
+class StartupProfileTest(TestCase):
+    def test_phase_is_recorded(self):
+        profile = StartupProfile()
+
+        with profile.phase('first'):
+            pass
+
+        self.assertEqual(['first'], [name for name, _ in profile.phases])
+        self.assertIn('first', profile.report())
+        self.assertIn('total', profile.report())
+
+    def test_phase_is_recorded_on_exception(self):
+        profile = StartupProfile()
+
+        with self.assertRaises(ValueError):
+            with profile.phase('failed'):
+                raise ValueError()
+
+        self.assertEqual(['failed'], [name for name, _ in profile.phases])
+
+
+class DeferredTasksTest(TestCase):
+    def test_tasks_are_called_in_order(self):
+        calls = []
+        profile = StartupProfile()
+        tasks = DeferredTasks(profile)
+        tasks.add('first', lambda: calls.append('first'))
+        tasks.add('second', lambda: calls.append('second'))
+
+        tasks.start().join(5)
+
+        self.assertEqual(['first', 'second'], calls)
+        self.assertEqual(['first', 'second'], [name for name, _ in profile.phases])
+
+    def test_failed_task_does_not_stop_next_tasks(self):
+        next_task = MagicMock()
+        tasks = DeferredTasks()
+        tasks.add('failed', MagicMock(side_effect=Exception('Some error')))
+        tasks.add('next', next_task)
+
+        tasks.start().join(5)
+
+        next_task.assert_called_once_with()
+
+    def test_hanged_task_is_timed_out(self):
+        release = threading.Event()
+        next_task = MagicMock()
+        profile = StartupProfile()
+        tasks = DeferredTasks(profile)
+        tasks.add('hanged', lambda: release.wait(5), timeout=0.1)
+        tasks.add('next', next_task)
+
+        thread = tasks.start()
+        thread.join(2)
+        release.set()
+
+        self.assertFalse(thread.is_alive())
+        next_task.assert_called_once_with()
+        self.assertEqual(['hanged (timeout)', 'next'], [name for name, _ in profile.phases])
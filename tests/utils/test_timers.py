@@ -1,7 +1,8 @@
+import threading
 from time import sleep
 from tests import TestCase
-from mock import MagicMock, patch
-from monitorrent.utils.timers import timer
+from mock import MagicMock, Mock, patch
+from monitorrent.utils.timers import timer, scheduler, Scheduler
 
 
 class TimersTest(TestCase):
@@ -42,14 +43,92 @@ class TimersTest(TestCase):
 
     def test_timer_starts_daemon_thread(self):
         execute_mock = MagicMock()
-        timer_thread = MagicMock()
 
-        with patch('threading.Thread') as thread_mock:
-            thread_mock.return_value = timer_thread
+        cancel = timer(0.1, execute_mock)
+
+        self.assertTrue(scheduler._thread.daemon)
+        self.assertTrue(scheduler._thread.is_alive())
+
+        cancel()
 
-            cancel = timer(0.1, execute_mock)
+    def test_timers_share_one_thread(self):
+        threads = set()
 
-            assert hasattr(timer_thread, "daemon")
-            assert timer_thread.daemon is True
+        def timer_fn():
+            threads.add(threading.current_thread())
 
+        cancels = [timer(0.05, timer_fn) for _ in range(5)]
+        sleep(0.2)
+        for cancel in cancels:
             cancel()
+
+        self.assertEqual({scheduler._thread}, threads)
+
+    def test_failed_job_does_not_stop_scheduler(self):
+        separate_scheduler = Scheduler()
+        called = threading.Event()
+        failed = separate_scheduler.schedule(0.01, Mock(side_effect=Exception('Some error')))
+        job = separate_scheduler.schedule(0.02, called.set)
+
+        self.assertTrue(called.wait(1))
+
+        failed.cancel()
+        job.cancel()
+
+
+class SchedulerTest(TestCase):
+    def setUp(self):
+        super(SchedulerTest, self).setUp()
+        self.now = 1000.0
+        clock_patcher = patch('monitorrent.utils.timers._clock', side_effect=lambda: self.now)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+        self.scheduler = Scheduler()
+        # thread isn't started, jobs are taken by _next_job in tests
+        self.scheduler._ensure_thread = Mock()
+
+    def test_schedule_is_drift_free(self):
+        job = self.scheduler.schedule(10, Mock())
+
+        # job is taken late, but next one is planned from the planned time
+        self.now = 1013.0
+        self.assertEqual(job, self.scheduler._next_job())
+        self.assertEqual(1020.0, self.scheduler._heap[0][0])
+
+    def test_missed_runs_are_skipped(self):
+        self.scheduler.schedule(10, Mock())
+
+        self.now = 1045.0
+        self.scheduler._next_job()
+
+        self.assertEqual(1050.0, self.scheduler._heap[0][0])
+
+    def test_nearest_job_is_first(self):
+        long_job = self.scheduler.schedule(100, Mock())
+        short_job = self.scheduler.schedule(10, Mock())
+
+        self.now = 1100.0
+        self.assertEqual(short_job, self.scheduler._next_job())
+        self.assertEqual(long_job, self.scheduler._next_job())
+
+    def test_cancel_removes_job(self):
+        job = self.scheduler.schedule(10, Mock())
+        other_job = self.scheduler.schedule(20, Mock())
+
+        job.cancel()
+
+        self.assertTrue(job.cancelled)
+        self.assertEqual([other_job], [entry[2] for entry in self.scheduler._heap])
+
+    @patch('monitorrent.utils.timers.random')
+    def test_jitter_does_not_shift_schedule(self, random_mock):
+        random_mock.uniform.return_value = 3.0
+        job = self.scheduler.schedule(10, Mock(), jitter=5)
+
+        random_mock.uniform.assert_called_once_with(0, 5)
+        self.assertEqual(1013.0, self.scheduler._heap[0][0])
+
+        self.now = 1013.0
+        self.scheduler._next_job()
+        self.assertEqual(1020.0, job.planned)
+        self.assertEqual(1023.0, self.scheduler._heap[0][0])
@@ -0,0 +1,48 @@
+from mock import patch
+from tests import TestCase
+from monitorrent.utils.token_bucket import TokenBucket
+
+
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        super(TokenBucketTest, self).setUp()
+        self.now = 1000.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        time_patcher = patch('monitorrent.utils.token_bucket.time')
+        time_mock = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        time_mock.time.side_effect = lambda: self.now
+        time_mock.sleep.side_effect = sleep
+
+    def test_burst_up_to_capacity(self):
+        bucket = TokenBucket(2, 3)
+
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual([], self.sleeps)
+
+        bucket.acquire()
+        self.assertEqual([0.5], self.sleeps)
+
+    def test_refill(self):
+        bucket = TokenBucket(1, 1)
+
+        bucket.acquire()
+        self.now += 10
+        bucket.acquire()
+        bucket.acquire()
+
+        self.assertEqual([1.0], self.sleeps)
+
+    def test_suspend(self):
+        bucket = TokenBucket(1, 5)
+
+        bucket.suspend(3)
+        bucket.acquire()
+
+        self.assertEqual([4.0], self.sleeps)
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+
+class PluginsImportBenchmark(TestCase):
+    """
+    Compare startup import time of plugins registered from manifest against import of all plugin modules
+    """
+    repeat = 5
+    heavy_modules = ['bs4', 'html5lib', 'transmissionrpc', 'deluge_client', 'smtplib', 'feedparser']
+
+    script = '\n'.join([
+        'import sys, time',
+        'start = time.time()',
+        'from monitorrent.plugin_managers import load_plugins',
+        'load_plugins(lazy=sys.argv[1] != "eager")',
+        'imported = [m for m in sys.argv[2:] if m in sys.modules]',
+        'print("benchmark {0} {1}".format(time.time() - start, ",".join(imported)))',
+    ])
+
+    def _run(self, mode):
+        output = subprocess.check_output([sys.executable, '-c', self.script, mode] + self.heavy_modules)
+        result = [line for line in output.decode('utf-8').splitlines() if line.startswith('benchmark ')][-1]
+        fields = result.split(' ')
+        return float(fields[1]), [m for m in fields[2].split(',') if m]
+
+    def _measure(self, mode):
+        results = [self._run(mode) for _ in range(self.repeat)]
+        seconds = min(r[0] for r in results)
+        imported = results[0][1]
+        print('{0}: {1:.3f}s, imported {2}'.format(mode, seconds, imported))
+        return seconds, imported
+
+    def test_load_plugins(self):
+        eager, eager_imported = self._measure('eager')
+        lazy, imported = self._measure('lazy')
+
+        print('speedup: {0:.2f}x'.format(eager / lazy))
+        self.assertEqual([], imported)
+        # html parser is needed only on check of topics, so it isn't imported on start too
+        self.assertNotIn('bs4', eager_imported)
@@ -0,0 +1,93 @@
+import timeit
+from unittest import TestCase
+from sqlalchemy import Integer, Boolean, event
+from sqlalchemy.orm import with_polymorphic
+from sqlalchemy.pool import StaticPool
+from monitorrent.db import init_db_engine, create_db, close_db, get_engine, DBSession, row2dict
+from monitorrent.plugins import Topic
+from monitorrent.plugins.status import Status
+from monitorrent.plugin_managers import load_plugins, get_plugins, TrackersManager
+from monitorrent.plugins.trackers import TrackerSettings
+
+
+class TopicsLoadingBenchmark(TestCase):
+    """
+    Compare loading of 10k topics with one query per tracker against joining all tracker tables
+    """
+    topics_count = 10000
+    repeat = 3
+
+    def setUp(self):
+        load_plugins()
+        # tracker modules are imported on first use, but all topic classes are required here
+        list(get_plugins('tracker').values())
+        init_db_engine("sqlite://", echo=False, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        create_db()
+        self.subclasses = [m for m in Topic.__mapper__.self_and_descendants if m is not Topic.__mapper__]
+        self._fill_topics()
+        self.statements = []
+
+        # noinspection PyUnusedLocal
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.statements.append(statement)
+        event.listen(get_engine(), 'before_cursor_execute', before_cursor_execute)
+
+    def tearDown(self):
+        close_db()
+
+    def _fill_topics(self):
+        base_table = Topic.__table__
+        with DBSession() as db:
+            for i in range(self.topics_count):
+                mapper = self.subclasses[i % len(self.subclasses)]
+                topic = {'display_name': 'Topic {0}'.format(i), 'url': 'http://tracker/{0}'.format(i),
+                         'type': mapper.polymorphic_identity, 'status': Status.Ok, 'paused': False}
+                topic_id = db.execute(base_table.insert(), topic).inserted_primary_key[0]
+                values = {'id': topic_id}
+                for column in mapper.local_table.columns:
+                    if column.name == 'id' or column.nullable or column.server_default is not None:
+                        continue
+                    values[column.name] = 1 if isinstance(column.type, (Integer, Boolean)) else 'value'
+                db.execute(mapper.local_table.insert(), values)
+
+    def _measure(self, name, func):
+        del self.statements[:]
+        func()
+        statements = len(self.statements)
+        seconds = min(timeit.repeat(func, number=1, repeat=self.repeat))
+        print('{0}: {1:.3f}s, {2} statements'.format(name, seconds, statements))
+        return seconds
+
+    def test_get_watching_topics(self):
+        trackers_manager = TrackersManager(TrackerSettings(10, None), get_plugins('tracker'))
+
+        def load_joined():
+            # get_watching_topics implementation with all tracker tables joined into one query
+            watching_topics = []
+            with DBSession() as db:
+                for dbtopic in db.query(with_polymorphic(Topic, '*')).all():
+                    topic = row2dict(dbtopic, None, ['id', 'url', 'display_name', 'last_update', 'paused'])
+                    topic['info'] = trackers_manager.get_tracker(dbtopic.type).get_topic_info(dbtopic)
+                    topic['tracker'] = dbtopic.type
+                    topic['status'] = dbtopic.status.__str__()
+                    watching_topics.append(topic)
+            return watching_topics
+
+        joined = self._measure('with_polymorphic=*', load_joined)
+        selectin = self._measure('query per tracker', trackers_manager.get_watching_topics)
+
+        print('speedup: {0:.2f}x'.format(joined / selectin))
+
+    def test_set_topic_paused(self):
+        trackers_manager = TrackersManager(TrackerSettings(10, None), get_plugins('tracker'))
+
+        def set_paused_joined():
+            with DBSession() as db:
+                topic = db.query(with_polymorphic(Topic, '*')).filter(Topic.id == self.topics_count // 2).first()
+                topic.paused = not topic.paused
+
+        def set_paused():
+            trackers_manager.set_topic_paused(self.topics_count // 2, True)
+
+        self._measure('set paused with_polymorphic=*', set_paused_joined)
+        self._measure('set paused topics only', set_paused)